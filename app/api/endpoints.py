@@ -1,16 +1,25 @@
-from fastapi import APIRouter, status, HTTPException
+from fastapi import APIRouter, status, HTTPException, Query, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from app.utils.immich_client import ImmichClient
 from app.models.job import Job, JobStatus, AuthMode
+from app.models.item import Item, ItemStatus
 from app.db.session import get_db
 from app.utils.crypto import encrypt_secret
+from sqlalchemy import case, func, tuple_
 from sqlalchemy.orm import Session
 from fastapi import Depends
-from app.worker.worker import queue
-from app.worker.worker import import_job
+from app.worker.worker import enqueue_import, enqueue_retry, redis_conn, redis_url
+from app.worker.events import ALL_JOBS_STREAM, JobEvents, job_stream, read_events
+from app.worker.purge import PURGE_SYNC_MAX_ITEMS, delete_jobs, enqueue_purge, remove_job_files
+from app.worker.tracing import merge_traces, trace_dir_for
+from sse_starlette.sse import EventSourceResponse
+import redis.asyncio as aioredis
+import base64
+import binascii
 import uuid
+from datetime import datetime
 
 jobs_router = APIRouter()
 immich_router = APIRouter()
@@ -34,6 +43,19 @@ class CreateJobRequest(BaseModel):
     download_concurrency: int = 3
     upload_concurrency: int = 3
     store_staging: bool = False
+    preflight_check: bool = True
+    album_batch_size: int = 500
+    album_batch_delay: float = 5.0
+    # Only import items not already imported from the same album by earlier jobs
+    sync: bool = False
+    # Opt-in: split the job into per-album (and per-chunk) tasks that workers run in
+    # parallel. Each task checks duplicates per batch instead of preloading every
+    # known hash, and the job stays RUNNING until the last task has finished.
+    fan_out: bool = False
+    # Let each host's concurrency grow from the values above while it stays healthy
+    adaptive_concurrency: bool = True
+    # Record a span trace of every item, downloadable from /api/jobs/{id}/trace
+    trace: bool = False
 
 @health_router.get("/")
 def healthz():
@@ -42,16 +64,15 @@ def healthz():
 @immich_router.post("/test-login")
 async def test_login(req: TestLoginRequest):
     try:
-        client = ImmichClient(req.immich_url)
-        
-        if req.auth_mode == "API_KEY":
-            if not req.api_key:
-                return {"ok": False, "message": "API key is required"}
-            success, user_info = await client.test_api_key(req.api_key)
-        else:  # CREDENTIALS
-            if not req.email or not req.password:
-                return {"ok": False, "message": "Email and password are required"}
-            success, user_info = await client.test_login(req.email, req.password)
+        async with ImmichClient(req.immich_url) as client:
+            if req.auth_mode == "API_KEY":
+                if not req.api_key:
+                    return {"ok": False, "message": "API key is required"}
+                success, user_info = await client.test_api_key(req.api_key)
+            else:  # CREDENTIALS
+                if not req.email or not req.password:
+                    return {"ok": False, "message": "Email and password are required"}
+                success, user_info = await client.test_login(req.email, req.password)
         
         if success:
             return {
@@ -76,7 +97,14 @@ async def create_job(req: CreateJobRequest, db: Session = Depends(get_db)):
             "skip_duplicates": req.skip_duplicates,
             "download_concurrency": req.download_concurrency,
             "upload_concurrency": req.upload_concurrency,
-            "store_staging": req.store_staging
+            "store_staging": req.store_staging,
+            "preflight_check": req.preflight_check,
+            "album_batch_size": req.album_batch_size,
+            "album_batch_delay": req.album_batch_delay,
+            "sync": req.sync,
+            "fan_out": req.fan_out,
+            "adaptive_concurrency": req.adaptive_concurrency,
+            "trace": req.trace
         }
         
         # Encrypt credentials
@@ -101,7 +129,8 @@ async def create_job(req: CreateJobRequest, db: Session = Depends(get_db)):
         
         # Enqueue the job for processing
         try:
-            queue.enqueue(import_job, str(job.id))
+            enqueue_import(job.id)
+            JobEvents(redis_conn, job.id).status(job.status.value)
         except Exception as e:
             job.status = JobStatus.FAILED
             job.last_error = f"Failed to enqueue job: {str(e)}"
@@ -132,6 +161,7 @@ def cancel_job(job_id: str, db: Session = Depends(get_db)):
     if job.status == JobStatus.QUEUED:
         job.status = JobStatus.CANCELLED
     db.commit()
+    JobEvents(redis_conn, job.id).status(job.status.value)
     return {"message": "Job cancellation requested"}
 
 @jobs_router.put("/{job_id}/resume")
@@ -146,16 +176,48 @@ def resume_job(job_id: str, db: Session = Depends(get_db)):
     job.status = JobStatus.QUEUED
     # Re-enqueue the job
     try:
-        from app.worker.worker import import_job
-        queue.enqueue(import_job, job_id)
+        enqueue_import(job_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to re-enqueue job: {str(e)}")
     
     db.commit()
     return {"message": "Job resumed"}
 
+def _delete_jobs(db: Session, job_ids: List[uuid.UUID]) -> List[uuid.UUID]:
+    """Delete small jobs now and hand jobs over PURGE_SYNC_MAX_ITEMS items to purge tasks; returns the latter."""
+    counts = dict(db.query(Item.job_id, func.count(Item.id)).filter(Item.job_id.in_(job_ids)).group_by(Item.job_id))
+    large = [job_id for job_id in job_ids if counts.get(job_id, 0) > PURGE_SYNC_MAX_ITEMS]
+    small = [job_id for job_id in job_ids if job_id not in large]
+    delete_jobs(db, small)
+    try:
+        if large:
+            enqueue_purge(db, large)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to enqueue delete: {str(e)}")
+    db.commit()
+    remove_job_files(small)
+    return large
+
+@jobs_router.post("/pause-queued")
+def pause_queued_jobs(db: Session = Depends(get_db)):
+    updated = db.query(Job).filter(Job.status == JobStatus.QUEUED).update({"status": JobStatus.PAUSED})
+    db.commit()
+    return {"message": f"Paused {updated} queued jobs"}
+
+# Registered before /{job_id} so that path doesn't match it
+@jobs_router.delete("/remove-queued")
+def remove_queued_jobs(db: Session = Depends(get_db)):
+    job_ids = [job_id for (job_id,) in db.query(Job.id).filter(Job.status == JobStatus.QUEUED)]
+    background = _delete_jobs(db, job_ids) if job_ids else []
+    message = f"Removed {len(job_ids) - len(background)} queued jobs"
+    if background:
+        message += f", deleting {len(background)} more in the background"
+    return {"message": message}
+
 @jobs_router.delete("/{job_id}")
 def delete_job(job_id: str, db: Session = Depends(get_db)):
+    """Delete a job with its albums and items; large jobs answer 202 and are purged by a worker task."""
     job = db.query(Job).filter(Job.id == job_id).first()
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -163,42 +225,60 @@ def delete_job(job_id: str, db: Session = Depends(get_db)):
     if job.status == JobStatus.RUNNING:
         raise HTTPException(status_code=400, detail="Cannot delete a running job. Cancel it first.")
     
-    # Delete associated albums and items
-    db.query(Item).filter(Item.job_id == job.id).delete()
-    db.query(Album).filter(Album.job_id == job.id).delete()
-    db.delete(job)
-    db.commit()
+    if _delete_jobs(db, [job.id]):
+        return JSONResponse({"message": "Deleting job in the background"}, status_code=202)
     return {"message": "Job deleted"}
 
-@jobs_router.post("/pause-queued")
-def pause_queued_jobs(db: Session = Depends(get_db)):
-    updated = db.query(Job).filter(Job.status == JobStatus.QUEUED).update({"status": JobStatus.PAUSED})
-    db.commit()
-    return {"message": f"Paused {updated} queued jobs"}
+def _encode_cursor(job: Job) -> str:
+    return base64.urlsafe_b64encode(f"{job.created_at.isoformat()}|{job.id}".encode()).decode()
 
-@jobs_router.delete("/remove-queued")
-def remove_queued_jobs(db: Session = Depends(get_db)):
-    # Get queued jobs
-    queued_jobs = db.query(Job).filter(Job.status == JobStatus.QUEUED).all()
-    count = 0
-    for job in queued_jobs:
-        # Delete associated albums and items
-        db.query(Item).filter(Item.job_id == job.id).delete()
-        db.query(Album).filter(Album.job_id == job.id).delete()
-        db.delete(job)
-        count += 1
-    db.commit()
-    return {"message": f"Removed {count} queued jobs"}
+def _decode_cursor(cursor: str):
+    try:
+        created_at, job_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), uuid.UUID(job_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def job_item_counts(db: Session, job_ids: List[uuid.UUID]) -> Dict[uuid.UUID, dict]:
+    """Item counts and imported bytes of each job, in one grouped query over the (job_id, status) index."""
+    def count(item_status):
+        return func.sum(case((Item.status == item_status, 1), else_=0))
+    rows = (db.query(Item.job_id, func.count(Item.id), count(ItemStatus.DONE), count(ItemStatus.FAILED),
+                     count(ItemStatus.SKIPPED), func.sum(case((Item.status == ItemStatus.DONE, Item.bytes), else_=0)))
+            .filter(Item.job_id.in_(job_ids))
+            .group_by(Item.job_id))
+    return {job_id: {"total": total, "done": done or 0, "failed": failed or 0, "skipped": skipped or 0, "bytes": size or 0}
+            for job_id, total, done, failed, skipped, size in rows}
 
 @jobs_router.get("/")
-def list_jobs(db: Session = Depends(get_db)):
-    jobs = db.query(Job).order_by(Job.created_at.desc()).limit(20).all()
-    return [{
-        "id": str(job.id),
-        "status": job.status.value,
-        "created_at": job.created_at.isoformat(),
-        "progress": job.progress
-    } for job in jobs]
+def list_jobs(limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None,
+              status: Optional[List[JobStatus]] = Query(None), db: Session = Depends(get_db)):
+    """Jobs newest first, `limit` per page; pass `next_cursor` back as `cursor` for the next page.
+
+    Pages are keyed on (created_at, id) rather than an offset, so deep pages
+    cost the same as the first one and don't shift while jobs are created.
+    """
+    query = db.query(Job)
+    if status:
+        query = query.filter(Job.status.in_(status))
+    if cursor:
+        query = query.filter(tuple_(Job.created_at, Job.id) < tuple_(*_decode_cursor(cursor)))
+    jobs = query.order_by(Job.created_at.desc(), Job.id.desc()).limit(limit + 1).all()
+    next_cursor = _encode_cursor(jobs[limit - 1]) if len(jobs) > limit else None
+    jobs = jobs[:limit]
+    empty = {"total": 0, "done": 0, "failed": 0, "skipped": 0, "bytes": 0}
+    counts = job_item_counts(db, [job.id for job in jobs]) if jobs else {}
+    return {
+        "jobs": [{
+            "id": str(job.id),
+            "status": job.status.value,
+            "created_at": job.created_at.isoformat(),
+            "progress": job.progress,
+            "last_error": job.last_error,
+            "items": counts.get(job.id, empty),
+        } for job in jobs],
+        "next_cursor": next_cursor,
+    }
 
 @jobs_router.post("/{job_id}/start")
 def start_job(job_id: str):
@@ -214,9 +294,64 @@ def cancel_job(job_id: str, db: Session = Depends(get_db)):
     return {"message": "Cancel requested"}
 
 @jobs_router.post("/{job_id}/retry-failed")
-def retry_failed(job_id: str):
-    return JSONResponse({"message": "Retry not implemented"}, status_code=501)
+def retry_failed(job_id: str, db: Session = Depends(get_db)):
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    if job.status in [JobStatus.QUEUED, JobStatus.RUNNING]:
+        raise HTTPException(status_code=400, detail="Job is still running")
+    if job.status == JobStatus.DELETING:
+        raise HTTPException(status_code=400, detail="Job is being deleted")
+    
+    failed = db.query(Item).filter(Item.job_id == job.id, Item.status == ItemStatus.FAILED).count()
+    if not failed:
+        return {"message": "No failed items to retry", "failed": 0}
+    
+    job.status = JobStatus.QUEUED
+    job.cancel_requested = False
+    job.last_error = None
+    try:
+        enqueue_retry(job.id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Failed to enqueue retry: {str(e)}")
+    db.commit()
+    JobEvents(redis_conn, job.id).status(job.status.value)
+    return {"message": f"Retrying {failed} failed items", "failed": failed}
+
+async def _event_source(request: Request, stream: str, default_last_id: str):
+    last_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id") or default_last_id
+    redis = aioredis.from_url(redis_url)
+    try:
+        async for message in read_events(redis, stream, last_id):
+            if await request.is_disconnected():
+                break
+            if message is not None:
+                yield message
+    finally:
+        await redis.aclose()
+
+@jobs_router.get("/events")
+async def all_job_events(request: Request):
+    """Live status/progress events for every job, as server-sent events."""
+    return EventSourceResponse(_event_source(request, ALL_JOBS_STREAM, "$"))
 
 @jobs_router.get("/{job_id}/events")
-def job_events(job_id: str):
-    return JSONResponse({"events": []}, status_code=200)
+def job_events(job_id: str, request: Request, db: Session = Depends(get_db)):
+    """Status, progress and log events of one job, replayed from Last-Event-ID (or the start)."""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return EventSourceResponse(_event_source(request, job_stream(job_id), "0-0"))
+
+@jobs_router.get("/{job_id}/trace")
+def job_trace(job_id: str, db: Session = Depends(get_db)):
+    """Span trace of a job run with the `trace` option, as Chrome trace-event JSON (chrome://tracing, Perfetto)."""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    trace = merge_traces(trace_dir_for(job.id))
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No trace recorded for this job")
+    return JSONResponse(trace, headers={"Content-Disposition": f'attachment; filename="trace-{job.id}.json"'})
@@ -1,9 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
 from app.api import routes
+from app.api.metrics import QueueCollector, RequestMetricsMiddleware
+from app.db.session import SessionLocal
+from app.utils.metrics import metrics_registry
+from app.worker.worker import queue
 
 app = FastAPI()
 
+app.add_middleware(RequestMetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -15,6 +22,14 @@ app.add_middleware(
 
 app.include_router(routes.router)
 
+queue_registry = CollectorRegistry()
+queue_registry.register(QueueCollector(queue, SessionLocal))
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus metrics of the API process plus queue and job gauges; stage metrics come from the worker exporter."""
+    return Response(generate_latest(metrics_registry()) + generate_latest(queue_registry), media_type=CONTENT_TYPE_LATEST)
+
 # Serve static frontend at root
 
 from fastapi.responses import FileResponse
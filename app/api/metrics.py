@@ -0,0 +1,53 @@
+import logging
+import time
+from typing import Callable
+import rq
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from app.models.job import Job, JobStatus
+from app.utils.metrics import API_REQUEST_SECONDS
+
+logger = logging.getLogger(__name__)
+
+class QueueCollector:
+    """Queue and job gauges, read from RQ and the database when /metrics is scraped."""
+
+    def __init__(self, queue: rq.Queue, session_factory: Callable[[], Session]):
+        self.queue = queue
+        self.session_factory = session_factory
+
+    def collect(self):
+        tasks = GaugeMetricFamily("gphotos_rq_tasks", "RQ tasks of the import queue by state", labels=["state"])
+        try:
+            tasks.add_metric(["queued"], self.queue.count)
+            tasks.add_metric(["started"], self.queue.started_job_registry.count)
+            tasks.add_metric(["failed"], self.queue.failed_job_registry.count)
+            yield tasks
+        except Exception as e:
+            logger.warning(f"Failed to read queue metrics: {e}")
+
+        jobs = GaugeMetricFamily("gphotos_jobs", "Import jobs by status", labels=["status"])
+        db = self.session_factory()
+        try:
+            counts = dict(db.query(Job.status, func.count(Job.id)).group_by(Job.status).all())
+            for status in JobStatus:
+                jobs.add_metric([status.value], counts.get(status, 0))
+            yield jobs
+        except Exception as e:
+            logger.warning(f"Failed to read job metrics: {e}")
+        finally:
+            db.close()
+
+class RequestMetricsMiddleware(BaseHTTPMiddleware):
+    """Times every API request, labelled by the handling endpoint rather than the raw path."""
+
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        endpoint = request.scope.get("endpoint")
+        API_REQUEST_SECONDS.labels(request.method, getattr(endpoint, "__name__", "unmatched"),
+                                   str(response.status_code)).observe(time.perf_counter() - start)
+        return response
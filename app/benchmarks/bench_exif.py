@@ -0,0 +1,56 @@
+"""Compare one exiftool process per file against the persistent exiftool pool.
+
+Usage: python -m app.benchmarks.bench_exif [--files 200] [--batch 8] [--workers 2]
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from app.benchmarks.fixtures import make_jpeg
+from app.utils.exif import ExifToolPool, extract_exif_subprocess
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    if not shutil.which("exiftool"):
+        sys.exit("exiftool is not installed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for n in range(args.files):
+            path = Path(tmp) / f"photo_{n}.jpg"
+            path.write_bytes(make_jpeg(size=64 * 1024, model=f"Camera {n}"))
+            paths.append(str(path))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.workers) as executor:
+            per_file = list(executor.map(extract_exif_subprocess, paths))
+        subprocess_time = time.perf_counter() - start
+
+        pool = ExifToolPool(size=args.workers)
+        try:
+            start = time.perf_counter()
+            batches = [paths[i:i + args.batch] for i in range(0, len(paths), args.batch)]
+            with ThreadPoolExecutor(args.workers) as executor:
+                results = {}
+                for batch in executor.map(pool.extract, batches):
+                    results.update(batch)
+            pool_time = time.perf_counter() - start
+        finally:
+            pool.close()
+
+    assert all(per_file) and all(results.values()), "exiftool returned no metadata for some files"
+    print(f"files: {args.files}, workers: {args.workers}, batch: {args.batch}")
+    print(f"subprocess per file: {subprocess_time:.2f}s ({args.files / subprocess_time:.1f} files/s)")
+    print(f"stay_open pool:      {pool_time:.2f}s ({args.files / pool_time:.1f} files/s)")
+    print(f"speedup:             {subprocess_time / pool_time:.1f}x")
+
+if __name__ == "__main__":
+    main()
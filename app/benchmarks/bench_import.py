@@ -0,0 +1,183 @@
+"""End-to-end import benchmark against local mock Google Photos and Immich servers.
+
+Usage: python -m app.benchmarks.bench_import [--albums 2] [--items 200] [--size-kb 256]
+           [--latency-ms 0] [--error-rate 0] [--trace DIR] [--output results.json] [--compare old.json]
+
+The mock servers run in a separate process so the importer's peak RSS is
+measured on its own. The job runs in-process through `import_job` (without
+fan-out) against a fresh SQLite database; Redis is in-process fakeredis
+unless --redis-url is given. Results are written as JSON, named after the
+current commit by default, so runs can be compared between commits.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Compared by --compare; True when higher is better
+METRICS = {"items_per_sec": True, "mb_per_sec": True, "seconds": False, "peak_rss_mb": False, "db_commits": False}
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def serve(google_port: int, immich_port: int, items: int, media_size: int, latency: float, error_rate: float):
+    """Run both mock servers until the process is terminated."""
+    import asyncio
+    import uvicorn
+    from app.benchmarks.mock_google import create_mock_google
+    from app.benchmarks.mock_immich import MockImmichState, create_mock_immich
+
+    google = create_mock_google(items, media_size)
+    immich = create_mock_immich(MockImmichState(latency=latency, error_rate=error_rate))
+    servers = [uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+               for app, port in ((google, google_port), (immich, immich_port))]
+
+    async def run():
+        await asyncio.gather(*(server.serve() for server in servers))
+
+    asyncio.run(run())
+
+def wait_until_up(url: str, timeout: float = 15.0):
+    import httpx
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    sys.exit(f"Mock server at {url} did not start")
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def run_import(args, google_url: str, immich_url: str, workdir: Path) -> dict:
+    # Configure the app before its modules read the environment
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'bench.db'}"
+    os.environ["DOWNLOAD_PART_DIR"] = str(workdir / "partial")
+    if args.redis_url:
+        os.environ["REDIS_URL"] = args.redis_url
+    if args.trace:
+        os.environ["TRACE_DIR"] = args.trace
+    from sqlalchemy import event
+    from app.db.session import SessionLocal, engine
+    from app.models.base import Base
+    from app.models import album, item, job as job_model, manifest  # noqa: F401
+    from app.utils.crypto import encrypt_secret
+    from app.worker import worker
+
+    if not args.redis_url:
+        import fakeredis
+        worker.redis_conn = fakeredis.FakeRedis()
+    Base.metadata.create_all(engine)
+
+    db = SessionLocal()
+    job = job_model.Job(
+        id=uuid.uuid4(), immich_url=immich_url, immich_auth_mode=job_model.AuthMode.API_KEY,
+        encrypted_api_key=encrypt_secret("bench"), status=job_model.JobStatus.QUEUED,
+        album_links=[f"{google_url}/share/AF1QipBench{n:03d}" for n in range(args.albums)],
+        options={"create_album": True, "skip_duplicates": True, "download_concurrency": args.concurrency,
+                 "upload_concurrency": args.concurrency, "preflight_check": True, "store_staging": False,
+                 "album_batch_size": 500, "album_batch_delay": 5.0, "fan_out": False,
+                 "trace": bool(args.trace)})
+    db.add(job)
+    db.commit()
+    job_id = job.id
+    db.close()
+
+    commits = [0]
+    event.listen(engine, "commit", lambda conn: commits.__setitem__(0, commits[0] + 1))
+    start = time.perf_counter()
+    worker.import_job(job_id)
+    seconds = time.perf_counter() - start
+
+    db = SessionLocal()
+    job = db.get(job_model.Job, job_id)
+    statuses = Counter(status.value for (status,) in db.query(item.Item.status).filter(item.Item.job_id == job_id))
+    downloaded = sum(size or 0 for (size,) in db.query(item.Item.bytes).filter(item.Item.job_id == job_id))
+    result = {
+        "status": job.status.value,
+        "items": sum(statuses.values()),
+        "statuses": dict(statuses),
+        "seconds": round(seconds, 3),
+        "items_per_sec": round(statuses.get("DONE", 0) / seconds, 2),
+        "mb_per_sec": round(downloaded / 2**20 / seconds, 2),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "db_commits": commits[0],
+    }
+    db.close()
+    return result
+
+def compare(previous: dict, current: dict):
+    print(f"\ncompared with {previous.get('commit')} ({previous.get('timestamp')}):")
+    if previous.get("params") != current["params"]:
+        print(f"  note: parameters differ ({previous.get('params')})")
+    for name, higher_is_better in METRICS.items():
+        old, new = previous["results"].get(name), current["results"].get(name)
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        better = change > 0 if higher_is_better else change < 0
+        print(f"  {name:>14}: {old:>10} -> {new:<10} {change:+6.1f}% {'better' if better else 'worse' if change else ''}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--albums", type=int, default=2)
+    parser.add_argument("--items", type=int, default=200, help="items per album")
+    parser.add_argument("--size-kb", type=int, default=256, help="size of each media file")
+    parser.add_argument("--concurrency", type=int, default=3, help="download and upload concurrency")
+    parser.add_argument("--latency-ms", type=float, default=0, help="latency added to every Immich request")
+    parser.add_argument("--error-rate", type=float, default=0, help="share of Immich requests answered with 503")
+    parser.add_argument("--redis-url", help="use this Redis instead of in-process fakeredis")
+    parser.add_argument("--trace", metavar="DIR", help="run the job with tracing and keep its trace under DIR")
+    parser.add_argument("--output", help="result file (default: bench-import-<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    google_port, immich_port = free_port(), free_port()
+    google_url, immich_url = f"http://127.0.0.1:{google_port}", f"http://127.0.0.1:{immich_port}"
+    servers = multiprocessing.get_context("spawn").Process(
+        target=serve, args=(google_port, immich_port, args.items, args.size_kb * 1024, args.latency_ms / 1000, args.error_rate),
+        daemon=True)
+    servers.start()
+    try:
+        wait_until_up(f"{google_url}/docs")
+        wait_until_up(f"{immich_url}/docs")
+        with tempfile.TemporaryDirectory() as workdir:
+            results = run_import(args, google_url, immich_url, Path(workdir))
+    finally:
+        servers.terminate()
+        servers.join()
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "params": {name: value for name, value in vars(args).items() if name not in ("output", "compare", "redis_url", "trace")},
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    output = Path(args.output or f"bench-import-{commit}.json")
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"saved to {output}")
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text()), report)
+
+if __name__ == "__main__":
+    main()
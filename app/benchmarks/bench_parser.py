@@ -0,0 +1,43 @@
+"""Compare the raw-bytes album page scanner against the BeautifulSoup parser.
+
+Usage: python -m app.benchmarks.bench_parser [--items 1000 10000 50000] [--repeat 3]
+"""
+import argparse
+import time
+import tracemalloc
+from app.benchmarks.fixtures import make_album_page
+from app.utils.google_photos_extractor import GooglePhotosExtractor
+
+PARSERS = {
+    "scanner": GooglePhotosExtractor.parse_album_page,
+    "soup": GooglePhotosExtractor.parse_album_page_soup,
+}
+
+def measure(parse, page: bytes, repeat: int):
+    """Best wall time over `repeat` runs, then peak traced memory of one more run."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse(page)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    parse(page)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(result["items"])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'items':>7} {'page':>9} {'parser':>8} {'time':>9} {'peak mem':>10} {'found':>7}")
+    for count in args.items:
+        page = make_album_page(count)
+        for name, parse in PARSERS.items():
+            seconds, peak, found = measure(parse, page, args.repeat)
+            print(f"{count:>7} {len(page) / 2**20:>7.1f}MB {name:>8} {seconds * 1000:>7.0f}ms {peak / 2**20:>8.1f}MB {found:>7}")
+
+if __name__ == "__main__":
+    main()
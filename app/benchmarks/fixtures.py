@@ -0,0 +1,91 @@
+import base64
+import json
+import struct
+from typing import List, Optional, Tuple
+
+# Body of a 1x1 baseline JPEG (everything after SOI), used behind the EXIF segment
+_TINY_JPEG_BODY = base64.b64decode(
+    "/9sAQwD//////////////////////////////////////////////////////////////////////////////////////8IACwgA"
+    "AQABAQERAP/EABQQAQAAAAAAAAAAAAAAAAAAAAD/2gAIAQEAAT8Q"
+)
+
+ASCII, SHORT, LONG, RATIONAL = 2, 3, 4, 5
+
+def _ifd(entries: List[Tuple[int, int, int, bytes]], offset: int) -> bytes:
+    """Little-endian TIFF IFD at `offset`, followed by its out-of-line values."""
+    entries = sorted(entries)
+    data_offset = offset + 2 + 12 * len(entries) + 4
+    table, data = struct.pack("<H", len(entries)), b""
+    for tag, kind, count, value in entries:
+        if len(value) <= 4:
+            table += struct.pack("<HHI", tag, kind, count) + value.ljust(4, b"\0")
+        else:
+            table += struct.pack("<HHII", tag, kind, count, data_offset + len(data))
+            data += value + (b"\0" if len(value) % 2 else b"")
+    return table + struct.pack("<I", 0) + data
+
+def _ascii(text: str) -> Tuple[int, bytes]:
+    raw = text.encode() + b"\0"
+    return len(raw), raw
+
+def _rationals(*values: Tuple[int, int]) -> bytes:
+    return b"".join(struct.pack("<II", num, den) for num, den in values)
+
+def exif_tiff(make: str = "Google", model: str = "Pixel 8", orientation: int = 1,
+              datetime_original: str = "2023:07:14 18:30:05", gps: Optional[Tuple[float, float]] = (37.4219, -122.084)) -> bytes:
+    """A TIFF/EXIF block with the handful of tags the importer cares about."""
+    exif_ifd = [(0x9003, ASCII, *_ascii(datetime_original))]
+    gps_ifd = []
+    if gps:
+        lat, lon = gps
+        def dms(value):
+            value = abs(value)
+            degrees, minutes = int(value), int(value * 60) % 60
+            seconds = round((value * 3600) % 60 * 1000)
+            return _rationals((degrees, 1), (minutes, 1), (seconds, 1000))
+        gps_ifd = [
+            (1, ASCII, 2, b"N\0" if lat >= 0 else b"S\0"), (2, RATIONAL, 3, dms(lat)),
+            (3, ASCII, 2, b"E\0" if lon >= 0 else b"W\0"), (4, RATIONAL, 3, dms(lon)),
+        ]
+
+    def ifd0(exif_offset: int, gps_offset: int) -> bytes:
+        entries = [(0x010F, ASCII, *_ascii(make)), (0x0110, ASCII, *_ascii(model)),
+                   (0x0112, SHORT, 1, struct.pack("<H", orientation)), (0x8769, LONG, 1, struct.pack("<I", exif_offset))]
+        if gps_ifd:
+            entries.append((0x8825, LONG, 1, struct.pack("<I", gps_offset)))
+        return _ifd(entries, 8)
+
+    exif_offset = 8 + len(ifd0(0, 0))
+    exif_block = _ifd(exif_ifd, exif_offset)
+    gps_offset = exif_offset + len(exif_block)
+    gps_block = _ifd(gps_ifd, gps_offset) if gps_ifd else b""
+    return b"II*\0" + struct.pack("<I", 8) + ifd0(exif_offset, gps_offset) + exif_block + gps_block
+
+def make_jpeg(size: int = 0, **exif) -> bytes:
+    """A small JPEG carrying an EXIF APP1 segment, padded with filler to about `size` bytes."""
+    payload = b"Exif\0\0" + exif_tiff(**exif)
+    jpeg = b"\xff\xd8" + b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload + _TINY_JPEG_BODY
+    filler = max(0, size - len(jpeg) - 2)
+    return jpeg + b"\0" * filler + b"\xff\xd9"
+
+def make_album_page(items: int, title: str = "Benchmark Album", album_id: str = "AF1QipAlbum",
+                    media_base: str = "https://photos.google.com") -> bytes:
+    """A shared-album page shaped like Google's: a data callback listing `items` media entries, plus their <img> tags.
+
+    Entries link to `<media_base>/share/<album_id>/photo/<id>`; a local mock
+    server can serve them by passing e.g. `http://127.0.0.1:8001/photos.google.com`.
+    """
+    entries = [[f"AF1Qip{n:08d}", f"{media_base}/share/{album_id}/photo/AF1Qip{n:08d}", 4032, 3024, 1689359405000 + n]
+               for n in range(items)]
+    data = json.dumps([album_id, None, title, entries], separators=(",", ":"))
+    imgs = "".join(f'<div class="tile"><img src="https://lh3.googleusercontent.com/pw/AF1Qip{n:08d}=w256-h256" alt=""></div>'
+                   for n in range(items))
+    page = (
+        f"<!doctype html><html><head><title>{title} - Google Photos</title>"
+        "<script nonce=\"x\">window.WIZ_global_data = {\"foo\": \"bar\"};</script></head><body>"
+        f"{imgs}"
+        "<script nonce=\"x\">AF_initDataCallback({key: 'ds:0', hash: '1', data:[null,[]], sideChannel: {}});</script>"
+        f"<script nonce=\"x\">AF_initDataCallback({{key: 'ds:1', hash: '2', data:{data}, sideChannel: {{}}}});</script>"
+        "</body></html>"
+    )
+    return page.encode()
@@ -0,0 +1,31 @@
+import hashlib
+from fastapi import FastAPI, Request, Response
+from app.benchmarks.fixtures import make_album_page, make_jpeg
+
+def create_mock_google(items_per_album: int, media_size: int) -> FastAPI:
+    """A stand-in for Google Photos shared albums: album pages at /share/<album> and their media.
+
+    Every photo is a distinct JPEG of about `media_size` bytes with EXIF, so
+    nothing is skipped as a duplicate. Media answers with an ETag and honours
+    simple `Range: bytes=N-` requests like Google's media servers.
+    """
+    app = FastAPI()
+
+    @app.get("/share/{album_id}")
+    async def album_page(album_id: str, request: Request):
+        media_base = f"{str(request.base_url).rstrip('/')}/photos.google.com"
+        page = make_album_page(items_per_album, title=f"Benchmark {album_id}", album_id=album_id, media_base=media_base)
+        return Response(page, media_type="text/html")
+
+    @app.get("/photos.google.com/share/{album_id}/photo/{photo_id}")
+    async def media(album_id: str, photo_id: str, request: Request):
+        body = make_jpeg(size=media_size, model=f"{album_id}/{photo_id}")
+        headers = {"ETag": f'"{hashlib.md5(body).hexdigest()}"', "Accept-Ranges": "bytes"}
+        range_header = request.headers.get("range", "")
+        if range_header.startswith("bytes=") and range_header.endswith("-"):
+            start = int(range_header[len("bytes="):-1])
+            headers["Content-Range"] = f"bytes {start}-{len(body) - 1}/{len(body)}"
+            return Response(body[start:], status_code=206, media_type="image/jpeg", headers=headers)
+        return Response(body, media_type="image/jpeg", headers=headers)
+
+    return app
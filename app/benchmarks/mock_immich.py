@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import random
+import uuid
+from typing import Dict, List
+from fastapi import FastAPI, File, Request, UploadFile
+from fastapi.responses import JSONResponse
+
+class MockImmichState:
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.assets: Dict[str, str] = {}  # sha1 hex -> asset id
+        self.albums: Dict[str, dict] = {}  # album id -> {"albumName", "assetIds"}
+        self.uploads = 0
+        self.requests: List[str] = []
+        # Seconds added to every request, and the share of requests (other than login) answered with a 503
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+
+def create_mock_immich(state: MockImmichState = None) -> FastAPI:
+    """A small in-memory stand-in for the parts of the Immich API the importer uses."""
+    state = state or MockImmichState()
+    app = FastAPI()
+    app.state.immich = state
+
+    @app.middleware("http")
+    async def record(request: Request, call_next):
+        state.requests.append(f"{request.method} {request.url.path}")
+        if state.latency:
+            await asyncio.sleep(state.latency)
+        if state.error_rate and request.url.path != "/api/auth/login" and state.random.random() < state.error_rate:
+            return JSONResponse({"message": "Injected error"}, status_code=503)
+        return await call_next(request)
+
+    @app.post("/api/auth/login")
+    async def login(body: dict):
+        return JSONResponse({"accessToken": "mock-token", "userEmail": body.get("email"), "name": "Mock", "userId": "user-1"}, status_code=201)
+
+    @app.get("/api/users/me")
+    async def me():
+        return {"id": "user-1", "email": "mock@immich", "name": "Mock"}
+
+    @app.get("/api/albums")
+    async def list_albums():
+        return [{"id": album_id, "albumName": album["albumName"]} for album_id, album in state.albums.items()]
+
+    @app.post("/api/albums")
+    async def create_album(body: dict):
+        album_id = str(uuid.uuid4())
+        state.albums[album_id] = {"albumName": body["albumName"], "assetIds": []}
+        return JSONResponse({"id": album_id, "albumName": body["albumName"]}, status_code=201)
+
+    @app.put("/api/albums/{album_id}/assets")
+    async def add_assets(album_id: str, body: dict):
+        album = state.albums.get(album_id)
+        results = []
+        for asset_id in body["ids"]:
+            if album is None or asset_id not in state.assets.values():
+                results.append({"id": asset_id, "success": False, "error": "not_found"})
+            elif asset_id in album["assetIds"]:
+                results.append({"id": asset_id, "success": False, "error": "duplicate"})
+            else:
+                album["assetIds"].append(asset_id)
+                results.append({"id": asset_id, "success": True})
+        return results
+
+    @app.post("/api/assets")
+    async def upload(assetData: UploadFile = File(...)):
+        checksum = hashlib.sha1(await assetData.read()).hexdigest()
+        if checksum in state.assets:
+            return JSONResponse({"id": state.assets[checksum], "status": "duplicate"}, status_code=200)
+        state.uploads += 1
+        state.assets[checksum] = str(uuid.uuid4())
+        return JSONResponse({"id": state.assets[checksum], "status": "created"}, status_code=201)
+
+    @app.post("/api/assets/bulk-upload-check")
+    async def bulk_upload_check(body: dict):
+        results = []
+        for asset in body["assets"]:
+            existing = state.assets.get(asset["checksum"])
+            if existing:
+                results.append({"id": asset["id"], "action": "reject", "reason": "duplicate", "assetId": existing})
+            else:
+                results.append({"id": asset["id"], "action": "accept"})
+        return {"results": results}
+
+    return app
@@ -5,7 +5,7 @@ from sqlalchemy import engine_from_config, pool
 from alembic import context
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
-from app.models import base, job, album, item
+from app.models import base, job, album, item, manifest
 
 config = context.config
 fileConfig(config.config_file_name)
@@ -0,0 +1,76 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+job_status = sa.Enum('QUEUED', 'RUNNING', 'DONE', 'FAILED', 'CANCELLED', 'PAUSED', name='jobstatus')
+auth_mode = sa.Enum('API_KEY', 'CREDENTIALS', name='authmode')
+album_status = sa.Enum('PENDING', 'DONE', 'FAILED', name='albumstatus')
+item_status = sa.Enum('PENDING', 'DOWNLOADING', 'UPLOADING', 'DONE', 'SKIPPED', 'FAILED', name='itemstatus')
+
+
+def upgrade():
+    op.create_table(
+        'jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column('status', job_status, nullable=False),
+        sa.Column('immich_url', sa.String(), nullable=False),
+        sa.Column('immich_auth_mode', auth_mode, nullable=False),
+        sa.Column('encrypted_api_key', sa.String(), nullable=True),
+        sa.Column('encrypted_email', sa.String(), nullable=True),
+        sa.Column('encrypted_password', sa.String(), nullable=True),
+        sa.Column('encrypted_access_token', sa.String(), nullable=True),
+        sa.Column('album_links', sa.JSON(), nullable=False),
+        sa.Column('options', sa.JSON(), nullable=False),
+        sa.Column('progress', sa.JSON(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('log_tail', sa.Text(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=True),
+    )
+    op.create_table(
+        'albums',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('job_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('jobs.id'), nullable=False),
+        sa.Column('source_url', sa.String(), nullable=False),
+        sa.Column('source_title', sa.String(), nullable=True),
+        sa.Column('immich_album_id', sa.String(), nullable=True),
+        sa.Column('status', album_status, nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+    )
+    op.create_table(
+        'items',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('job_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('jobs.id'), nullable=False),
+        sa.Column('album_id', sa.Integer(), sa.ForeignKey('albums.id'), nullable=False),
+        sa.Column('source_media_url', sa.String(), nullable=False),
+        sa.Column('source_filename', sa.String(), nullable=True),
+        sa.Column('mime', sa.String(), nullable=True),
+        sa.Column('bytes', sa.Integer(), nullable=True),
+        sa.Column('sha256', sa.String(), nullable=True),
+        sa.Column('exif_json', sa.JSON(), nullable=True),
+        sa.Column('metadata_quality', sa.String(), nullable=True),
+        sa.Column('status', item_status, nullable=False),
+        sa.Column('immich_asset_id', sa.String(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table('items')
+    op.drop_table('albums')
+    op.drop_table('jobs')
+    item_status.drop(op.get_bind(), checkfirst=True)
+    album_status.drop(op.get_bind(), checkfirst=True)
+    auth_mode.drop(op.get_bind(), checkfirst=True)
+    job_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,26 @@
+"""indexes for per-item resume and dedupe lookups
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_items_job_id_source_media_url', 'items', ['job_id', 'source_media_url'])
+    op.create_index('ix_items_sha256_status', 'items', ['sha256', 'status'])
+    # Videos larger than 2 GiB overflow a 32-bit integer
+    op.alter_column('items', 'bytes', type_=sa.BigInteger(), existing_type=sa.Integer(), existing_nullable=True)
+
+
+def downgrade():
+    op.alter_column('items', 'bytes', type_=sa.Integer(), existing_type=sa.BigInteger(), existing_nullable=True)
+    op.drop_index('ix_items_sha256_status', table_name='items')
+    op.drop_index('ix_items_job_id_source_media_url', table_name='items')
@@ -0,0 +1,36 @@
+"""per-album manifests for incremental sync
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'sync_manifests',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('immich_url', sa.String(), nullable=False),
+        sa.Column('source_url', sa.String(), nullable=False),
+        sa.Column('source_title', sa.String(), nullable=True),
+        sa.Column('immich_album_id', sa.String(), nullable=True),
+        sa.Column('synced_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint('immich_url', 'source_url', name='uq_sync_manifests_immich_url_source_url'),
+    )
+    op.create_table(
+        'sync_manifest_items',
+        sa.Column('manifest_id', sa.Integer(), sa.ForeignKey('sync_manifests.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('media_id', sa.String(), primary_key=True),
+    )
+
+
+def downgrade():
+    op.drop_table('sync_manifest_items')
+    op.drop_table('sync_manifests')
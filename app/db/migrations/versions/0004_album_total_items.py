@@ -0,0 +1,21 @@
+"""album item count for resuming from the items table
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('albums', sa.Column('total_items', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('albums', 'total_items')
@@ -0,0 +1,25 @@
+"""indexes for the paginated job list and per-job item counts
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_jobs_created_at_id', 'jobs', ['created_at', 'id'])
+    op.create_index('ix_jobs_status_created_at_id', 'jobs', ['status', 'created_at', 'id'])
+    op.create_index('ix_items_job_id_status', 'items', ['job_id', 'status'], postgresql_include=['bytes'])
+
+
+def downgrade():
+    op.drop_index('ix_items_job_id_status', table_name='items')
+    op.drop_index('ix_jobs_status_created_at_id', table_name='jobs')
+    op.drop_index('ix_jobs_created_at_id', table_name='jobs')
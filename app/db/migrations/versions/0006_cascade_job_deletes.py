@@ -0,0 +1,42 @@
+"""cascading job deletes and the DELETING job status
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table), with PostgreSQL's default constraint names
+FOREIGN_KEYS = [
+    ('albums', 'job_id', 'jobs'),
+    ('items', 'job_id', 'jobs'),
+    ('items', 'album_id', 'albums'),
+]
+
+
+def _recreate_foreign_keys(ondelete):
+    for table, column, referenced in FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referenced, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE jobstatus ADD VALUE IF NOT EXISTS 'DELETING'")
+    # Cascades look children up by these columns
+    op.create_index('ix_albums_job_id', 'albums', ['job_id'])
+    op.create_index('ix_items_album_id', 'items', ['album_id'])
+    _recreate_foreign_keys('CASCADE')
+
+
+def downgrade():
+    # PostgreSQL can't drop an enum value; DELETING stays in the type
+    _recreate_foreign_keys(None)
+    op.drop_index('ix_items_album_id', table_name='items')
+    op.drop_index('ix_albums_job_id', table_name='albums')
@@ -11,9 +11,11 @@ class AlbumStatus(str, enum.Enum):
 class Album(Base):
     __tablename__ = "albums"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    job_id = Column(UUID(as_uuid=True), ForeignKey("jobs.id"), nullable=False)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False, index=True)
     source_url = Column(String, nullable=False)
     source_title = Column(String, nullable=True)
     immich_album_id = Column(String, nullable=True)
     status = Column(Enum(AlbumStatus), nullable=False, default=AlbumStatus.PENDING)
     error = Column(Text, nullable=True)
+    # Set once a row exists for every item, so a resume can work from the items table
+    total_items = Column(Integer, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, ForeignKey, Enum, Text, JSON, LargeBinary
+from sqlalchemy import Column, String, Integer, BigInteger, ForeignKey, Enum, Text, JSON, LargeBinary, Index
 from sqlalchemy.dialects.postgresql import UUID
 from app.models.base import Base
 import enum
@@ -13,13 +13,19 @@ class ItemStatus(str, enum.Enum):
 
 class Item(Base):
     __tablename__ = "items"
+    __table_args__ = (
+        Index("ix_items_job_id_source_media_url", "job_id", "source_media_url"),
+        Index("ix_items_sha256_status", "sha256", "status"),
+        # Per-job counts; on PostgreSQL bytes is included so they come from the index alone
+        Index("ix_items_job_id_status", "job_id", "status", postgresql_include=["bytes"]),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
-    job_id = Column(UUID(as_uuid=True), ForeignKey("jobs.id"), nullable=False)
-    album_id = Column(Integer, ForeignKey("albums.id"), nullable=False)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
+    album_id = Column(Integer, ForeignKey("albums.id", ondelete="CASCADE"), nullable=False, index=True)
     source_media_url = Column(String, nullable=False)
     source_filename = Column(String, nullable=True)
     mime = Column(String, nullable=True)
-    bytes = Column(Integer, nullable=True)
+    bytes = Column(BigInteger, nullable=True)
     sha256 = Column(String, nullable=True)
     exif_json = Column(JSON, nullable=True)
     metadata_quality = Column(String, nullable=True)
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, Enum, JSON, Integer, Boolean, Text
+from sqlalchemy import Column, String, DateTime, Enum, JSON, Integer, Boolean, Text, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.models.base import Base
@@ -12,6 +12,8 @@ class JobStatus(str, enum.Enum):
     FAILED = "FAILED"
     CANCELLED = "CANCELLED"
     PAUSED = "PAUSED"
+    # Being removed by a background purge task
+    DELETING = "DELETING"
 
 class AuthMode(str, enum.Enum):
     API_KEY = "API_KEY"
@@ -19,6 +21,11 @@ class AuthMode(str, enum.Enum):
 
 class Job(Base):
     __tablename__ = "jobs"
+    # Keyset pagination of the job list, with and without a status filter
+    __table_args__ = (
+        Index("ix_jobs_created_at_id", "created_at", "id"),
+        Index("ix_jobs_status_created_at_id", "status", "created_at", "id"),
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(Enum(JobStatus), nullable=False, default=JobStatus.QUEUED)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, Integer, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.models.base import Base
+
+class SyncManifest(Base):
+    """What has been imported from one Google Photos album into one Immich server."""
+    __tablename__ = "sync_manifests"
+    __table_args__ = (
+        UniqueConstraint("immich_url", "source_url", name="uq_sync_manifests_immich_url_source_url"),
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    immich_url = Column(String, nullable=False)
+    source_url = Column(String, nullable=False)
+    source_title = Column(String, nullable=True)
+    immich_album_id = Column(String, nullable=True)
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ManifestItem(Base):
+    __tablename__ = "sync_manifest_items"
+    manifest_id = Column(Integer, ForeignKey("sync_manifests.id", ondelete="CASCADE"), primary_key=True)
+    # Google's media ID, stable across re-extractions of the album page
+    media_id = Column(String, primary_key=True)
@@ -19,9 +19,12 @@ class App extends Component {
       skipDuplicates: true,
       downloadConcurrency: 3,
       uploadConcurrency: 3,
-      storeStaging: true
+      storeStaging: true,
+      sync: false,
+      trace: false
     },
     jobs: [],
+    nextCursor: null,
     loading: false,
     error: null
   };
@@ -38,19 +41,49 @@ class App extends Component {
       }
     }
     this.loadJobs();
-    this.pollInterval = setInterval(() => this.loadJobs(), 5000);
+    this.subscribeJobEvents();
   }
 
   componentWillUnmount() {
-    if (this.pollInterval) clearInterval(this.pollInterval);
+    if (this.events) this.events.close();
   }
 
-  loadJobs = async () => {
+  // Live job updates over server-sent events; the browser reconnects on its
+  // own and resumes from the last event id it saw.
+  subscribeJobEvents = () => {
+    this.events = new EventSource('/api/jobs/events');
+    this.events.addEventListener('status', e => {
+      const event = JSON.parse(e.data);
+      if (event.status === 'DELETED') {
+        this.setState({ jobs: this.state.jobs.filter(job => job.id !== event.job_id) });
+        return;
+      }
+      if (!this.state.jobs.some(job => job.id === event.job_id)) {
+        this.loadJobs();
+        return;
+      }
+      this.updateJob(event.job_id, { status: event.status, last_error: event.last_error });
+    });
+    this.events.addEventListener('progress', e => {
+      const event = JSON.parse(e.data);
+      this.updateJob(event.job_id, { progress: event.progress });
+    });
+  };
+
+  updateJob = (jobId, changes) => {
+    this.setState({
+      jobs: this.state.jobs.map(job => job.id === jobId ? { ...job, ...changes } : job)
+    });
+  };
+
+  // Loads the newest page, or with `more` the page after the jobs shown
+  loadJobs = async (more = false) => {
+    const cursor = more && this.state.nextCursor;
     try {
-      const r = await fetch('/api/jobs');
+      const r = await fetch('/api/jobs' + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''));
       if (r.ok) {
-        const jobs = await r.json();
-        this.setState({ jobs });
+        const page = await r.json();
+        this.setState({ jobs: cursor ? [...this.state.jobs, ...page.jobs] : page.jobs, nextCursor: page.next_cursor });
       }
     } catch (e) {
       console.error('Failed to load jobs:', e);
@@ -145,7 +178,9 @@ class App extends Component {
       skip_duplicates: this.state.options.skipDuplicates,
       download_concurrency: this.state.options.downloadConcurrency,
       upload_concurrency: this.state.options.uploadConcurrency,
-      store_staging: this.state.options.storeStaging
+      store_staging: this.state.options.storeStaging,
+      sync: this.state.options.sync,
+      trace: this.state.options.trace
     };
     
     if (loginInfo.authMode === 'API_KEY') {
@@ -372,6 +407,34 @@ class App extends Component {
                   h('div', { class: 'option-title' }, 'Keep Files'),
                   h('div', { class: 'option-description' }, 'Store downloads on disk for backup')
                 ])
+              ]),
+              h('div', { 
+                class: s.options.sync ? 'option-card active' : 'option-card',
+                onClick: () => this.setState({ options: { ...s.options, sync: !s.options.sync }})
+              }, [
+                h('input', { 
+                  type: 'checkbox', 
+                  checked: s.options.sync,
+                  onChange: (e) => e.stopPropagation()
+                }), 
+                h('div', { class: 'option-content' }, [
+                  h('div', { class: 'option-title' }, 'Sync Only New'),
+                  h('div', { class: 'option-description' }, 'Import only items added since the last import of each album')
+                ])
+              ]),
+              h('div', { 
+                class: s.options.trace ? 'option-card active' : 'option-card',
+                onClick: () => this.setState({ options: { ...s.options, trace: !s.options.trace }})
+              }, [
+                h('input', { 
+                  type: 'checkbox', 
+                  checked: s.options.trace,
+                  onChange: (e) => e.stopPropagation()
+                }), 
+                h('div', { class: 'option-content' }, [
+                  h('div', { class: 'option-title' }, 'Record Trace'),
+                  h('div', { class: 'option-description' }, 'Time every item\'s steps; download from /api/jobs/<id>/trace')
+                ])
               ])
             ])
           ]),
@@ -448,12 +511,18 @@ class App extends Component {
                     job.progress && h('div', { class: 'job-meta-item' }, [
                       '📊',
                       JSON.stringify(job.progress)
+                    ]),
+                    job.items && job.items.total > 0 && h('div', { class: 'job-meta-item' }, [
+                      '🧮',
+                      `${job.items.done} done · ${job.items.failed} failed · ${job.items.skipped} skipped · ` +
+                        `${(job.items.bytes / 1048576).toFixed(1)} MB`
                     ])
                   ]),
                   job.last_error && h('div', { class: 'error-msg' }, job.last_error)
                 ])
               )
-        )
+        ),
+        s.nextCursor && h('button', { onClick: () => this.loadJobs(true), class: 'btn-primary' }, 'Load more')
       ])
     ]);
   }
@@ -1,4 +1,13 @@
+import uuid
 import pytest
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.models.base import Base
+from app.models.job import Job, JobStatus, AuthMode
+from app.benchmarks.mock_immich import MockImmichState, create_mock_immich
+
+_real_async_methods = {name: getattr(httpx.AsyncClient, name) for name in ("get", "post", "put")}
 
 @pytest.fixture(autouse=True)
 def no_requests(monkeypatch):
@@ -15,3 +24,37 @@ def no_requests(monkeypatch):
         monkeypatch.setattr("httpx.AsyncClient.get", mock_http_method)
     if hasattr(httpx.AsyncClient, 'post'):
         monkeypatch.setattr("httpx.AsyncClient.post", mock_http_method)
+
+@pytest.fixture
+def mock_immich(monkeypatch):
+    """In-process mock Immich server; returns (state, transport) for ImmichClient(transport=...)."""
+    # Requests through the ASGI transport never leave the process, so the
+    # real client methods are safe to restore for tests using this fixture.
+    for name, method in _real_async_methods.items():
+        monkeypatch.setattr(httpx.AsyncClient, name, method)
+    state = MockImmichState()
+    return state, httpx.ASGITransport(app=create_mock_immich(state))
+
+@pytest.fixture
+def session_factory():
+    """Sessions on a fresh in-memory SQLite database with all tables created."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+@pytest.fixture
+def make_job(db):
+    """Adds and commits a Job; keyword arguments override the model defaults used here."""
+    def make(status=JobStatus.RUNNING, **fields):
+        job = Job(**{"id": uuid.uuid4(), "immich_url": "http://immich", "immich_auth_mode": AuthMode.API_KEY,
+                     "album_links": [], "options": {}, "status": status, **fields})
+        db.add(job)
+        db.commit()
+        return job
+    return make
@@ -0,0 +1,50 @@
+import asyncio
+import time
+import httpx
+from app.utils.adaptive_limiter import AdaptiveLimiter, AdaptiveTransport, HostLimiters, retry_after_seconds
+
+def test_limit_grows_additively_and_halves_once_per_round():
+    limiter = AdaptiveLimiter(2, max_limit=4, window=1000)
+    for _ in range(10):
+        limiter.on_success(time.monotonic(), 0.1)
+    assert limiter.limit == 4
+    started = time.monotonic()
+    limiter.on_throttle(started)
+    # A second 429 from a request of the same round doesn't cut again
+    limiter.on_throttle(started)
+    assert limiter.limit == 2
+    limiter.on_throttle(time.monotonic())
+    assert limiter.limit == 1
+
+def test_latency_spike_backs_off():
+    limiter = AdaptiveLimiter(8, window=4, tolerance=2.0)
+    for latency in [0.1] * 4 + [0.5] * 4:
+        limiter.on_success(time.monotonic(), latency)
+    assert limiter.limit < 8
+
+def test_retry_after_seconds():
+    assert retry_after_seconds("3") == 3
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds("garbage") is None
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+
+def test_transport_honours_retry_after():
+    times = []
+
+    def handler(request):
+        times.append(time.monotonic())
+        if len(times) == 1:
+            return httpx.Response(429, headers={"Retry-After": "0.2"})
+        return httpx.Response(200, content=b"ok")
+
+    limiters = HostLimiters(4)
+
+    async def run():
+        async with httpx.AsyncClient(transport=AdaptiveTransport(httpx.MockTransport(handler), limiters)) as http:
+            assert (await http.request("GET", "http://lh3/a")).status_code == 429
+            assert (await http.request("GET", "http://lh3/a")).content == b"ok"
+
+    asyncio.run(run())
+    assert times[1] - times[0] >= 0.2
+    assert limiters.snapshot() == {"lh3": 2}
+    assert limiters.get("lh3").in_flight == 0
@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from app.worker.album_batcher import AlbumBatcher
+
+class FakeClient:
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+
+    async def add_assets_to_album(self, album_id, asset_ids):
+        self.calls.append((album_id, list(asset_ids)))
+        return {asset_id: ("no_permission" if asset_id in self.failing else None) for asset_id in asset_ids}
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_by_size_and_on_close():
+    client = FakeClient(failing={"a2"})
+    flushed = []
+
+    async def on_flushed(entries, errors):
+        flushed.append(([asset_id for asset_id, _ in entries], errors))
+
+    batcher = AlbumBatcher(client, on_flushed, batch_size=2, max_delay=60)
+    for asset_id in ["a1", "a2", "a3"]:
+        await batcher.add("album", asset_id)
+    assert client.calls == [("album", ["a1", "a2"])]
+    assert flushed == [(["a1", "a2"], {"a2": "no_permission"})]
+
+    await batcher.close()
+    assert client.calls[-1] == ("album", ["a3"])
+    assert flushed[-1] == (["a3"], {})
+
+@pytest.mark.asyncio
+async def test_batcher_flushes_on_time_limit():
+    client = FakeClient()
+
+    async def on_flushed(entries, errors):
+        pass
+
+    batcher = AlbumBatcher(client, on_flushed, batch_size=100, max_delay=0.05)
+    await batcher.add("album", "a1")
+    await asyncio.sleep(0.2)
+    assert client.calls == [("album", ["a1"])]
+    await batcher.close()
+    assert len(client.calls) == 1
@@ -1,7 +1,37 @@
 import io
-from app.utils.dedupe import sha256_stream
+import hashlib
+from app.utils.dedupe import sha256_stream, DigestWriter, DigestIndex
 
 def test_sha256_stream():
     data = b"hello world"
     f = io.BytesIO(data)
     assert sha256_stream(f) == "b94d27b9934d3e08a52e52d7da7dabfac484efe37a5380ee9088f7ace2efcde9"
+
+def test_digest_writer():
+    out = io.BytesIO()
+    writer = DigestWriter(out, ("sha256", "sha1"), head_size=8)
+    writer.write(b"hello ")
+    writer.write(b"world")
+    assert out.getvalue() == b"hello world"
+    assert writer.head == b"hello wo"
+    assert writer.bytes_written == 11
+    digests = writer.hexdigests()
+    assert digests["sha256"] == "b94d27b9934d3e08a52e52d7da7dabfac484efe37a5380ee9088f7ace2efcde9"
+    assert digests["sha1"] == "2aae6c35c94fcfb415dbe95f408b9ce91ee846ed"
+
+def test_digest_index_exact_and_bloom():
+    known = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(1000)]
+    unknown = [hashlib.sha256(f"x{i}".encode()).hexdigest() for i in range(1000)]
+    # Sorted input is packed as is, unsorted input with repeats is sorted first
+    for digests in (sorted(known), known + known[:10]):
+        exact = DigestIndex(digests)
+        assert exact.exact and len(exact) == 1000
+        assert all(d in exact for d in known) and not any(d in exact for d in unknown)
+    exact.add(unknown[0])
+    exact.add(known[0])
+    assert unknown[0] in exact and len(exact) == 1001
+
+    bloom = DigestIndex(known, bloom=True, capacity=1000, error_rate=0.01)
+    assert not bloom.exact
+    assert all(d in bloom for d in known)
+    assert sum(d in bloom for d in unknown) < 50
@@ -0,0 +1,69 @@
+import asyncio
+import hashlib
+import httpx
+import pytest
+from app.worker.download import DownloadIncomplete, download
+
+CONTENT = bytes(range(256)) * 4000
+
+class DroppedStream(httpx.AsyncByteStream):
+    """Sends the first `cut` bytes of `data`, then fails like a dropped connection."""
+
+    def __init__(self, data: bytes, cut: int):
+        self.data = data
+        self.cut = cut
+
+    async def __aiter__(self):
+        yield self.data[:self.cut]
+        raise httpx.ReadError("connection reset")
+
+def ranged_server(requests, etag='"v1"', drop_first_at=None):
+    def handler(request):
+        requests.append(dict(request.headers))
+        start = 0
+        if "range" in request.headers and request.headers.get("if-range") == etag:
+            start = int(request.headers["range"][len("bytes="):-1])
+        body = CONTENT[start:]
+        headers = {"etag": etag, "content-length": str(len(body))}
+        if start:
+            headers["content-range"] = f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}"
+        if drop_first_at and len(requests) == 1:
+            return httpx.Response(200, headers=headers, stream=DroppedStream(body, drop_first_at))
+        return httpx.Response(206 if start else 200, headers=headers, content=body)
+    return handler
+
+def fetch(handler, tmp_path):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+            return await download(http, "http://lh3/video", tmp_path / "video.mp4", tmp_path / "key.part")
+    return asyncio.run(run())
+
+def test_download_resumes_after_dropped_connection(tmp_path):
+    requests = []
+    handler = ranged_server(requests, drop_first_at=300000)
+    with pytest.raises(httpx.ReadError):
+        fetch(handler, tmp_path)
+    assert (tmp_path / "key.part").stat().st_size == 300000
+
+    writer = fetch(handler, tmp_path)
+    assert requests[1]["range"] == "bytes=300000-"
+    assert (tmp_path / "video.mp4").read_bytes() == CONTENT
+    assert writer.hexdigests()["sha256"] == hashlib.sha256(CONTENT).hexdigest()
+    assert not (tmp_path / "key.part").exists() and not (tmp_path / "key.part.json").exists()
+
+def test_download_starts_over_when_file_changed(tmp_path):
+    requests = []
+    with pytest.raises(httpx.ReadError):
+        fetch(ranged_server(requests, drop_first_at=1000), tmp_path)
+    # The server now has another version, so If-Range gets the whole file
+    writer = fetch(ranged_server(requests, etag='"v2"'), tmp_path)
+    assert requests[1]["if-range"] == '"v1"'
+    assert writer.bytes_written == len(CONTENT)
+    assert (tmp_path / "video.mp4").read_bytes() == CONTENT
+
+def test_download_short_body_is_kept_for_resume(tmp_path):
+    def handler(request):
+        return httpx.Response(200, headers={"content-length": str(len(CONTENT))}, content=CONTENT[:10])
+    with pytest.raises(DownloadIncomplete):
+        fetch(handler, tmp_path)
+    assert (tmp_path / "key.part").stat().st_size == 10
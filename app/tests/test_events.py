@@ -0,0 +1,30 @@
+import json
+import fakeredis
+import pytest
+from app.worker.events import ALL_JOBS_STREAM, JobEvents, job_stream, read_events
+
+@pytest.mark.asyncio
+async def test_job_events_replay_from_last_event_id():
+    server = fakeredis.FakeServer()
+    events = JobEvents(fakeredis.FakeRedis(server=server), "job-1")
+    events.status("RUNNING")
+    events.log("Starting")
+    events.progress('{"items_processed": 1}', "processing_items")
+    events.progress('{"items_processed": 2}', "processing_items")  # throttled
+    events.progress('{"items_processed": 2}', "completed")
+
+    redis = fakeredis.FakeAsyncRedis(server=server)
+    stream = read_events(redis, job_stream("job-1"), block_ms=10)
+    messages = [await stream.__anext__() for _ in range(4)]
+    assert [m["event"] for m in messages] == ["status", "log", "progress", "progress"]
+    assert json.loads(messages[3]["data"])["progress"] == '{"items_processed": 2}'
+
+    # A reconnecting client only gets what it has not seen yet
+    events.log("Done")
+    resumed = read_events(redis, job_stream("job-1"), last_id=messages[-1]["id"], block_ms=10)
+    message = await resumed.__anext__()
+    assert json.loads(message["data"])["message"] == "Done"
+
+    # Logs stay on the job's own stream; status and progress are shared
+    shared = await redis.xrange(ALL_JOBS_STREAM)
+    assert len(shared) == 3
@@ -0,0 +1,67 @@
+import os
+import sys
+import textwrap
+from app.benchmarks import fixtures
+from app.benchmarks.fixtures import make_jpeg
+from app.utils.exif import ExifToolPool, read_exif_header
+
+FAKE_EXIFTOOL = textwrap.dedent('''\
+    import json, sys, time
+    args = []
+    for line in sys.stdin:
+        line = line.rstrip("\\n")
+        if line.startswith("-execute"):
+            files = [a for i, a in enumerate(args) if not a.startswith("-") and args[i - 1] != "-charset"]
+            if any("hang" in f for f in files):
+                time.sleep(60)
+            print(json.dumps([{"SourceFile": f, "Model": "Fake"} for f in files]))
+            print("{ready%s}" % line[len("-execute"):], flush=True)
+            args = []
+        elif args[-1:] == ["-stay_open"] and line == "False":
+            break
+        else:
+            args.append(line)
+''')
+
+def make_fake_exiftool(tmp_path):
+    script = tmp_path / "exiftool"
+    script.write_text(f"#!{sys.executable}\n" + FAKE_EXIFTOOL)
+    os.chmod(script, 0o755)
+    return str(script)
+
+def test_pool_batches_and_restarts_hung_worker(tmp_path):
+    pool = ExifToolPool(size=1, timeout=1, executable=make_fake_exiftool(tmp_path))
+    try:
+        results = pool.extract(["/a.jpg", "/b.jpg"])
+        assert results == {"/a.jpg": {"SourceFile": "/a.jpg", "Model": "Fake"},
+                           "/b.jpg": {"SourceFile": "/b.jpg", "Model": "Fake"}}
+        first_pid = pool._workers[0].proc.pid
+
+        # The hung file times out and is isolated; the rest of the batch still gets read
+        results = pool.extract(["/c.jpg", "/hang.jpg"])
+        assert results["/c.jpg"] == {"SourceFile": "/c.jpg", "Model": "Fake"}
+        assert results["/hang.jpg"] is None
+
+        assert pool.extract(["/d.jpg"])["/d.jpg"]["Model"] == "Fake"
+        assert pool._workers[0].proc.pid != first_pid
+    finally:
+        pool.close()
+
+def test_read_exif_header_matches_exiftool_keys():
+    head = make_jpeg(size=200_000, orientation=6, gps=(-33.8568, 151.2153))[:96 * 1024]
+    exif = read_exif_header(head)
+    assert exif["Model"] == "Pixel 8"
+    assert exif["DateTimeOriginal"] == "2023:07:14 18:30:05"
+    assert exif["Orientation"] == 6
+    assert round(exif["GPSLatitude"], 4) == -33.8568 and round(exif["GPSLongitude"], 4) == 151.2153
+    # Videos and unknown formats are left to exiftool
+    assert read_exif_header(b"\x00\x00\x00\x18ftypisom" + bytes(100)) is None
+    assert read_exif_header(b"\xff\xd8\xff\xd9") is None
+
+def test_read_exif_header_drops_gps_without_a_fix(monkeypatch):
+    # Phones without a GPS fix write 0/0 rationals
+    rationals = fixtures._rationals
+    monkeypatch.setattr(fixtures, "_rationals", lambda *values: rationals(*((0, 0) for _ in values)))
+    exif = read_exif_header(make_jpeg(orientation=3))
+    assert exif["Model"] == "Pixel 8" and exif["Orientation"] == 3
+    assert "GPSLatitude" not in exif and "GPSLongitude" not in exif
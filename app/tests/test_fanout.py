@@ -0,0 +1,29 @@
+import fakeredis
+from app.worker.fanout import FanIn, album_lock
+
+def test_fan_in_counts_sub_tasks():
+    fan_in = FanIn(fakeredis.FakeRedis(), "job1")
+    fan_in.reset(2)
+    assert fan_in.done() == (False, False)
+    # The second album task splits its album into three chunks
+    fan_in.add(3, album_id=7)
+    assert fan_in.done() == (False, False)
+    assert fan_in.done(7) == (False, False)
+    assert fan_in.done(7, error="boom") == (False, False)
+    assert fan_in.done(7) == (True, True)
+    assert fan_in.failed(7) == (1, "boom")
+    assert fan_in.failed() == (1, "boom")
+
+def test_fan_in_rolls_up_progress():
+    fan_in = FanIn(fakeredis.FakeRedis(), "job1")
+    fan_in.reset(2)
+    fan_in.progress({"total_items": 10, "items_processed": 4})
+    totals = fan_in.progress({"total_items": 5, "items_processed": 1, "albums_processed": 0})
+    assert totals == {"albums_processed": 0, "items_processed": 5, "total_items": 15}
+
+def test_album_lock_without_redis(caplog):
+    server = fakeredis.FakeServer()
+    server.connected = False
+    with album_lock(fakeredis.FakeRedis(server=server), "immich:album-index:x", "Trip"):
+        pass
+    assert "creating album unlocked" in caplog.text
@@ -1,14 +1,82 @@
+import fakeredis
 import pytest
-from app.utils.immich_client import ImmichClient
+from app.utils.immich_client import AlbumIndex, ImmichClient
 import httpx
+import hashlib
 
 @pytest.mark.asyncio
 async def test_test_login(monkeypatch):
     async def dummy_post(url, json):
         class DummyResp:
             status_code = 201
-            async def json(self): return {"accessToken": "tok"}
+            def json(self): return {"accessToken": "tok", "userEmail": "a@b.com"}
         return DummyResp()
     client = ImmichClient("http://immich")
     monkeypatch.setattr(client.client, "post", dummy_post)
     assert await client.test_login("a@b.com", "pw")
+
+@pytest.mark.asyncio
+async def test_test_api_key_reuses_pooled_session(monkeypatch):
+    seen = {}
+    async def dummy_get(url, headers=None):
+        seen["headers"] = headers
+        class DummyResp:
+            status_code = 200
+            def json(self): return {"email": "a@b.com", "id": "u1"}
+        return DummyResp()
+    async with ImmichClient("http://immich") as client:
+        pooled = client.client
+        monkeypatch.setattr(client.client, "get", dummy_get)
+        ok, user = await client.test_api_key("key")
+        assert ok and user["email"] == "a@b.com"
+        assert seen["headers"] == {"x-api-key": "key"}
+        client.set_access_token("tok")
+        assert client.client is pooled
+        assert client.client.headers["Authorization"] == "Bearer tok"
+    assert pooled.is_closed
+
+@pytest.mark.asyncio
+async def test_bulk_upload_check_against_mock_server(mock_immich, tmp_path):
+    state, transport = mock_immich
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"jpeg bytes")
+    async with ImmichClient("http://immich", api_key="key", transport=transport) as client:
+        asset_id = await client.upload_asset(str(photo))
+        existing = await client.bulk_upload_check({
+            "known": hashlib.sha1(b"jpeg bytes").hexdigest(),
+            "new": hashlib.sha1(b"other bytes").hexdigest(),
+        })
+        assert existing == {"known": asset_id, "new": None}
+
+        album_id = await client.find_or_create_album("Trip")
+        assert await client.add_assets_to_album(album_id, [asset_id, "missing"]) == {asset_id: None, "missing": "not_found"}
+        # Adding again reports a duplicate, which counts as success
+        assert await client.add_assets_to_album(album_id, [asset_id]) == {asset_id: None}
+    assert state.uploads == 1
+
+@pytest.mark.asyncio
+async def test_find_or_create_album_uses_index(mock_immich):
+    state, transport = mock_immich
+    async with ImmichClient("http://immich", api_key="key", transport=transport) as client:
+        trip = await client.find_or_create_album("Trip")
+        for _ in range(5):
+            assert await client.find_or_create_album("Trip") == trip
+    assert state.requests.count("GET /api/albums") == 1
+    assert state.requests.count("POST /api/albums") == 1
+
+    # Albums created elsewhere are picked up by the refresh on a miss
+    async with ImmichClient("http://immich", api_key="key", transport=transport) as client:
+        await client.find_or_create_album("Other")
+        state.albums["external"] = {"albumName": "Made in UI", "assetIds": []}
+        assert await client.find_or_create_album("Made in UI") == "external"
+        assert await client.find_or_create_album("Trip") == trip
+    assert state.requests.count("POST /api/albums") == 2
+
+def test_album_index_added_to_after_expiry_still_expires():
+    redis = fakeredis.FakeRedis()
+    index = AlbumIndex(redis, "immich:album-index:test", ttl=60)
+    index.load({"Trip": "a1"})
+    redis.delete("immich:album-index:test")
+    index.add("Other", "a2")
+    assert redis.hgetall("immich:album-index:test") == {b"Other": b"a2"}
+    assert 0 < redis.ttl("immich:album-index:test") <= 60
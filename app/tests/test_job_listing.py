@@ -0,0 +1,55 @@
+import uuid
+from datetime import datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.api import main
+from app.db.session import get_db
+from app.models.base import Base
+from app.models.job import Job, JobStatus, AuthMode
+from app.models.album import Album
+from app.models.item import Item, ItemStatus
+
+def test_jobs_are_paged_by_keyset_with_item_counts():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    start = datetime(2026, 1, 1)
+    with session_factory() as db:
+        jobs = [Job(id=uuid.uuid4(), immich_url="http://immich", immich_auth_mode=AuthMode.API_KEY, album_links=[], options={},
+                    status=JobStatus.FAILED if n % 2 else JobStatus.DONE, created_at=start + timedelta(minutes=n // 2))
+                for n in range(5)]
+        db.add_all(jobs)
+        db.flush()
+        album = Album(job_id=jobs[4].id, source_url="http://a")
+        db.add(album)
+        db.flush()
+        for status, size in [(ItemStatus.DONE, 100), (ItemStatus.DONE, 50), (ItemStatus.FAILED, None), (ItemStatus.SKIPPED, 10)]:
+            db.add(Item(job_id=jobs[4].id, album_id=album.id, source_media_url=f"http://a/{status}{size}", status=status, bytes=size))
+        db.commit()
+        # Newest first; jobs created in the same minute are ordered by id
+        expected = [str(job.id) for job in sorted(jobs, key=lambda job: (job.created_at, str(job.id)), reverse=True)]
+        newest = str(jobs[4].id)
+
+    main.app.dependency_overrides[get_db] = lambda: session_factory()
+    try:
+        client = TestClient(main.app)
+        seen, cursor = [], None
+        while True:
+            page = client.get("/api/jobs/", params={"limit": 2, **({"cursor": cursor} if cursor else {})}).json()
+            seen += [job["id"] for job in page["jobs"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == expected
+
+        first = client.get("/api/jobs/", params={"limit": 1}).json()["jobs"][0]
+        assert first["id"] == newest
+        assert first["items"] == {"total": 4, "done": 2, "failed": 1, "skipped": 1, "bytes": 150}
+
+        failed = client.get("/api/jobs/", params={"status": "FAILED"}).json()["jobs"]
+        assert {job["status"] for job in failed} == {"FAILED"} and len(failed) == 2
+        assert client.get("/api/jobs/", params={"cursor": "nope"}).status_code == 400
+    finally:
+        main.app.dependency_overrides.clear()
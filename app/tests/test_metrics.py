@@ -0,0 +1,36 @@
+import uuid
+import fakeredis
+import rq
+from fastapi.testclient import TestClient
+from prometheus_client import CollectorRegistry
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.api import main
+from app.api.metrics import QueueCollector
+from app.models.base import Base
+from app.models.job import Job, JobStatus, AuthMode
+
+def test_metrics_endpoint(monkeypatch):
+    # One shared connection: the collector runs in the test client's thread pool
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as db:
+        db.add(Job(id=uuid.uuid4(), immich_url="http://immich", immich_auth_mode=AuthMode.API_KEY,
+                   album_links=[], options={}, status=JobStatus.QUEUED))
+        db.commit()
+    queue = rq.Queue("import-queue", connection=fakeredis.FakeRedis())
+    queue.enqueue(print, "x")
+    registry = CollectorRegistry()
+    registry.register(QueueCollector(queue, session_factory))
+    monkeypatch.setattr(main, "queue_registry", registry)
+
+    client = TestClient(main.app)
+    assert client.get("/healthz/").status_code == 200
+    body = client.get("/metrics").text
+    assert 'gphotos_rq_tasks{state="queued"} 1.0' in body
+    assert 'gphotos_jobs{status="QUEUED"} 1.0' in body
+    assert 'gphotos_api_request_seconds_count{endpoint="healthz",method="GET",status="200"}' in body
+    assert 'gphotos_import_stage_seconds_count{stage="download"}' in body
+    assert 'gphotos_import_stage_seconds_count{stage="hash"}' in body
@@ -1,9 +1,50 @@
-from app.utils.google_photos_extractor import GooglePhotosExtractor
+import fakeredis
+from app.benchmarks.fixtures import make_album_page
+from app.utils.google_photos_extractor import ExtractionCache, GooglePhotosExtractor
 
 def test_extract_album_html(monkeypatch):
     class DummyResp:
-        text = '<html><title>Test Album</title></html>'
+        content = b'<html><title>Test Album</title></html>'
         def raise_for_status(self): pass
-    monkeypatch.setattr("httpx.get", lambda url, timeout: DummyResp())
+    monkeypatch.setattr("httpx.get", lambda url, **kwargs: DummyResp())
     result = GooglePhotosExtractor.extract_album("http://fake")
-    assert result["title"] == "Sample Album"
+    assert result["title"] == "Test Album"
+    assert result["items"] == []
+
+def test_parse_album_page_callback_data():
+    result = GooglePhotosExtractor.parse_album_page(make_album_page(3, title="Trip &amp; Friends"))
+    assert result["title"] == "Trip & Friends - Google Photos"
+    assert [item["filename_hint"] for item in result["items"]] == ["AF1Qip00000000", "AF1Qip00000001", "AF1Qip00000002"]
+
+def test_parse_album_page_img_fallback():
+    page = (b'<html><body><img data-src="https://lh3.googleusercontent.com/pw/abc=w100&amp;x" src="x.gif">'
+            b'<img src="https://example.com/other.jpg"></body></html>')
+    result = GooglePhotosExtractor.parse_album_page(page)
+    assert result["title"] == "Untitled Album"
+    assert result["items"] == [{"media_url": "https://lh3.googleusercontent.com/pw/abc=w100&x", "filename_hint": "abc=w100&x"}]
+
+def test_extract_album_cache_revalidates(monkeypatch):
+    requests = []
+
+    class PageResp:
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.content = make_album_page(2)
+            self.headers = {"etag": '"v1"'}
+        def raise_for_status(self): pass
+
+    def get(url, headers, **kwargs):
+        requests.append(headers)
+        return PageResp(304 if headers.get("If-None-Match") == '"v1"' else 200)
+
+    monkeypatch.setattr("httpx.get", get)
+    cache = ExtractionCache(fakeredis.FakeRedis(), ttl=60)
+    first = GooglePhotosExtractor.extract_album("http://album", cache)
+    assert GooglePhotosExtractor.extract_album("http://album", cache) == first
+    assert requests == [{}]
+
+    # Once stale the entry is revalidated instead of parsed again
+    cache.ttl = 0
+    monkeypatch.setattr(GooglePhotosExtractor, "parse_album_page", None)
+    assert GooglePhotosExtractor.extract_album("http://album", cache) == first
+    assert requests[1] == {"If-None-Match": '"v1"'}
@@ -0,0 +1,28 @@
+from sqlalchemy import event
+from app.models.album import Album, AlbumStatus
+from app.models.item import Item, ItemStatus
+from app.worker.persistence import ItemWriter
+
+def test_item_writer_batches_inserts_and_updates(db, make_job):
+    job = make_job()
+    album = Album(job_id=job.id, source_url="http://album", status=AlbumStatus.PENDING)
+    db.add(album)
+    db.commit()
+    commits = [0]
+    event.listen(db.get_bind(), "commit", lambda conn: commits.__setitem__(0, commits[0] + 1))
+
+    inserted = {}
+    writer = ItemWriter(db, flush_size=10, flush_interval=60, on_inserted=inserted.update)
+    for n in range(25):
+        writer.add({"job_id": job.id, "album_id": album.id, "source_media_url": f"http://media/{n}",
+                    "status": ItemStatus.DONE, "immich_asset_id": f"asset{n}"})
+    assert commits[0] == 2 and len(writer) == 5
+    writer.flush()
+    assert commits[0] == 3 and len(inserted) == 25
+
+    writer.add({"status": ItemStatus.FAILED, "error": "boom"}, inserted["http://media/3"])
+    writer.flush()
+    failed = db.query(Item).filter(Item.status == ItemStatus.FAILED).all()
+    assert [item.source_media_url for item in failed] == ["http://media/3"]
+    assert failed[0].immich_asset_id == "asset3"
+    assert db.query(Item).count() == 25
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+from app.worker.pipeline import Stage, run_pipeline
+
+@pytest.mark.asyncio
+async def test_run_pipeline_bounds_concurrency():
+    running = {"now": 0, "peak": 0}
+    seen = []
+
+    async def slow(x):
+        running["now"] += 1
+        running["peak"] = max(running["peak"], running["now"])
+        await asyncio.sleep(0.001)
+        running["now"] -= 1
+        return x * 2
+
+    async def collect(x):
+        seen.append(x)
+
+    stages = [Stage("double", slow, workers=3), Stage("collect", collect)]
+    assert await run_pipeline(range(20), stages) is True
+    assert sorted(seen) == [x * 2 for x in range(20)]
+    assert running["peak"] <= 3
+
+@pytest.mark.asyncio
+async def test_run_pipeline_stops_feeding_and_drains():
+    seen = []
+    fed = []
+
+    def items():
+        for x in range(100):
+            fed.append(x)
+            yield x
+
+    async def stop():
+        return len(fed) >= 5
+
+    async def collect(x):
+        seen.append(x)
+
+    assert await run_pipeline(items(), [Stage("collect", collect)], should_stop=stop) is False
+    assert seen == fed[:len(seen)] and len(seen) <= 5
+
+@pytest.mark.asyncio
+async def test_run_pipeline_batch_stage():
+    batches = []
+    seen = []
+
+    async def check(batch):
+        batches.append(len(batch))
+        return batch
+
+    async def collect(x):
+        seen.append(x)
+
+    stages = [Stage("check", check, batch_size=4, batch_delay=0.01), Stage("collect", collect)]
+    assert await run_pipeline(range(10), stages) is True
+    assert sorted(seen) == list(range(10))
+    assert max(batches) <= 4 and sum(batches) == 10
@@ -0,0 +1,50 @@
+import json
+import uuid
+import fakeredis
+import pytest
+from app.models.job import Job, JobStatus
+from app.models.album import Album
+from app.models.item import Item
+from app.worker import purge
+from app.worker.events import job_stream
+
+@pytest.fixture
+def add_job(db, make_job):
+    """Adds a job with one album of `items` items; returns its id."""
+    def add(items: int, status=JobStatus.DONE) -> uuid.UUID:
+        job = make_job(status)
+        album = Album(job_id=job.id, source_url="http://a")
+        db.add(album)
+        db.flush()
+        db.add_all(Item(job_id=job.id, album_id=album.id, source_media_url=f"http://a/{n}") for n in range(items))
+        db.commit()
+        return job.id
+    return add
+
+def test_delete_jobs_removes_children_of_all_jobs_at_once(db, add_job):
+    doomed = [add_job(3), add_job(2)]
+    kept = add_job(1)
+    assert purge.delete_jobs(db, doomed) == 2
+    db.commit()
+    assert [job.id for job in db.query(Job)] == [kept]
+    assert {album.job_id for album in db.query(Album)} == {kept}
+    assert {item.job_id for item in db.query(Item)} == {kept}
+
+def test_purge_job_deletes_in_batches_and_reports_progress(db, session_factory, add_job, monkeypatch, tmp_path):
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(purge, "redis_conn", redis)
+    monkeypatch.setattr(purge, "PURGE_BATCH_SIZE", 4)
+    monkeypatch.setattr(purge, "get_db", lambda: iter([session_factory()]))
+    monkeypatch.setattr(purge, "part_dir_for", lambda job_id: tmp_path / "partial" / str(job_id))
+    monkeypatch.setattr(purge, "trace_dir_for", lambda job_id: tmp_path / "traces" / str(job_id))
+    job_id = add_job(10, status=JobStatus.DELETING)
+    (tmp_path / "traces" / str(job_id)).mkdir(parents=True)
+
+    purge.purge_job(str(job_id))
+
+    db.expire_all()
+    assert db.query(Job).count() == 0 and db.query(Album).count() == 0 and db.query(Item).count() == 0
+    assert not (tmp_path / "traces" / str(job_id)).exists()
+    events = [json.loads(fields[b"event"]) for _, fields in redis.xrange(job_stream(job_id))]
+    assert [json.loads(e["progress"])["items_deleted"] for e in events if e["type"] == "progress"][0] == 4
+    assert events[-1]["status"] == purge.DELETED
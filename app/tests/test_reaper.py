@@ -0,0 +1,64 @@
+import fakeredis
+import pytest
+import rq
+from app.models.job import JobStatus
+from app.worker import reaper, worker
+from app.worker.heartbeat import Heartbeat, task_key
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(worker, "queue", rq.Queue("import-queue", connection=redis))
+    return redis
+
+def test_reaper_requeues_only_jobs_without_a_live_worker(db, redis, make_job):
+    dead, beating, queued_task, queued = make_job(), make_job(), make_job(), make_job(JobStatus.QUEUED)
+    Heartbeat(redis, beating.id).beat()
+    worker.queue.enqueue(worker.import_album, queued_task.id, 0, job_id=worker.task_id(queued_task.id, "album", 0))
+
+    assert reaper.reap(db, redis, worker.queue) == [str(dead.id)]
+    assert dead.status == JobStatus.QUEUED
+    assert str(dead.id) in worker.queue.get_job_ids()
+    assert beating.status == queued_task.status == JobStatus.RUNNING
+    assert queued.status == JobStatus.QUEUED
+
+def start_task(redis, job, worker_name):
+    """Put an album task of `job` in the started registry as if `worker_name` had picked it up."""
+    task = worker.queue.enqueue(worker.import_album, job.id, 0, job_id=worker.task_id(job.id, "album", 0))
+    worker.queue.remove(task)
+    with redis.pipeline() as pipeline:
+        task.prepare_for_execution(worker_name, pipeline)
+        rq.executions.Execution.create(task, 3600, pipeline, worker_name=worker_name)
+        pipeline.execute()
+
+def test_started_task_counts_only_while_its_rq_worker_lives(db, redis, make_job):
+    live_worker = rq.Worker([worker.queue], connection=redis)
+    live_worker.register_birth()
+    on_live, on_dead = make_job(), make_job()
+    start_task(redis, on_live, live_worker.name)
+    start_task(redis, on_dead, "gone")
+
+    assert reaper.reap(db, redis, worker.queue) == [str(on_dead.id)]
+    assert on_live.status == JobStatus.RUNNING
+
+def test_reaper_restarts_the_entry_point_that_last_ran(db, redis, make_job):
+    retried, imported = make_job(), make_job()
+    redis.set(task_key(retried.id), "retry")
+    redis.set(task_key(imported.id), "import")
+
+    assert sorted(reaper.reap(db, redis, worker.queue)) == sorted([str(retried.id), str(imported.id)])
+    tasks = {task.id: task.func_name for task in worker.queue.jobs}
+    assert tasks == {worker.task_id(retried.id, "retry"): "app.worker.worker.retry_failed",
+                     str(imported.id): "app.worker.worker.import_job"}
+
+def test_reaper_gives_up_after_max_restarts(db, redis, make_job, monkeypatch):
+    monkeypatch.setattr(reaper, "REAPER_MAX_RESTARTS", 1)
+    job = make_job()
+    assert reaper.reap(db, redis, worker.queue) == [str(job.id)]
+    worker.queue.empty()
+    job.status = JobStatus.RUNNING
+    db.commit()
+    redis.delete(f"job:{job.id}:reaping")
+    assert reaper.reap(db, redis, worker.queue) == [str(job.id)]
+    assert job.status == JobStatus.FAILED
+    assert "Worker lost 2 times" in job.last_error
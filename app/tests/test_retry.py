@@ -0,0 +1,33 @@
+from app.models.job import JobStatus
+from app.models.album import Album, AlbumStatus
+from app.models.item import Item, ItemStatus
+from app.worker.sync import AlbumManifest
+from app.worker.worker import ImportRunner
+
+def test_retry_works_only_failed_items_and_finishes_albums(db, make_job):
+    job = make_job(JobStatus.DONE, album_links=["http://a", "http://b"], options={"sync": True})
+    albums = [Album(job_id=job.id, source_url=link, source_title=link, immich_album_id=f"imm-{link[-1]}",
+                    status=AlbumStatus.DONE, total_items=2) for link in job.album_links]
+    db.add_all(albums)
+    db.flush()
+    for album, statuses in zip(albums, [(ItemStatus.DONE, ItemStatus.FAILED), (ItemStatus.FAILED, ItemStatus.FAILED)]):
+        for n, status in enumerate(statuses):
+            db.add(Item(job_id=job.id, album_id=album.id, source_media_url=f"{album.source_url}/m{n}",
+                        source_filename=f"m{n}.jpg", status=status))
+    db.commit()
+
+    runner = ImportRunner(db, job, None, None, lambda message: None, None, None)
+    work = runner.failed_items()
+    assert [(w.media_url, w.immich_album_id) for w in work] == [("http://a/m1", "imm-a"), ("http://b/m0", "imm-b"), ("http://b/m1", "imm-b")]
+    assert all(w.existing_item_id for w in work)
+
+    # Album b still has a failed item after the retry
+    for item in db.query(Item).filter(Item.source_media_url.in_(["http://a/m1", "http://b/m0"])):
+        item.status = ItemStatus.DONE
+        runner.job_items[item.source_media_url] = (item.id, ItemStatus.DONE)
+    albums[1].status = AlbumStatus.FAILED
+    db.commit()
+    runner.finish_retried_albums(work)
+
+    assert [album.status for album in albums] == [AlbumStatus.DONE, AlbumStatus.FAILED]
+    assert AlbumManifest.load(db, "http://immich", "http://b").new_items([{"media_url": "http://b/m1"}])
@@ -0,0 +1,68 @@
+import hashlib
+import os
+import fakeredis
+from app.worker.events import JobEvents
+from app.worker.staging import StagingStore
+from app.worker.worker import ImportRunner, WorkItem
+
+def stage(store, tmp_path, source, data: bytes, mtime=None):
+    download = tmp_path / "download"
+    download.write_bytes(data)
+    staged = store.put(source, download, hashlib.sha256(data).hexdigest(), hashlib.sha1(data).hexdigest(), len(data))
+    if mtime is not None:
+        os.utime(staged.path, (mtime, mtime))
+    return staged
+
+def test_staging_store_is_content_addressed(tmp_path):
+    store = StagingStore(tmp_path / "staging", budget_bytes=1000)
+    first = stage(store, tmp_path, "http://a/1", b"photo")
+    # The same bytes from another album are stored once
+    second = stage(store, tmp_path, "http://b/1", b"photo")
+    assert first.path == second.path
+    assert len(list(store.objects.glob("*/*"))) == 1
+
+    hit = store.get("http://b/1")
+    assert hit.path == first.path and hit.sha1 == hashlib.sha1(b"photo").hexdigest()
+    assert store.get("http://c/1") is None
+    assert store.stats() == {"hits": 1, "misses": 1, "bytes_saved": 5, "evicted": 0}
+
+def test_staging_store_evicts_least_recently_used(tmp_path):
+    store = StagingStore(tmp_path / "staging", budget_bytes=250)
+    stage(store, tmp_path, "http://a/used", b"u" * 100, mtime=1000)
+    stage(store, tmp_path, "http://a/old", b"o" * 100, mtime=2000)
+    # Reading it makes the older file the most recently used
+    assert store.get("http://a/used")
+    stage(store, tmp_path, "http://a/new", b"n" * 100)
+
+    assert store.get("http://a/old") is None
+    assert store.get("http://a/used") and store.get("http://a/new")
+    assert store.evicted == 1
+    # The evicted object's ref went with it
+    assert len(list(store.sources.iterdir())) == 2
+
+def test_staging_store_drops_ref_of_missing_object(tmp_path):
+    store = StagingStore(tmp_path / "staging", budget_bytes=1000)
+    staged = stage(store, tmp_path, "http://a/1", b"photo")
+    # Evicted by another worker sharing the store
+    staged.path.unlink()
+    assert store.get("http://a/1") is None
+    assert not any(store.sources.iterdir())
+
+def test_staging_store_keeps_recently_used_objects_over_budget(tmp_path):
+    store = StagingStore(tmp_path / "staging", budget_bytes=150)
+    # Both may still be waiting for upload in some pipeline
+    stage(store, tmp_path, "http://a/1", b"1" * 100)
+    stage(store, tmp_path, "http://a/2", b"2" * 100)
+    assert store.get("http://a/1") and store.get("http://a/2")
+    assert store.evicted == 0
+
+def test_download_that_failed_to_stage_is_removed(db, make_job, tmp_path):
+    job = make_job()
+    runner = ImportRunner(db, job, None, None, lambda message: None, StagingStore(tmp_path / "staging"),
+                          JobEvents(fakeredis.FakeRedis(), job.id))
+    part = tmp_path / "download"
+    part.write_bytes(b"photo")
+    staged = stage(runner.staging, tmp_path, "http://a/2", b"other")
+    runner.persist(WorkItem(0, "http://a/1", "1.jpg", file_path=part, error="Upload failed"))
+    runner.persist(WorkItem(1, "http://a/2", "2.jpg", file_path=staged.path, staged=True, error="Upload failed"))
+    assert not part.exists() and staged.path.exists()
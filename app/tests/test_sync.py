@@ -0,0 +1,34 @@
+from app.models.job import JobStatus
+from app.models.album import Album, AlbumStatus
+from app.models.item import Item, ItemStatus
+from app.models.manifest import ManifestItem
+from app.utils.google_photos_extractor import media_id
+from app.worker.sync import AlbumManifest
+
+def test_media_id():
+    assert media_id("https://lh3.googleusercontent.com/pw/AF1QipAbc=w256-h256") == "AF1QipAbc"
+    assert media_id("https://photos.google.com/share/AF1QipAlbum/photo/AF1QipXyz?key=k") == "AF1QipXyz"
+
+def test_album_manifest_seeds_from_earlier_jobs_and_diffs(db, make_job):
+    job = make_job(JobStatus.DONE, album_links=["http://album"])
+    album = Album(job_id=job.id, source_url="http://album", immich_album_id="alb1", status=AlbumStatus.DONE)
+    db.add(album)
+    db.flush()
+    for n, status in enumerate([ItemStatus.DONE, ItemStatus.SKIPPED, ItemStatus.FAILED]):
+        db.add(Item(job_id=job.id, album_id=album.id, source_media_url=f"https://lh3.googleusercontent.com/pw/m{n}=w100",
+                    status=status))
+    db.commit()
+
+    manifest = AlbumManifest.load(db, "http://immich", "http://album")
+    assert manifest.immich_album_id == "alb1"
+    assert manifest.media_ids == {"m0", "m1"}
+
+    items = [{"media_url": f"https://lh3.googleusercontent.com/pw/m{n}=w512"} for n in range(4)]
+    assert [media_id(item["media_url"]) for item in manifest.new_items(items)] == ["m2", "m3"]
+
+    manifest.record(["m2", "m3"])
+    reloaded = AlbumManifest.load(db, "http://immich", "http://album")
+    assert reloaded.new_items(items) == []
+    assert db.query(ManifestItem).count() == 4
+    # Another Immich server has its own manifest
+    assert AlbumManifest.load(db, "http://other", "http://album").media_ids == set()
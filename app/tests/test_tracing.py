@@ -0,0 +1,29 @@
+import json
+from app.worker.tracing import NULL_TRACER, Tracer, merge_traces
+
+def test_tracer_reuses_item_lanes_and_merges_runs(tmp_path):
+    tracer = Tracer("import")
+    first, second = tracer.lane(), tracer.lane()
+    with tracer.span("download", first, item="a.jpg") as span:
+        span["bytes"] = 10
+    tracer.release(first)
+    # The next item is drawn on the lane the finished one gave back
+    assert tracer.lane() == first != second
+    assert tracer.track("db") == tracer.track("db")
+    tracer.save(tmp_path)
+    Tracer("retry").save(tmp_path)
+
+    trace = merge_traces(tmp_path)
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert len(spans) == 1
+    assert spans[0]["name"] == "download" and spans[0]["tid"] == first
+    assert spans[0]["args"] == {"item": "a.jpg", "bytes": 10} and spans[0]["dur"] >= 0
+    names = {event["pid"]: event["args"]["name"] for event in trace["traceEvents"] if event["name"] == "process_name"}
+    assert names == {1: "import", 2: "retry"}
+    json.dumps(trace)
+
+def test_null_tracer_records_nothing(tmp_path):
+    with NULL_TRACER.span("download", NULL_TRACER.lane()) as span:
+        span["bytes"] = 10
+    assert NULL_TRACER.save(tmp_path) is None
+    assert merge_traces(tmp_path) is None
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+import httpx
+from app.utils.metrics import HTTP_CONCURRENCY_LIMIT, HTTP_THROTTLED
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the concurrency a host can grow to
+ADAPTIVE_MAX_CONCURRENCY = int(os.getenv("ADAPTIVE_MAX_CONCURRENCY", "16"))
+# Factor the limit is multiplied by on a 429/503, timeout or latency spike
+ADAPTIVE_BACKOFF = float(os.getenv("ADAPTIVE_BACKOFF", "0.5"))
+# Responses per latency sample, and how far its p95 may rise over the best seen
+ADAPTIVE_LATENCY_WINDOW = int(os.getenv("ADAPTIVE_LATENCY_WINDOW", "20"))
+ADAPTIVE_LATENCY_TOLERANCE = float(os.getenv("ADAPTIVE_LATENCY_TOLERANCE", "2.0"))
+# Longest Retry-After that is honoured
+RETRY_AFTER_MAX = float(os.getenv("RETRY_AFTER_MAX", "300"))
+
+THROTTLE_STATUSES = (429, 503)
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0.0), RETRY_AFTER_MAX)
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for the requests to one host.
+
+    The limit grows by about one for every `limit` healthy responses and is
+    multiplied by `backoff` on throttling (429/503), timeouts or when the p95
+    of the last `window` response times rises above `tolerance` times the
+    best p95 seen. A decrease only happens once per round of requests: a
+    request started before the last decrease can't cause another one. While a
+    Retry-After is pending no new request is started.
+    """
+
+    def __init__(self, initial: int, max_limit: int = ADAPTIVE_MAX_CONCURRENCY, min_limit: int = 1,
+                 backoff: float = ADAPTIVE_BACKOFF, window: int = ADAPTIVE_LATENCY_WINDOW,
+                 tolerance: float = ADAPTIVE_LATENCY_TOLERANCE):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit, initial)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.baseline_p95: Optional[float] = None
+        self.latencies = deque(maxlen=window)
+        self._samples = 0
+        self._last_decrease = 0.0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """Wait for a free slot; returns the start time to pass to the release methods."""
+        async with self._cond:
+            while True:
+                delay = self.paused_until - time.monotonic()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+                elif self.in_flight < int(self.limit):
+                    break
+                else:
+                    await self._cond.wait()
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self):
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def on_success(self, started: float, latency: float):
+        self.latencies.append(latency)
+        self._samples += 1
+        if self._samples % self.latencies.maxlen == 0:
+            p95 = sorted(self.latencies)[int(len(self.latencies) * 0.95) - 1]
+            if self.baseline_p95 is None or p95 < self.baseline_p95:
+                self.baseline_p95 = p95
+            elif p95 > self.baseline_p95 * self.tolerance:
+                self.decrease(started)
+                return
+            else:
+                # Let the baseline follow slow, healthy drift
+                self.baseline_p95 += (p95 - self.baseline_p95) * 0.05
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    def on_throttle(self, started: float, retry_after: Optional[float] = None):
+        if retry_after:
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        self.decrease(started)
+
+    def decrease(self, started: float):
+        if started < self._last_decrease:
+            return
+        self._last_decrease = time.monotonic()
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+
+class HostLimiters:
+    """One AdaptiveLimiter per host, created on first use."""
+
+    def __init__(self, initial: int, max_limit: int = ADAPTIVE_MAX_CONCURRENCY):
+        self.initial = initial
+        self.max_limit = max_limit
+        self.hosts: Dict[str, AdaptiveLimiter] = {}
+
+    def get(self, host: str) -> AdaptiveLimiter:
+        limiter = self.hosts.get(host)
+        if limiter is None:
+            limiter = self.hosts[host] = AdaptiveLimiter(self.initial, self.max_limit)
+        return limiter
+
+    @property
+    def max_concurrency(self) -> int:
+        return max(self.initial, self.max_limit)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Current concurrency limit per host, for job progress."""
+        return {host: int(limiter.limit) for host, limiter in self.hosts.items()}
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """Response body that gives its limiter slot back once it has been read or closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, limiter: AdaptiveLimiter):
+        self.stream = stream
+        self.limiter = limiter
+        self.released = False
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            if not self.released:
+                self.released = True
+                await self.limiter.release()
+
+class AdaptiveTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport so every request waits for a slot of its host's limiter.
+
+    Time to response headers is the latency sample; the slot is held until the
+    body has been consumed, so a streamed download counts for its whole length.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, limiters: HostLimiters):
+        self.transport = transport
+        self.limiters = limiters
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiters.get(request.url.host)
+        started = await limiter.acquire()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except httpx.TimeoutException:
+            limiter.on_throttle(started)
+            HTTP_THROTTLED.labels(request.url.host).inc()
+            HTTP_CONCURRENCY_LIMIT.labels(request.url.host).set(int(limiter.limit))
+            await limiter.release()
+            raise
+        except BaseException:
+            await limiter.release()
+            raise
+        if response.status_code in THROTTLE_STATUSES:
+            retry_after = retry_after_seconds(response.headers.get("retry-after"))
+            limiter.on_throttle(started, retry_after)
+            HTTP_THROTTLED.labels(request.url.host).inc()
+            logger.warning(f"{request.url.host} answered {response.status_code}, now at {int(limiter.limit)} concurrent requests"
+                           + (f", pausing {retry_after:.0f}s" if retry_after else ""))
+        elif response.status_code < 500:
+            limiter.on_success(started, time.monotonic() - started)
+        HTTP_CONCURRENCY_LIMIT.labels(request.url.host).set(int(limiter.limit))
+        return httpx.Response(response.status_code, headers=response.headers,
+                              stream=_ReleasingStream(response.stream, limiter), extensions=response.extensions)
+
+    async def aclose(self):
+        await self.transport.aclose()
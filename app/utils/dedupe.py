@@ -1,5 +1,7 @@
 import hashlib
-from typing import BinaryIO
+import math
+import time
+from typing import BinaryIO, Dict, Iterable
 
 def sha256_stream(fileobj: BinaryIO, chunk_size: int = 8192) -> str:
     h = hashlib.sha256()
@@ -9,3 +11,138 @@ def sha256_stream(fileobj: BinaryIO, chunk_size: int = 8192) -> str:
             break
         h.update(chunk)
     return h.hexdigest()
+
+class DigestWriter:
+    """Writes chunks to `fileobj` while updating one digest per algorithm.
+
+    Lets a download be hashed in the same pass that writes it to disk, so the
+    file never has to be read back just to compute its checksum. The first
+    `head_size` bytes are also kept in `head` for header parsing (EXIF).
+    """
+
+    def __init__(self, fileobj: BinaryIO, algorithms: Iterable[str] = ("sha256",), head_size: int = 0):
+        self.fileobj = fileobj
+        self.hashes = {name: hashlib.new(name) for name in algorithms}
+        self.bytes_written = 0
+        self.head_size = head_size
+        # Time spent hashing, for tracing
+        self.hash_seconds = 0.0
+        self._head = bytearray()
+
+    @property
+    def head(self) -> bytes:
+        return bytes(self._head)
+
+    def update(self, chunk: bytes):
+        """Account for bytes that are already in the file, e.g. of a resumed download."""
+        started = time.perf_counter()
+        if len(self._head) < self.head_size:
+            self._head += chunk[:self.head_size - len(self._head)]
+        for h in self.hashes.values():
+            h.update(chunk)
+        self.hash_seconds += time.perf_counter() - started
+        self.bytes_written += len(chunk)
+
+    def write(self, chunk: bytes) -> int:
+        self.update(chunk)
+        self.fileobj.write(chunk)
+        return len(chunk)
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {name: h.hexdigest() for name, h in self.hashes.items()}
+
+class BloomFilter:
+    """Fixed-size Bloom filter sized for `capacity` keys at `error_rate` false positives."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: bytes):
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: bytes):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+class DigestIndex:
+    """In-memory membership index of hex digests (e.g. every SHA-256 already imported).
+
+    Digests are kept as raw bytes packed back to back in one sorted buffer
+    and looked up by binary search, which takes 32 bytes per SHA-256 instead
+    of the ~90 of a set entry. Digests added after construction go to a small
+    set. With `bloom` a Bloom filter is used instead; it can report false
+    positives, so `exact` tells callers whether a hit still needs confirming
+    against the database.
+    """
+
+    def __init__(self, digests: Iterable[str] = (), bloom: bool = False, capacity: int = 0, error_rate: float = 0.001):
+        self.exact = not bloom
+        self.count = 0
+        self.width = 0
+        self._sorted = b""
+        if not self.exact:
+            self._keys = BloomFilter(capacity, error_rate)
+            for digest in digests:
+                self.add(digest)
+            return
+        self._keys = set()
+        packed, previous, in_order = bytearray(), b"", True
+        for digest in digests:
+            key = bytes.fromhex(digest)
+            if not self.width:
+                self.width = len(key)
+            if key == previous:
+                continue
+            if len(key) != self.width:
+                self.add(digest)
+                continue
+            # Callers usually pass digests in order (ORDER BY), which saves a sort
+            in_order = in_order and key > previous
+            packed += key
+            previous = key
+            self.count += 1
+        if not in_order:
+            keys = sorted({bytes(packed[i:i + self.width]) for i in range(0, len(packed), self.width)})
+            self.count -= len(packed) // self.width - len(keys)
+            packed = b"".join(keys)
+        self._sorted = packed
+
+    def _in_sorted(self, key: bytes) -> bool:
+        width = self.width
+        if len(key) != width:
+            return False
+        low, high = 0, len(self._sorted) // width
+        while low < high:
+            mid = (low + high) // 2
+            probe = self._sorted[mid * width:(mid + 1) * width]
+            if probe == key:
+                return True
+            if probe < key:
+                low = mid + 1
+            else:
+                high = mid
+        return False
+
+    def add(self, digest: str):
+        key = bytes.fromhex(digest)
+        if self.exact and (key in self._keys or self._in_sorted(key)):
+            return
+        self._keys.add(key)
+        self.count += 1
+
+    def __contains__(self, digest: str) -> bool:
+        key = bytes.fromhex(digest)
+        return key in self._keys or self._in_sorted(key)
+
+    def __len__(self) -> int:
+        return self.count
@@ -1,8 +1,230 @@
+import atexit
+import io
 import subprocess
 import json
-from typing import Optional
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional
+import exifread
+
+logger = logging.getLogger(__name__)
+
+EXIFTOOL_WORKERS = int(os.getenv("EXIFTOOL_WORKERS", "2"))
+EXIFTOOL_TIMEOUT = float(os.getenv("EXIFTOOL_TIMEOUT", "30"))
+
+class ExifToolProcess:
+    """One long-lived `exiftool -stay_open True -@ -` process.
+
+    Arguments are written to stdin one per line and terminated by
+    `-execute<N>`; exiftool answers on stdout and ends the response with
+    `{ready<N>}`. A reader thread moves stdout lines into a queue so a hung
+    request can be timed out without blocking on the pipe.
+    """
+
+    def __init__(self, executable: str = "exiftool"):
+        self.executable = executable
+        self.proc: Optional[subprocess.Popen] = None
+        self._lines: Optional[queue.Queue] = None
+        self._counter = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        self.proc = subprocess.Popen([self.executable, "-stay_open", "True", "-@", "-"],
+                                     stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(self.proc.stdout, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _pump(stream, lines: queue.Queue):
+        for line in iter(stream.readline, b""):
+            lines.put(line)
+        lines.put(None)
+
+    def execute(self, args: List[str], timeout: float = EXIFTOOL_TIMEOUT) -> bytes:
+        if not self.alive:
+            self.start()
+        self._counter += 1
+        marker = f"{{ready{self._counter}}}".encode()
+        payload = "\n".join(args + [f"-execute{self._counter}"]) + "\n"
+        self.proc.stdin.write(payload.encode())
+        self.proc.stdin.flush()
+
+        deadline = time.monotonic() + timeout
+        output = []
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                line = self._lines.get(timeout=max(remaining, 0))
+            except queue.Empty:
+                raise TimeoutError(f"exiftool did not answer within {timeout}s")
+            if line is None:
+                raise RuntimeError("exiftool exited unexpectedly")
+            if line.rstrip() == marker:
+                return b"".join(output)
+            output.append(line)
+
+    def close(self):
+        if self.alive:
+            try:
+                self.proc.stdin.write(b"-stay_open\nFalse\n")
+                self.proc.stdin.flush()
+                self.proc.wait(timeout=5)
+            except Exception:
+                self.kill()
+        self.proc = None
+
+    def kill(self):
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+class ExifToolPool:
+    """A fixed set of ExifToolProcess workers shared by threads.
+
+    `extract` reads many files in one exiftool call. A worker that times out
+    or dies is killed and started again on its next use; the files of a failed
+    batch are then retried one by one so a single bad file can't sink the rest.
+    """
+
+    def __init__(self, size: int = EXIFTOOL_WORKERS, timeout: float = EXIFTOOL_TIMEOUT, executable: str = "exiftool"):
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._workers = [ExifToolProcess(executable) for _ in range(max(1, size))]
+        for worker in self._workers:
+            self._idle.put(worker)
+
+    def extract(self, file_paths: List[str]) -> Dict[str, Optional[dict]]:
+        results = {path: None for path in file_paths}
+        if not file_paths:
+            return results
+        try:
+            output = self._execute(["-j", "-n", "-charset", "filename=utf8", *file_paths])
+        except Exception as e:
+            logger.warning(f"exiftool failed on {len(file_paths)} file(s): {e}")
+            if len(file_paths) > 1:
+                for path in file_paths:
+                    results.update(self.extract([path]))
+            return results
+        try:
+            for entry in json.loads(output) if output.strip() else []:
+                if entry.get("SourceFile") in results:
+                    results[entry["SourceFile"]] = entry
+        except ValueError as e:
+            logger.warning(f"Unreadable exiftool output: {e}")
+        return results
+
+    def _execute(self, args: List[str]) -> bytes:
+        worker = self._idle.get()
+        try:
+            return worker.execute(args, self.timeout)
+        except Exception:
+            worker.kill()
+            raise
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        for worker in self._workers:
+            worker.close()
+
+# Bytes from the start of a file that the in-process reader looks at. JPEG
+# EXIF lives in the APP1 segment (at most 64 KiB) right after SOI.
+EXIF_HEAD_BYTES = int(os.getenv("EXIF_HEAD_BYTES", str(96 * 1024)))
+
+_HEIF_BRANDS = (b"heic", b"heix", b"hevc", b"heim", b"heis", b"mif1", b"msf1", b"avif")
+
+def header_format(head: bytes) -> Optional[str]:
+    """The image format the in-process reader handles, or None (videos, RAW, ...)."""
+    if head.startswith(b"\xff\xd8"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[4:8] == b"ftyp" and head[8:12] in _HEIF_BRANDS:
+        return "heic"
+    return None
+
+# Raised by malformed tag values, e.g. the 0/0 GPS rationals of phones without a fix
+_BAD_TAG_ERRORS = (ZeroDivisionError, ValueError, IndexError, TypeError)
+
+def _gps_coordinate(tags: dict, name: str, negative_ref: str) -> Optional[float]:
+    value, ref = tags.get(f"GPS {name}"), tags.get(f"GPS {name}Ref")
+    if value is None or len(value.values) != 3:
+        return None
+    try:
+        degrees, minutes, seconds = (float(part) for part in value.values)
+    except _BAD_TAG_ERRORS:
+        return None
+    coordinate = degrees + minutes / 60 + seconds / 3600
+    return -coordinate if ref is not None and str(ref.values).strip().upper() == negative_ref else coordinate
+
+def read_exif_header(head: bytes) -> Optional[dict]:
+    """Read the common EXIF fields from the first bytes of a JPEG/PNG/HEIC file.
+
+    Returns the same keys and numeric conventions as `exiftool -j -n`
+    (DateTimeOriginal, Make, Model, Orientation, GPSLatitude, GPSLongitude),
+    or None when the format isn't supported or the metadata isn't within
+    `head`, in which case the caller should fall back to exiftool. Fields
+    whose values are malformed are left out.
+    """
+    if header_format(head) is None:
+        return None
+    try:
+        tags = exifread.process_file(io.BytesIO(head), details=False, extract_thumbnail=False)
+    except Exception:
+        return None
+    if not tags:
+        return None
+    exif = {}
+    for key, tag in (("DateTimeOriginal", "EXIF DateTimeOriginal"), ("CreateDate", "EXIF DateTimeDigitized"),
+                     ("ModifyDate", "Image DateTime"), ("Make", "Image Make"), ("Model", "Image Model")):
+        if tag in tags:
+            exif[key] = str(tags[tag].values).strip()
+    if "Image Orientation" in tags:
+        try:
+            exif["Orientation"] = int(tags["Image Orientation"].values[0])
+        except _BAD_TAG_ERRORS:
+            pass
+    latitude = _gps_coordinate(tags, "GPSLatitude", "S")
+    longitude = _gps_coordinate(tags, "GPSLongitude", "W")
+    if latitude is not None and longitude is not None:
+        exif["GPSLatitude"], exif["GPSLongitude"] = latitude, longitude
+    return exif or None
+
+_pool: Optional[ExifToolPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> Optional[ExifToolPool]:
+    """The process-wide exiftool pool, or None if exiftool is not installed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None and shutil.which("exiftool"):
+            _pool = ExifToolPool()
+            atexit.register(_pool.close)
+        return _pool
+
+def extract_exif_batch(file_paths: List[str]) -> Dict[str, Optional[dict]]:
+    pool = get_pool()
+    if pool is None:
+        return {path: None for path in file_paths}
+    return pool.extract(file_paths)
 
 def extract_exif(file_path: str) -> Optional[dict]:
+    with open(file_path, "rb") as f:
+        exif = read_exif_header(f.read(EXIF_HEAD_BYTES))
+    if exif is not None:
+        return exif
+    return extract_exif_batch([file_path])[file_path]
+
+def extract_exif_subprocess(file_path: str) -> Optional[dict]:
+    """One `exiftool` process per file; kept for comparison in benchmarks."""
     try:
         result = subprocess.run([
             "exiftool", "-j", "-n", file_path
@@ -1,65 +1,204 @@
+import hashlib
+import html
 import httpx
-from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
-import re
 import json
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Any, Iterator, List, Dict, Optional
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Seconds an extraction is reused without asking Google, and how long it is
+# kept after that for ETag/Last-Modified revalidation.
+EXTRACT_CACHE_TTL = int(os.getenv("EXTRACT_CACHE_TTL", str(6 * 3600)))
+EXTRACT_CACHE_RETENTION = int(os.getenv("EXTRACT_CACHE_RETENTION", str(7 * 24 * 3600)))
+
+_CALLBACK = b"AF_initDataCallback("
+_SCRIPT_END = b"</script>"
+_TITLE = re.compile(rb"<title[^>]*>(.*?)</title>", re.IGNORECASE | re.DOTALL)
+_IMG = re.compile(rb"<img\b[^>]*>", re.IGNORECASE)
+_IMG_SRC = re.compile(rb"""\s(data-src|src)\s*=\s*(["'])(.*?)\2""", re.IGNORECASE | re.DOTALL)
+_DATA_KEY = re.compile(r"[{,]\s*[\"']?data[\"']?\s*:\s*")
+
+_decoder = json.JSONDecoder()
+
+def iter_init_data(page: bytes) -> Iterator[Any]:
+    """Yield the decoded data of every `AF_initDataCallback(...)` call in `page`.
+
+    Works on the raw response bytes: each call is located with a plain byte
+    search and only the text up to the end of its <script> is decoded, so no
+    DOM is built and the page is never copied as a whole. The argument is
+    either plain JSON or Google's object literal (`{key: 'ds:1', ..., data:
+    [...]}`), in which case just the JSON array after `data:` is decoded.
+    """
+    pos = 0
+    while True:
+        start = page.find(_CALLBACK, pos)
+        if start < 0:
+            return
+        start += len(_CALLBACK)
+        end = page.find(_SCRIPT_END, start)
+        pos = end if end >= 0 else len(page)
+        segment = page[start:pos].decode("utf-8", "replace")
+        try:
+            data, _ = _decoder.raw_decode(segment)
+            if isinstance(data, dict) and "data" in data:
+                data = data["data"]
+        except ValueError:
+            match = _DATA_KEY.search(segment)
+            if not match:
+                continue
+            try:
+                data, _ = _decoder.raw_decode(segment, match.end())
+            except ValueError:
+                continue
+        yield data
+
+def media_id(media_url: str) -> str:
+    """Google's ID for a media item: the last path segment of its URL, without size options like `=w256-h256`."""
+    path = urlsplit(media_url).path.rstrip('/')
+    return path.rsplit('/', 1)[-1].split('=', 1)[0]
+
+def _media_item(media_url: str) -> Dict[str, str]:
+    filename = media_url.split('/')[-1] if '/' in media_url else 'unknown'
+    return {'media_url': media_url, 'filename_hint': filename}
+
+def _callback_items(data: Any) -> List[Dict[str, str]]:
+    # Typically data[3] or similar contains the album's media entries
+    album_data = data[3] if isinstance(data, list) and len(data) > 3 else data
+    items = []
+    if isinstance(album_data, list):
+        for item in album_data:
+            # Assume item[1] has media URL
+            if isinstance(item, list) and len(item) > 1 and isinstance(item[1], str) and 'photos.google.com' in item[1]:
+                items.append(_media_item(item[1]))
+    return items
+
+def _img_items(page: bytes) -> List[Dict[str, str]]:
+    items = []
+    for tag in _IMG.finditer(page):
+        attrs = {name.lower(): value for name, _, value in _IMG_SRC.findall(tag.group())}
+        src = attrs.get(b"data-src") or attrs.get(b"src")
+        if src:
+            src = html.unescape(src.decode("utf-8", "replace"))
+            if 'photos.google.com' in src or 'lh3.googleusercontent.com' in src:
+                items.append(_media_item(src))
+    return items
+
+class ExtractionCache:
+    """Extraction results per album link, stored compressed in Redis.
+
+    An entry younger than `ttl` seconds is used as is, so resuming or retrying
+    a job doesn't scrape its albums again. Older entries are kept for
+    `retention` seconds and revalidated with the ETag/Last-Modified the page
+    was served with; a 304 reuses them without downloading or parsing.
+    """
+
+    def __init__(self, redis, ttl: int = EXTRACT_CACHE_TTL, retention: int = EXTRACT_CACHE_RETENTION):
+        self.redis = redis if ttl > 0 else None
+        self.ttl = ttl
+        self.retention = max(ttl, retention)
+
+    @staticmethod
+    def redis_key(link: str) -> str:
+        return f"gphotos:extraction:{hashlib.sha256(link.encode()).hexdigest()[:32]}"
+
+    def get(self, link: str) -> Optional[dict]:
+        if self.redis is None:
+            return None
+        try:
+            raw = self.redis.get(self.redis_key(link))
+            return json.loads(zlib.decompress(raw)) if raw else None
+        except Exception as e:
+            logger.warning(f"Extraction cache unavailable: {e}")
+            return None
+
+    def put(self, link: str, result: dict, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        if self.redis is None:
+            return
+        entry = {"result": result, "etag": etag, "last_modified": last_modified, "fetched_at": time.time()}
+        try:
+            self.redis.set(self.redis_key(link), zlib.compress(json.dumps(entry).encode()), ex=self.retention)
+        except Exception as e:
+            logger.warning(f"Failed to store extraction for {link}: {e}")
+
+    def is_fresh(self, entry: dict) -> bool:
+        return time.time() - entry["fetched_at"] < self.ttl
+
+    @staticmethod
+    def validators(entry: dict) -> Dict[str, str]:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
 
 class GooglePhotosExtractor:
     @staticmethod
-    def extract_album(link: str) -> Optional[dict]:
+    def extract_album(link: str, cache: Optional[ExtractionCache] = None) -> Optional[dict]:
         # Best-effort HTML fetch and parse
         try:
-            resp = httpx.get(link, timeout=30, follow_redirects=True)
+            cached = cache.get(link) if cache else None
+            if cached and cache.is_fresh(cached):
+                return cached["result"]
+            headers = ExtractionCache.validators(cached) if cached else {}
+            resp = httpx.get(link, timeout=30, follow_redirects=True, headers=headers)
+            if cached and resp.status_code == 304:
+                cache.put(link, cached["result"], cached.get("etag"), cached.get("last_modified"))
+                return cached["result"]
             resp.raise_for_status()
-            soup = BeautifulSoup(resp.text, "html.parser")
-            
-            # Extract title from <title>
-            title_tag = soup.find('title')
-            title = title_tag.text.strip() if title_tag else "Untitled Album"
-            
-            items = []
-            
-            # Try to find data in AF_initDataCallback scripts
-            scripts = soup.find_all('script')
-            for script in scripts:
-                if script.string and 'AF_initDataCallback' in script.string:
-                    # Extract the JSON data
-                    match = re.search(r'AF_initDataCallback\((.*?)\);', script.string)
-                    if match:
-                        try:
-                            data = json.loads(match.group(1))
-                            # Parse the data structure (this may need adjustment based on actual structure)
-                            # Typically, data[3][0] or similar contains album info
-                            album_data = data[3] if len(data) > 3 else data
-                            if isinstance(album_data, list) and len(album_data) > 0:
-                                for item in album_data:
-                                    if isinstance(item, list) and len(item) > 1:
-                                        # Assume item[1] has media URL
-                                        media_url = item[1] if isinstance(item[1], str) and 'photos.google.com' in item[1] else None
-                                        if media_url:
-                                            filename = media_url.split('/')[-1] if '/' in media_url else 'unknown'
-                                            items.append({
-                                                'media_url': media_url,
-                                                'filename_hint': filename
-                                            })
-                        except json.JSONDecodeError:
-                            pass
-            
-            # Fallback: look for img tags
-            if not items:
-                for img in soup.find_all('img'):
-                    src = img.get('data-src') or img.get('src')
-                    if src and ('photos.google.com' in src or 'lh3.googleusercontent.com' in src):
-                        filename = src.split('/')[-1] if '/' in src else 'unknown'
-                        items.append({
-                            'media_url': src,
-                            'filename_hint': filename
-                        })
-            
-            return {
-                "title": title,
-                "items": items
-            }
+            result = GooglePhotosExtractor.parse_album_page(resp.content)
+            # An empty page is more likely a sign-in or error page than an empty album
+            if cache and result["items"]:
+                cache.put(link, result, resp.headers.get("etag"), resp.headers.get("last-modified"))
+            return result
         except Exception as e:
-            print(f"Error extracting album: {e}")
+            logger.error(f"Error extracting album: {e}")
             return None
+
+    @staticmethod
+    def parse_album_page(page: bytes) -> dict:
+        """Title and media items of a shared album page, scanned from the raw bytes."""
+        match = _TITLE.search(page)
+        title = html.unescape(match.group(1).decode("utf-8", "replace")).strip() if match else ""
+
+        items = []
+        for data in iter_init_data(page):
+            items.extend(_callback_items(data))
+
+        # Fallback: look for img tags
+        if not items:
+            items = _img_items(page)
+
+        return {
+            "title": title or "Untitled Album",
+            "items": items
+        }
+
+    @staticmethod
+    def parse_album_page_soup(page: bytes) -> dict:
+        """The previous BeautifulSoup-based parser; kept for comparison in benchmarks."""
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(page.decode("utf-8", "replace"), "html.parser")
+        title_tag = soup.find('title')
+        title = title_tag.text.strip() if title_tag else "Untitled Album"
+        items = []
+        for script in soup.find_all('script'):
+            if script.string and 'AF_initDataCallback' in script.string:
+                match = re.search(r'AF_initDataCallback\((.*?)\);', script.string)
+                if match:
+                    try:
+                        items.extend(_callback_items(json.loads(match.group(1))))
+                    except json.JSONDecodeError:
+                        pass
+        if not items:
+            for img in soup.find_all('img'):
+                src = img.get('data-src') or img.get('src')
+                if src and ('photos.google.com' in src or 'lh3.googleusercontent.com' in src):
+                    items.append(_media_item(src))
+        return {"title": title, "items": items}
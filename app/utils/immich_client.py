@@ -1,17 +1,135 @@
+import os
+import hashlib
+import logging
 import httpx
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+from app.utils.adaptive_limiter import AdaptiveTransport, HostLimiters
+
+logger = logging.getLogger(__name__)
+
+IMMICH_HTTP2 = os.getenv("IMMICH_HTTP2", "0") == "1"
+IMMICH_MAX_CONNECTIONS = int(os.getenv("IMMICH_MAX_CONNECTIONS", "20"))
+IMMICH_MAX_KEEPALIVE = int(os.getenv("IMMICH_MAX_KEEPALIVE", "10"))
+IMMICH_KEEPALIVE_EXPIRY = float(os.getenv("IMMICH_KEEPALIVE_EXPIRY", "60"))
+IMMICH_TIMEOUT = float(os.getenv("IMMICH_TIMEOUT", "300"))
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+ALBUM_INDEX_TTL = int(os.getenv("ALBUM_INDEX_TTL", "0"))
+
+class AlbumIndex:
+    """Album name -> id map for one Immich target.
+
+    Kept in memory for the lifetime of the client. When `redis` is given the
+    map is also stored in a Redis hash that expires after `ttl` seconds, so
+    jobs against the same target share one album listing.
+    """
+
+    def __init__(self, redis=None, key: Optional[str] = None, ttl: int = ALBUM_INDEX_TTL):
+        self.redis = redis if key and ttl > 0 else None
+        self.key = key
+        self.ttl = ttl
+        self.albums: Dict[str, str] = {}
+        self.loaded = False
+        if self.redis is not None:
+            try:
+                cached = self.redis.hgetall(self.key)
+            except Exception as e:
+                logger.warning(f"Album index cache unavailable: {e}")
+                self.redis = None
+            else:
+                if cached:
+                    self.albums = {name.decode(): album_id.decode() for name, album_id in cached.items()}
+                    self.loaded = True
+
+    def get(self, name: str) -> Optional[str]:
+        return self.albums.get(name)
+
+    def load(self, albums: Dict[str, str]):
+        self.albums = dict(albums)
+        self.loaded = True
+        if self.redis is not None and albums:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.delete(self.key)
+                pipe.hset(self.key, mapping=albums)
+                pipe.expire(self.key, self.ttl)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to store album index: {e}")
+
+    def add(self, name: str, album_id: str):
+        self.albums.setdefault(name, album_id)
+        if self.redis is not None:
+            try:
+                # The hash may have expired since load(); a recreated one must expire too
+                pipe = self.redis.pipeline()
+                pipe.hsetnx(self.key, name, album_id)
+                pipe.expire(self.key, self.ttl)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to update album index: {e}")
+
+    @staticmethod
+    def redis_key(base_url: str, credential: Optional[str]) -> str:
+        fingerprint = hashlib.sha256(f"{base_url.rstrip('/')}|{credential or ''}".encode()).hexdigest()[:32]
+        return f"immich:album-index:{fingerprint}"
 
 class ImmichClient:
-    def __init__(self, base_url: str, api_key: Optional[str] = None, access_token: Optional[str] = None):
+    """Async Immich API client backed by one pooled, keep-alive `httpx.AsyncClient`.
+
+    Create one per job (or process), use it for every request and close it with
+    `aclose()` or `async with`, so uploads reuse established TLS connections.
+    """
+
+    def __init__(self, base_url: str, api_key: Optional[str] = None, access_token: Optional[str] = None,
+                 http2: Optional[bool] = None, max_connections: Optional[int] = None,
+                 max_keepalive_connections: Optional[int] = None, timeout: Optional[float] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None, album_index: Optional[AlbumIndex] = None,
+                 limiters: Optional[HostLimiters] = None):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.access_token = access_token
+        self.album_index = album_index or AlbumIndex()
         headers = {}
         if self.api_key:
             headers["x-api-key"] = self.api_key
         elif self.access_token:
             headers["Authorization"] = f"Bearer {self.access_token}"
-        self.client = httpx.AsyncClient(headers=headers)
+        http2 = IMMICH_HTTP2 if http2 is None else http2
+        if http2 and not _http2_available():
+            logger.warning("HTTP/2 requested for Immich but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        limits = httpx.Limits(
+            max_connections=max_connections or IMMICH_MAX_CONNECTIONS,
+            max_keepalive_connections=max_keepalive_connections or IMMICH_MAX_KEEPALIVE,
+            keepalive_expiry=IMMICH_KEEPALIVE_EXPIRY,
+        )
+        if limiters is not None:
+            # A custom transport replaces the client's own, so the pool settings go on the inner one
+            transport = AdaptiveTransport(transport or httpx.AsyncHTTPTransport(http2=http2, limits=limits), limiters)
+        self.client = httpx.AsyncClient(headers=headers, http2=http2, limits=limits,
+                                        timeout=timeout or IMMICH_TIMEOUT, transport=transport)
+
+    async def __aenter__(self) -> "ImmichClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def set_access_token(self, access_token: str):
+        """Switch the pooled session to bearer-token auth without reconnecting."""
+        self.access_token = access_token
+        self.client.headers.pop("x-api-key", None)
+        self.client.headers["Authorization"] = f"Bearer {access_token}"
 
     async def test_login(self, email: str, password: str) -> tuple[bool, Optional[dict]]:
         """Test login with email/password, return (success, user_info)"""
@@ -40,9 +158,8 @@ class ImmichClient:
     async def test_api_key(self, api_key: str) -> tuple[bool, Optional[dict]]:
         """Test API key, return (success, user_info)"""
         try:
-            temp_client = httpx.AsyncClient(headers={"x-api-key": api_key})
             url = f"{self.base_url}/api/users/me"
-            resp = await temp_client.get(url)
+            resp = await self.client.get(url, headers={"x-api-key": api_key})
             if resp.status_code == 200:
                 data = resp.json()
                 user_info = {
@@ -61,8 +178,6 @@ class ImmichClient:
             raise Exception("Connection to Immich server timed out. Please check your network connection.")
         except Exception as e:
             raise Exception(f"API key test failed: {str(e)}")
-        finally:
-            await temp_client.aclose()
 
     async def get_token(self, email: str, password: str) -> Optional[str]:
         try:
@@ -80,32 +195,49 @@ class ImmichClient:
 
     async def find_or_create_album(self, title: str) -> Optional[str]:
         try:
-            # First, try to find existing album
-            url = f"{self.base_url}/api/albums"
-            resp = await self.client.get(url)
-            if resp.status_code == 200:
-                albums = resp.json()
-                for album in albums:
-                    if album.get("albumName") == title:
-                        return album["id"]
+            # First, try the cached index; a miss refreshes it once before creating,
+            # in case the album was created since the index was loaded
+            fresh = not self.album_index.loaded
+            if fresh:
+                self.album_index.load(await self.list_albums())
+            album_id = self.album_index.get(title)
+            if album_id is None and not fresh:
+                self.album_index.load(await self.list_albums())
+                album_id = self.album_index.get(title)
+            if album_id is not None:
+                return album_id
             
             # If not found, create new album
             create_url = f"{self.base_url}/api/albums"
             resp = await self.client.post(create_url, json={"albumName": title})
             if resp.status_code == 201:
-                return resp.json()["id"]
+                album_id = resp.json()["id"]
+                self.album_index.add(title, album_id)
+                return album_id
             else:
                 raise Exception(f"Failed to create album: {resp.text}")
         except Exception as e:
             raise Exception(f"Album operation failed: {str(e)}")
 
+    async def list_albums(self) -> Dict[str, str]:
+        """Return {album name: album id} for every album the user can see."""
+        url = f"{self.base_url}/api/albums"
+        resp = await self.client.get(url)
+        if resp.status_code != 200:
+            raise Exception(f"HTTP {resp.status_code}: {resp.text}")
+        albums = {}
+        for album in resp.json():
+            albums.setdefault(album.get("albumName"), album["id"])
+        return albums
+
     async def upload_asset(self, file_path: str, filename: str = None) -> Optional[str]:
         try:
             with open(file_path, "rb") as f:
                 files = {"assetData": (filename or file_path.split("/")[-1], f, "application/octet-stream")}
                 url = f"{self.base_url}/api/assets"
                 resp = await self.client.post(url, files=files)
-                if resp.status_code == 201:
+                # 200 means Immich already had this exact file and returns the existing asset
+                if resp.status_code in (200, 201):
                     data = resp.json()
                     return data["id"]
                 else:
@@ -113,10 +245,45 @@ class ImmichClient:
         except Exception as e:
             raise Exception(f"Asset upload failed: {str(e)}")
 
+    async def bulk_upload_check(self, checksums: Dict[str, str]) -> Dict[str, Optional[str]]:
+        """Ask Immich which files it already has before uploading them.
+
+        `checksums` maps a caller-chosen id to the file's SHA-1 hex digest; the
+        result maps each id to the id of the existing Immich asset, or None if
+        the file still has to be uploaded.
+        """
+        try:
+            url = f"{self.base_url}/api/assets/bulk-upload-check"
+            assets = [{"id": key, "checksum": checksum} for key, checksum in checksums.items()]
+            resp = await self.client.post(url, json={"assets": assets})
+            if resp.status_code not in (200, 201):
+                raise Exception(f"HTTP {resp.status_code}: {resp.text}")
+            existing = {key: None for key in checksums}
+            for result in resp.json().get("results", []):
+                if result.get("action") == "reject" and result.get("reason") == "duplicate" and result.get("assetId"):
+                    existing[result.get("id")] = result["assetId"]
+            return existing
+        except Exception as e:
+            raise Exception(f"Bulk upload check failed: {str(e)}")
+
     async def add_asset_to_album(self, asset_id: str, album_id: str) -> bool:
+        errors = await self.add_assets_to_album(album_id, [asset_id])
+        return errors.get(asset_id) is None
+
+    async def add_assets_to_album(self, album_id: str, asset_ids: List[str]) -> Dict[str, Optional[str]]:
+        """Add many assets to an album in one request, return {asset_id: error or None}.
+
+        Assets that are already in the album count as added.
+        """
         try:
             url = f"{self.base_url}/api/albums/{album_id}/assets"
-            resp = await self.client.put(url, json={"ids": [asset_id]})
-            return resp.status_code == 200
+            resp = await self.client.put(url, json={"ids": asset_ids})
+            if resp.status_code != 200:
+                raise Exception(f"HTTP {resp.status_code}: {resp.text}")
+            results = {asset_id: "missing from response" for asset_id in asset_ids}
+            for result in resp.json():
+                error = None if result.get("success") or result.get("error") == "duplicate" else (result.get("error") or "unknown")
+                results[result.get("id")] = error
+            return results
         except Exception as e:
-            raise Exception(f"Failed to add asset to album: {str(e)}")
+            raise Exception(f"Failed to add assets to album: {str(e)}")
@@ -0,0 +1,53 @@
+"""Prometheus metrics of the import pipeline and the API.
+
+RQ runs every task in a forked work horse, so the worker collects metrics
+in prometheus_client's multiprocess mode: each process writes its values
+to files under PROMETHEUS_MULTIPROC_DIR and the exporter started by
+`python -m app.worker` adds them up when scraped. Without that variable
+(tests, the API) metrics live in the default in-process registry.
+"""
+import os
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client.multiprocess import MultiProcessCollector
+
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "gphotos_import_stage_seconds", "Time spent per call of an import stage", ["stage"], buckets=STAGE_BUCKETS)
+# Created up front so every stage is exported, at zero, before it first runs
+STAGES = ("scrape", "album_link", "download", "hash", "exif", "dedupe", "preflight", "upload", "db_flush")
+for stage in STAGES:
+    STAGE_SECONDS.labels(stage)
+STAGE_BYTES = Counter(
+    "gphotos_import_bytes_total", "Bytes moved by a stage (download, upload) or served from staging", ["stage"])
+ITEMS = Counter("gphotos_import_items_total", "Items finished, by final status", ["status"])
+RETRIES = Counter("gphotos_import_retries_total", "Retried attempts of an operation", ["operation"])
+DEDUPE = Counter(
+    "gphotos_import_dedupe_total", "Items not uploaded again, by where the copy was found", ["source"])
+STAGING = Counter("gphotos_import_staging_total", "Staging store lookups", ["result"])
+QUEUE_DEPTH = Gauge(
+    "gphotos_import_pipeline_queue_depth", "Items waiting in front of a pipeline stage", ["stage"],
+    multiprocess_mode="livesum")
+HTTP_THROTTLED = Counter(
+    "gphotos_http_throttled_total", "429/503 answers and timeouts seen by the adaptive limiter", ["host"])
+HTTP_CONCURRENCY_LIMIT = Gauge(
+    "gphotos_http_concurrency_limit", "Current adaptive concurrency limit", ["host"], multiprocess_mode="livemax")
+
+API_REQUEST_SECONDS = Histogram(
+    "gphotos_api_request_seconds", "API request latency", ["method", "endpoint", "status"])
+
+def metrics_registry() -> CollectorRegistry:
+    """The registry to expose: all worker processes in multiprocess mode, else this process."""
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry)
+    return registry
+
+def count_retry(operation: str):
+    """tenacity `before_sleep` hook counting the retries of `operation`."""
+    def before_sleep(retry_state):
+        RETRIES.labels(operation).inc()
+    return before_sleep
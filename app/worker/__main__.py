@@ -1,4 +1,40 @@
-from app.worker.worker import import_job
+"""RQ worker with a Prometheus exporter for the metrics of its tasks.
 
-# Entrypoint for RQ worker
-# Usage: rq worker -u redis://redis:6379/0 import-queue
+Usage: python -m app.worker [queue ...]
+
+Tasks run in forked work horses, so metrics are collected in
+prometheus_client's multiprocess mode under PROMETHEUS_MULTIPROC_DIR
+(a fresh temporary directory unless set) and served on
+WORKER_METRICS_PORT by this process.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+multiproc_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="gphotos-metrics-"))
+# Files left by a previous run would be added to this one's counters
+shutil.rmtree(multiproc_dir, ignore_errors=True)
+os.makedirs(multiproc_dir, exist_ok=True)
+
+from prometheus_client import multiprocess, start_http_server  # noqa: E402
+from rq import Queue, Worker  # noqa: E402
+from app.utils.metrics import WORKER_METRICS_PORT, metrics_registry  # noqa: E402
+from app.worker.worker import import_job, redis_conn  # noqa: E402,F401
+
+class MetricsWorker(Worker):
+    def execute_job(self, job, queue):
+        try:
+            super().execute_job(job, queue)
+        finally:
+            # Drop the finished work horse's gauges (queue depths, limits)
+            if self.horse_pid:
+                multiprocess.mark_process_dead(self.horse_pid)
+
+def main():
+    start_http_server(WORKER_METRICS_PORT, registry=metrics_registry())
+    queues = [Queue(name, connection=redis_conn) for name in (sys.argv[1:] or ["import-queue"])]
+    MetricsWorker(queues, connection=redis_conn).work()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from tenacity import retry, stop_after_attempt, wait_exponential
+from app.utils.immich_client import ImmichClient
+from app.utils.metrics import STAGE_SECONDS, count_retry
+
+Entry = Tuple[str, Any]
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), before_sleep=count_retry("album_link"))
+async def add_assets(client: ImmichClient, album_id: str, asset_ids: List[str]) -> Dict[str, Optional[str]]:
+    return await client.add_assets_to_album(album_id, asset_ids)
+
+class AlbumBatcher:
+    """Collects uploaded asset ids per Immich album and adds them in bulk.
+
+    A batch is sent when it reaches `batch_size`, when its oldest entry is
+    `max_delay` seconds old, or on `flush()`/`close()`. After every request
+    `on_flushed(entries, errors)` is awaited with the `(asset_id, payload)`
+    entries of the batch and a mapping of asset ids that could not be added to
+    their error. Callers should only treat an asset as linked once it has been
+    passed to `on_flushed`, which keeps resume correct if the job stops with
+    entries still buffered.
+    """
+
+    def __init__(self, client: ImmichClient, on_flushed: Callable[[List[Entry], Dict[str, str]], Awaitable[None]],
+                 batch_size: int = 500, max_delay: float = 5.0):
+        self.client = client
+        self.on_flushed = on_flushed
+        self.batch_size = max(1, int(batch_size))
+        self.max_delay = max_delay
+        self.pending: Dict[str, List[Entry]] = {}
+        self.first_added: Dict[str, float] = {}
+        self._closed = asyncio.Event()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def add(self, album_id: str, asset_id: str, payload: Any = None):
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_expired())
+        self.pending.setdefault(album_id, []).append((asset_id, payload))
+        self.first_added.setdefault(album_id, time.monotonic())
+        if len(self.pending[album_id]) >= self.batch_size:
+            await self.flush(album_id)
+
+    async def flush(self, album_id: Optional[str] = None):
+        for target in ([album_id] if album_id else list(self.pending)):
+            entries = self.pending.pop(target, [])
+            self.first_added.pop(target, None)
+            if entries:
+                await self.on_flushed(entries, await self._send(target, entries))
+
+    async def close(self):
+        """Stop the timer and send everything still buffered."""
+        self._closed.set()
+        if self._timer is not None:
+            await self._timer
+        await self.flush()
+
+    async def _send(self, album_id: str, entries: List[Entry]) -> Dict[str, str]:
+        asset_ids = list(dict.fromkeys(asset_id for asset_id, _ in entries))
+        try:
+            with STAGE_SECONDS.labels("album_link").time():
+                results = await add_assets(self.client, album_id, asset_ids)
+        except Exception as e:
+            return {asset_id: str(e) for asset_id in asset_ids}
+        return {asset_id: error for asset_id, error in results.items() if error}
+
+    async def _flush_expired(self):
+        while not self._closed.is_set():
+            try:
+                await asyncio.wait_for(self._closed.wait(), timeout=max(self.max_delay / 2, 0.05))
+            except asyncio.TimeoutError:
+                pass
+            now = time.monotonic()
+            for album_id, since in list(self.first_added.items()):
+                if now - since >= self.max_delay:
+                    await self.flush(album_id)
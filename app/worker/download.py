@@ -0,0 +1,147 @@
+"""Resumable media downloads.
+
+A download is written to `<key>.part`, next to a `<key>.part.json` holding
+the ETag/Last-Modified and Content-Length the server first answered with.
+A retry, or a resumed job, asks only for the missing bytes with a Range
+request guarded by If-Range; if the file changed on the server it is sent
+whole and the part starts over. Bytes already on disk are hashed from the
+file, so the digests always cover the complete download.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+import httpx
+from app.utils.dedupe import DigestWriter
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_PART_DIR = Path(os.getenv("DOWNLOAD_PART_DIR", "data/partial"))
+# Partial downloads untouched for this long are deleted
+DOWNLOAD_PART_TTL = int(os.getenv("DOWNLOAD_PART_TTL", str(7 * 24 * 3600)))
+# Read size when hashing the bytes of a part that is resumed
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-\d+/(\d+|\*)")
+
+class DownloadIncomplete(Exception):
+    """The server sent fewer bytes than announced, or a range that doesn't continue the part."""
+
+def part_dir_for(job_id) -> Path:
+    return DOWNLOAD_PART_DIR / str(job_id)
+
+def part_key(*parts) -> str:
+    """Stable file name for a download, so a restarted job finds its part again."""
+    return hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()[:32]
+
+def _meta_path(part_path: Path) -> Path:
+    return part_path.with_name(part_path.name + ".json")
+
+def _read_meta(part_path: Path) -> Optional[dict]:
+    try:
+        return json.loads(_meta_path(part_path).read_text())
+    except (OSError, ValueError):
+        return None
+
+def _discard(part_path: Path):
+    part_path.unlink(missing_ok=True)
+    _meta_path(part_path).unlink(missing_ok=True)
+
+def _content_range(value: Optional[str]) -> Optional[Tuple[int, Optional[int]]]:
+    match = _CONTENT_RANGE.match(value or "")
+    if not match:
+        return None
+    return int(match.group(1)), None if match.group(2) == "*" else int(match.group(2))
+
+def _hash_existing(writer: DigestWriter, f):
+    f.seek(0)
+    while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+        writer.update(chunk)
+
+async def download(http: httpx.AsyncClient, media_url: str, file_path: Path, part_path: Path,
+                   algorithms: Iterable[str] = ("sha256",), head_size: int = 0) -> DigestWriter:
+    """Download `media_url` to `file_path`, resuming from `part_path` if an earlier attempt left one.
+
+    Returns the DigestWriter with the digests and head of the whole file.
+    Raises DownloadIncomplete (after keeping what arrived) if the transfer
+    ended early, so a retry continues where this attempt stopped.
+    """
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    meta = _read_meta(part_path) if part_path.exists() else None
+    offset = part_path.stat().st_size if meta else 0
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        validator = meta.get("etag") or meta.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+
+    async with http.stream("GET", media_url, headers=headers) as resp:
+        if resp.status_code == 416 and offset:
+            # Either the part is already complete or it no longer fits the file
+            if offset != meta.get("length"):
+                _discard(part_path)
+                raise DownloadIncomplete(f"Range not satisfiable at byte {offset}, starting over")
+            resumed, complete = True, True
+        else:
+            resp.raise_for_status()
+            complete = False
+            resumed = resp.status_code == 206
+            if resumed:
+                start, total = _content_range(resp.headers.get("content-range")) or (None, None)
+                if start != offset or (meta.get("length") is not None and total != meta["length"]):
+                    _discard(part_path)
+                    raise DownloadIncomplete(f"Unexpected Content-Range {resp.headers.get('content-range')!r}, starting over")
+            else:
+                # Decoded bodies can't be resumed by byte offset, so keep no validators for them
+                encoded = resp.headers.get("content-encoding", "identity") != "identity"
+                length = resp.headers.get("content-length")
+                meta = {"etag": resp.headers.get("etag"), "last_modified": resp.headers.get("last-modified"),
+                        "length": int(length) if length and not encoded else None}
+                _meta_path(part_path).unlink(missing_ok=True)
+                if not encoded:
+                    _meta_path(part_path).write_text(json.dumps(meta))
+
+        with open(part_path, "r+b" if resumed else "wb") as f:
+            writer = DigestWriter(f, algorithms, head_size=head_size)
+            if resumed:
+                await asyncio.to_thread(_hash_existing, writer, f)
+                logger.info(f"Resuming {media_url} at byte {offset}")
+            if not complete:
+                # Chunks are written as they arrive, so a dropped connection loses nothing received
+                async for chunk in resp.aiter_bytes():
+                    writer.write(chunk)
+
+    if meta.get("length") is not None and writer.bytes_written != meta["length"]:
+        raise DownloadIncomplete(f"Received {writer.bytes_written} of {meta['length']} bytes")
+    shutil.move(part_path, file_path)
+    _meta_path(part_path).unlink(missing_ok=True)
+    return writer
+
+def sweep_parts(root: Path = DOWNLOAD_PART_DIR, max_age: float = DOWNLOAD_PART_TTL) -> int:
+    """Delete partial downloads not touched for `max_age` seconds; returns how many files were removed."""
+    if not root.is_dir():
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for job_dir in root.iterdir():
+        if not job_dir.is_dir():
+            continue
+        for path in job_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        try:
+            job_dir.rmdir()
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,93 @@
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+# Every job event goes to the job's own stream; status and progress events are
+# also copied to one shared stream so the job list needs a single subscription.
+JOB_STREAM = "job:{job_id}:events"
+ALL_JOBS_STREAM = "jobs:events"
+STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "1000"))
+STREAM_TTL = int(os.getenv("EVENT_STREAM_TTL", str(7 * 24 * 3600)))
+PROGRESS_INTERVAL = float(os.getenv("EVENT_PROGRESS_INTERVAL", "0.5"))
+
+def job_stream(job_id: str) -> str:
+    return JOB_STREAM.format(job_id=job_id)
+
+def decode_event(fields: Dict[bytes, bytes]) -> Dict[str, Any]:
+    return json.loads(fields[b"event"])
+
+class JobEvents:
+    """Publishes a job's status, progress and log events to Redis streams.
+
+    Publishing is best effort: Redis being unavailable never fails a job. Log
+    and status events are always sent; progress events are sent at most every
+    PROGRESS_INTERVAL seconds unless the stage changes.
+    """
+
+    def __init__(self, redis: Redis, job_id: str):
+        self.redis = redis
+        self.job_id = str(job_id)
+        self.stream = job_stream(self.job_id)
+        self._last_progress = 0.0
+        self._last_stage: Optional[str] = None
+        self._retry_at = 0.0
+
+    def publish(self, event_type: str, shared: bool = False, **data):
+        if time.monotonic() < self._retry_at:
+            return
+        event = json.dumps({"type": event_type, "job_id": self.job_id, "ts": time.time(), **data})
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.xadd(self.stream, {"event": event}, maxlen=STREAM_MAXLEN, approximate=True)
+            pipe.expire(self.stream, STREAM_TTL)
+            if shared:
+                pipe.xadd(ALL_JOBS_STREAM, {"event": event}, maxlen=STREAM_MAXLEN, approximate=True)
+            pipe.execute()
+        except Exception as e:
+            # Don't stall the job reconnecting on every event while Redis is down
+            logger.warning(f"Could not publish job events to Redis, pausing for 30s: {e}")
+            self._retry_at = time.monotonic() + 30
+
+    def log(self, message: str):
+        self.publish("log", message=message)
+
+    def status(self, status: str, last_error: Optional[str] = None):
+        self.publish("status", shared=True, status=status, last_error=last_error)
+
+    def progress(self, progress: str, stage: Optional[str] = None):
+        now = time.monotonic()
+        if stage == self._last_stage and now - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = now
+        self._last_stage = stage
+        self.publish("progress", shared=True, progress=progress)
+
+async def read_events(redis, stream: str, last_id: Optional[str] = None, block_ms: int = 15000) -> AsyncIterator[Dict[str, Any]]:
+    """Yield SSE messages for every event in `stream` after `last_id`.
+
+    `last_id` is a Redis stream id, normally the browser's Last-Event-ID, so a
+    reconnecting client resumes exactly where it left off. "$" starts with the
+    next new event.
+    """
+    if not last_id:
+        last_id = "0-0"
+    elif last_id == "$":
+        latest = await redis.xrevrange(stream, count=1)
+        last_id = latest[0][0] if latest else "0-0"
+    while True:
+        response = await redis.xread({stream: last_id}, block=block_ms, count=100)
+        if not response:
+            # Nothing new; lets the caller notice a disconnected client
+            yield None
+            continue
+        for _, entries in response:
+            for entry_id, fields in entries:
+                last_id = entry_id
+                event = decode_event(fields)
+                entry_id = entry_id.decode() if isinstance(entry_id, bytes) else entry_id
+                yield {"id": entry_id, "event": event["type"], "data": json.dumps(event)}
@@ -0,0 +1,102 @@
+import hashlib
+import logging
+import os
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+from redis import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# Albums with more items than this are split into chunks of this size
+FAN_OUT_CHUNK_SIZE = int(os.getenv("FAN_OUT_CHUNK_SIZE", "500"))
+# RQ timeout of one album or chunk task
+FAN_OUT_TASK_TIMEOUT = int(os.getenv("FAN_OUT_TASK_TIMEOUT", str(4 * 3600)))
+FAN_OUT_TTL = int(os.getenv("FAN_OUT_TTL", str(7 * 24 * 3600)))
+ALBUM_LOCK_TIMEOUT = float(os.getenv("ALBUM_LOCK_TIMEOUT", "60"))
+
+PROGRESS_FIELDS = ("albums_processed", "items_processed", "total_items")
+
+class FanIn:
+    """Redis counters that tie a fanned-out job's sub-tasks back together.
+
+    One hash per job holds the number of outstanding sub-tasks (overall and
+    per album), the number that failed with the last error, and the job's
+    progress counters. Every update is an atomic HINCRBY, so exactly one
+    sub-task sees a counter reach zero and finishes the album or the job.
+    """
+
+    def __init__(self, redis: Redis, job_id: str):
+        self.redis = redis
+        self.key = f"job:{job_id}:fan-in"
+
+    def reset(self, tasks: int):
+        """Start a new run of the job with `tasks` outstanding sub-tasks."""
+        pipe = self.redis.pipeline()
+        pipe.delete(self.key)
+        pipe.hset(self.key, "pending", tasks)
+        pipe.expire(self.key, FAN_OUT_TTL)
+        pipe.execute()
+
+    def add(self, tasks: int, album_id: Optional[int] = None):
+        """Register `tasks` more sub-tasks, before they are enqueued."""
+        pipe = self.redis.pipeline()
+        pipe.hincrby(self.key, "pending", tasks)
+        if album_id is not None:
+            pipe.hincrby(self.key, f"album:{album_id}:pending", tasks)
+        pipe.execute()
+
+    def done(self, album_id: Optional[int] = None, error: Optional[str] = None) -> Tuple[bool, bool]:
+        """Mark one sub-task finished. Returns (album finished, job finished)."""
+        pipe = self.redis.pipeline()
+        if error is not None:
+            pipe.hincrby(self.key, "failed", 1)
+            pipe.hset(self.key, "error", error)
+            if album_id is not None:
+                pipe.hincrby(self.key, f"album:{album_id}:failed", 1)
+        if album_id is not None:
+            pipe.hincrby(self.key, f"album:{album_id}:pending", -1)
+        pipe.hincrby(self.key, "pending", -1)
+        results = pipe.execute()
+        album_finished = album_id is not None and results[-2] <= 0
+        return album_finished, results[-1] <= 0
+
+    def failed(self, album_id: Optional[int] = None) -> Tuple[int, Optional[str]]:
+        """Number of failed sub-tasks (of one album, if given) and the last error."""
+        field = f"album:{album_id}:failed" if album_id is not None else "failed"
+        count, error = self.redis.hmget(self.key, field, "error")
+        return int(count or 0), error.decode() if error else None
+
+    def progress(self, deltas: Dict[str, int]) -> Dict[str, int]:
+        """Add this task's progress since its last report; returns the job totals."""
+        pipe = self.redis.pipeline()
+        for field, delta in deltas.items():
+            if delta:
+                pipe.hincrby(self.key, field, delta)
+        pipe.hmget(self.key, *PROGRESS_FIELDS)
+        totals = pipe.execute()[-1]
+        return {field: int(value or 0) for field, value in zip(PROGRESS_FIELDS, totals)}
+
+@contextmanager
+def album_lock(redis: Redis, index_key: str, title: str):
+    """Serialise find-or-create of one album name on one Immich server across workers.
+
+    Without it two sub-tasks (or jobs) importing albums with the same title can
+    both miss the album listing and create it twice. If Redis is unreachable
+    the album is looked up unlocked, as before.
+    """
+    name = f"{index_key}:lock:{hashlib.sha256(title.encode()).hexdigest()[:16]}"
+    lock = redis.lock(name, timeout=ALBUM_LOCK_TIMEOUT, blocking_timeout=ALBUM_LOCK_TIMEOUT)
+    try:
+        acquired = lock.acquire()
+    except RedisError as e:
+        logger.warning(f"Album lock unavailable, creating album unlocked: {e}")
+        acquired = False
+    try:
+        yield
+    finally:
+        if acquired:
+            try:
+                lock.release()
+            except RedisError as e:
+                logger.warning(f"Failed to release album lock: {e}")
@@ -0,0 +1,57 @@
+import logging
+import os
+import socket
+import threading
+from redis import Redis
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", "15"))
+HEARTBEAT_TTL = int(os.getenv("HEARTBEAT_TTL", "60"))
+TASK_TTL = 7 * 24 * 3600
+
+def heartbeat_key(job_id: str) -> str:
+    return f"job:{job_id}:heartbeat"
+
+def task_key(job_id: str) -> str:
+    """Names the entry point (`import` or `retry`) that last ran the job, for the reaper to restart."""
+    return f"job:{job_id}:task"
+
+class Heartbeat:
+    """Keeps `job:{id}:heartbeat` alive while this process works on a job.
+
+    The key is refreshed from a background thread, so a long blocking step
+    (a big preload, a slow commit) can't make a live job look dead. When the
+    process dies the key expires after HEARTBEAT_TTL seconds, which is what
+    the reaper looks for.
+    """
+
+    def __init__(self, redis: Redis, job_id: str, interval: float = HEARTBEAT_INTERVAL, ttl: int = HEARTBEAT_TTL):
+        self.redis = redis
+        self.key = heartbeat_key(str(job_id))
+        self.interval = interval
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+        self._thread = None
+
+    def beat(self):
+        try:
+            self.redis.set(self.key, self.owner, ex=self.ttl)
+        except Exception as e:
+            logger.warning(f"Failed to send job heartbeat: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.beat()
+
+    def __enter__(self):
+        self.beat()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{self.key}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import time
+from typing import Callable, Dict, Optional
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+from app.models.item import Item
+from app.utils.metrics import STAGE_SECONDS
+from app.worker.tracing import NULL_TRACER
+
+PERSIST_FLUSH_SIZE = int(os.getenv("PERSIST_FLUSH_SIZE", "200"))
+PERSIST_FLUSH_INTERVAL = float(os.getenv("PERSIST_FLUSH_INTERVAL", "2.0"))
+
+class ItemWriter:
+    """Write-behind buffer for Item rows.
+
+    Item state changes are collected in memory and written with one multi-row
+    INSERT and one bulk UPDATE per flush, in the same transaction as any other
+    pending changes on the session (job progress, log tail). A flush happens
+    once `flush_size` rows are buffered or `flush_interval` seconds have passed,
+    so a crash loses at most one flush window; those items are simply redone
+    on resume because they were never recorded as DONE.
+
+    `on_inserted` is called after each flush with {source_media_url: id} for
+    the newly inserted rows. Each flush is a "commit" span of `tracer`.
+    """
+
+    def __init__(self, db: Session, flush_size: int = PERSIST_FLUSH_SIZE, flush_interval: float = PERSIST_FLUSH_INTERVAL,
+                 on_inserted: Optional[Callable[[Dict[str, int]], None]] = None, tracer=NULL_TRACER):
+        self.db = db
+        self.tracer = tracer
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self.on_inserted = on_inserted
+        self.inserts: Dict[str, dict] = {}
+        self.updates: Dict[int, dict] = {}
+        self.flushes = 0
+        self._last_flush = time.monotonic()
+        self._closed = asyncio.Event()
+        self._timer: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self.inserts) + len(self.updates)
+
+    def add(self, values: dict, item_id: Optional[int] = None):
+        """Buffer new column values for an item; `values` must include source_media_url for new rows."""
+        if item_id is None:
+            self.inserts.setdefault(values["source_media_url"], {}).update(values)
+        else:
+            self.updates.setdefault(item_id, {"id": item_id}).update(values)
+        if len(self) >= self.flush_size or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write all buffered rows and commit, even if nothing is buffered."""
+        inserted = {}
+        try:
+            with STAGE_SECONDS.labels("db_flush").time(), \
+                    self.tracer.span("commit", self.tracer.track("db"), inserts=len(self.inserts), updates=len(self.updates)):
+                if self.inserts:
+                    rows = self.db.execute(insert(Item).returning(Item.id, Item.source_media_url), list(self.inserts.values()))
+                    inserted = {url: item_id for item_id, url in rows}
+                if self.updates:
+                    self.db.execute(update(Item), list(self.updates.values()))
+                self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+        self.inserts.clear()
+        self.updates.clear()
+        self.flushes += 1
+        self._last_flush = time.monotonic()
+        if inserted and self.on_inserted:
+            self.on_inserted(inserted)
+
+    def start(self):
+        """Start flushing on the time limit even while no new rows arrive."""
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._flush_periodically())
+
+    async def close(self):
+        """Stop the timer and flush; the writer can be started again afterwards."""
+        self._closed.set()
+        if self._timer is not None:
+            await self._timer
+            self._timer = None
+        self._closed.clear()
+        self.flush()
+
+    async def _flush_periodically(self):
+        while not self._closed.is_set():
+            try:
+                await asyncio.wait_for(self._closed.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            if len(self) and time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
@@ -0,0 +1,112 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Iterable, List, Optional, Tuple
+from app.utils.metrics import QUEUE_DEPTH
+
+_STOP = object()
+
+
+class Stage:
+    """One step of the import pipeline, run by `workers` concurrent tasks.
+
+    `handler` is awaited for every work item; whatever it returns is handed to
+    the next stage (returning None drops the item).
+
+    With `batch_size` > 1 the handler instead receives a list of up to
+    `batch_size` items, collected for at most `batch_delay` seconds after the
+    first one arrives, and must return a list of items to hand on.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Any]], workers: int = 1, queue_size: Optional[int] = None,
+                 batch_size: int = 1, batch_delay: float = 0.5):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.batch_delay = batch_delay
+        self.queue_size = queue_size or max(self.workers * 2, self.batch_size)
+
+
+async def run_pipeline(items: Iterable[Any], stages: List[Stage],
+                       should_stop: Optional[Callable[[], Awaitable[bool]]] = None) -> bool:
+    """Push `items` through `stages` connected by bounded queues.
+
+    The feeder blocks whenever the first queue is full, so at most a few items
+    per worker are ever in flight regardless of how many `items` there are.
+    When `should_stop` returns True no further items are fed, the items already
+    in flight are drained through the remaining stages and False is returned.
+    """
+    queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in stages]
+    depths = [QUEUE_DEPTH.labels(stage.name) for stage in stages]
+
+    async def feed():
+        for item in items:
+            if should_stop and await should_stop():
+                return False
+            await queues[0].put(item)
+            depths[0].set(queues[0].qsize())
+        return True
+
+    async def next_batch(idx: int) -> Tuple[List[Any], bool]:
+        stage = stages[idx]
+        item = await queues[idx].get()
+        if item is _STOP:
+            return [], True
+        batch = [item]
+        deadline = asyncio.get_running_loop().time() + stage.batch_delay
+        while len(batch) < stage.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            try:
+                item = await asyncio.wait_for(queues[idx].get(), timeout) if timeout > 0 else queues[idx].get_nowait()
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def work(idx: int):
+        stage = stages[idx]
+        next_queue = queues[idx + 1] if idx + 1 < len(stages) else None
+        while True:
+            if stage.batch_size > 1:
+                batch, stopped = await next_batch(idx)
+                depths[idx].set(queues[idx].qsize())
+                results = await stage.handler(batch) if batch else []
+            else:
+                item = await queues[idx].get()
+                depths[idx].set(queues[idx].qsize())
+                stopped = item is _STOP
+                results = [] if stopped else [await stage.handler(item)]
+            if next_queue is not None:
+                for result in results:
+                    if result is not None:
+                        await next_queue.put(result)
+            if stopped:
+                return
+
+    feeder = asyncio.create_task(feed())
+    workers = [[asyncio.create_task(work(idx)) for _ in range(stage.workers)] for idx, stage in enumerate(stages)]
+
+    async def drain():
+        completed = await feeder
+        # Close stages front to back: a stage only gets its stop markers once
+        # everything upstream has finished handing it work.
+        for idx, stage in enumerate(stages):
+            for _ in range(stage.workers):
+                await queues[idx].put(_STOP)
+            await asyncio.gather(*workers[idx])
+        return completed
+
+    driver = asyncio.create_task(drain())
+    tasks = [driver, feeder] + [task for stage_tasks in workers for task in stage_tasks]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+        return driver.result()
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,95 @@
+"""Deleting jobs together with their albums, items and files.
+
+Small jobs are deleted inside the API request with one statement per table
+for all of them. A job with more than PURGE_SYNC_MAX_ITEMS items is marked
+DELETING and removed by the `purge_job` task instead. That task deletes
+items in batches of PURGE_BATCH_SIZE, each in its own short transaction, so
+no lock is held for long and progress can be reported as it goes.
+"""
+import json
+import logging
+import os
+import shutil
+import uuid
+from typing import Iterable, List
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.models.album import Album
+from app.models.item import Item
+from app.models.job import Job, JobStatus
+from app.worker.download import part_dir_for
+from app.worker.events import JobEvents
+from app.worker.tracing import trace_dir_for
+from app.worker.worker import queue, redis_conn, task_id
+
+logger = logging.getLogger(__name__)
+
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "5000"))
+# Jobs with more items than this are deleted in the background
+PURGE_SYNC_MAX_ITEMS = int(os.getenv("PURGE_SYNC_MAX_ITEMS", "10000"))
+# Status events announce a deleted job with this status, so UIs can drop it
+DELETED = "DELETED"
+
+def delete_jobs(db: Session, job_ids: List) -> int:
+    """Delete jobs with their albums and items, one statement per table; the caller commits.
+
+    The foreign keys cascade as well, but deleting children explicitly keeps
+    databases from before the cascade migration (and SQLite) consistent.
+    """
+    if not job_ids:
+        return 0
+    db.execute(delete(Item).where(Item.job_id.in_(job_ids)), execution_options={"synchronize_session": False})
+    db.execute(delete(Album).where(Album.job_id.in_(job_ids)), execution_options={"synchronize_session": False})
+    deleted = db.execute(delete(Job).where(Job.id.in_(job_ids)), execution_options={"synchronize_session": False}).rowcount
+    db.expire_all()
+    return deleted
+
+def remove_job_files(job_ids: Iterable):
+    """Remove the partial downloads and traces of deleted jobs and announce the deletion."""
+    for job_id in job_ids:
+        for directory in (part_dir_for(job_id), trace_dir_for(job_id)):
+            shutil.rmtree(directory, ignore_errors=True)
+        JobEvents(redis_conn, job_id).status(DELETED)
+
+def enqueue_purge(db: Session, job_ids: List):
+    """Mark jobs DELETING and queue a purge_job task for each; the caller commits."""
+    db.query(Job).filter(Job.id.in_(job_ids)).update({"status": JobStatus.DELETING}, synchronize_session=False)
+    for job_id in job_ids:
+        queue.enqueue(purge_job, str(job_id), job_id=task_id(job_id, "purge"))
+
+def purge_job(job_id: str):
+    """Delete a DELETING job's items in bounded batches, reporting progress, then its albums and the job."""
+    db: Session = next(get_db())
+    events = JobEvents(redis_conn, job_id)
+    job_key = uuid.UUID(str(job_id))
+    try:
+        job = db.query(Job).filter(Job.id == job_key).first()
+        if not job or job.status != JobStatus.DELETING:
+            return
+        total = db.query(Item.id).filter(Item.job_id == job_key).count()
+        deleted = 0
+        while True:
+            batch = select(Item.id).where(Item.job_id == job_key).limit(PURGE_BATCH_SIZE)
+            removed = db.execute(delete(Item).where(Item.id.in_(batch)), execution_options={"synchronize_session": False}).rowcount
+            if not removed:
+                break
+            deleted += removed
+            job.progress = json.dumps({"stage": "deleting", "items_deleted": deleted, "total_items": total})
+            db.commit()
+            events.progress(job.progress, "deleting")
+        delete_jobs(db, [job_key])
+        db.commit()
+        remove_job_files([job_key])
+        logger.info(f"Purged job {job_id} with {deleted} items")
+    except Exception as e:
+        # The job stays DELETING; deleting it again queues a new purge
+        logger.error(f"Purge of job {job_id} failed: {e}")
+        db.rollback()
+        job = db.query(Job).filter(Job.id == job_key).first()
+        if job is not None:
+            job.last_error = f"Delete failed: {e}"
+            db.commit()
+            events.status(job.status.value, job.last_error)
+    finally:
+        db.close()
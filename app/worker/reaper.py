@@ -0,0 +1,104 @@
+"""Put RUNNING jobs whose worker died back on the queue.
+
+A job is considered alive while its heartbeat key exists, one of its RQ tasks
+is queued, or one of its tasks is started on an RQ worker that is still
+alive. Otherwise the entry point that last ran it (import or retry) is
+re-enqueued and resumes from its recorded album and item rows; a fanned-out
+job is imported again, which queues its unfinished albums anew. A job that
+keeps losing its worker is failed after REAPER_MAX_RESTARTS attempts.
+
+Run with: python -m app.worker.reaper
+"""
+import logging
+import os
+import time
+from typing import List, Set
+import rq
+from redis import Redis
+from sqlalchemy.orm import Session
+from app.db.session import get_db
+from app.models.job import Job, JobStatus
+from app.worker.events import JobEvents
+from app.worker.heartbeat import heartbeat_key, task_key
+from app.worker.worker import enqueue_import, enqueue_retry, queue, redis_conn
+
+logger = logging.getLogger(__name__)
+
+REAPER_INTERVAL = float(os.getenv("REAPER_INTERVAL", "30"))
+REAPER_MAX_RESTARTS = int(os.getenv("REAPER_MAX_RESTARTS", "3"))
+RESTARTS_TTL = 7 * 24 * 3600
+
+def active_task_ids(queue: rq.Queue) -> Set[str]:
+    """RQ ids of every queued task and of every started task whose RQ worker is still alive.
+
+    A task stays in the started registry until its entry expires, which can
+    be long after the container running it died, so being listed there is
+    not enough on its own.
+    """
+    registry = queue.started_job_registry
+    registry.cleanup()
+    started = rq.job.Job.fetch_many(registry.get_job_ids(cleanup=False), connection=queue.connection)
+    running = {task.id for task in started
+               if task and task.worker_name and queue.connection.exists(rq.Worker.redis_worker_namespace_prefix + task.worker_name)}
+    return set(queue.get_job_ids()) | running
+
+def is_alive(redis: Redis, job_id: str, task_ids: Set[str]) -> bool:
+    if redis.exists(heartbeat_key(job_id)):
+        return True
+    return any(task == job_id or task.startswith(job_id + "-") for task in task_ids)
+
+def restart(redis: Redis, job_id):
+    """Re-enqueue the entry point that last ran the job; sub-tasks of a fanned-out job record `import`."""
+    if redis.get(task_key(job_id)) == b"retry":
+        enqueue_retry(job_id)
+    else:
+        enqueue_import(job_id)
+
+def reap(db: Session, redis: Redis, queue: rq.Queue) -> List[str]:
+    """Re-enqueue (or fail) every stale RUNNING job; returns their ids."""
+    running = db.query(Job).filter(Job.status == JobStatus.RUNNING).all()
+    if not running:
+        return []
+    task_ids = active_task_ids(queue)
+    reaped = []
+    for job in running:
+        job_id = str(job.id)
+        if is_alive(redis, job_id, task_ids):
+            continue
+        # Several reapers may run; only one handles a given job
+        if not redis.set(f"job:{job_id}:reaping", 1, nx=True, ex=int(REAPER_INTERVAL * 2)):
+            continue
+        restarts = redis.incr(f"job:{job_id}:restarts")
+        redis.expire(f"job:{job_id}:restarts", RESTARTS_TTL)
+        if job.cancel_requested:
+            job.status = JobStatus.CANCELLED
+        elif restarts > REAPER_MAX_RESTARTS:
+            job.status = JobStatus.FAILED
+            job.last_error = f"Worker lost {restarts} times, giving up"
+        else:
+            job.status = JobStatus.QUEUED
+            restart(redis, job.id)
+        db.commit()
+        logger.warning(f"Job {job_id} had no live worker, now {job.status.value} (restart {restarts})")
+        events = JobEvents(redis, job_id)
+        events.log(f"Worker lost, job {'re-queued' if job.status == JobStatus.QUEUED else job.status.value.lower()}")
+        events.status(job.status.value, job.last_error)
+        reaped.append(job_id)
+    return reaped
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    logger.info(f"Reaper checking for stale jobs every {REAPER_INTERVAL}s")
+    while True:
+        db: Session = next(get_db())
+        try:
+            reap(db, redis_conn, queue)
+        except Exception as e:
+            logger.error(f"Reaper pass failed: {e}")
+            db.rollback()
+        finally:
+            db.close()
+        time.sleep(REAPER_INTERVAL)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""Content-addressed staging store shared by all jobs.
+
+Downloads kept with `store_staging` are stored once per SHA-256 under
+`objects/`, however many jobs or albums contain them. A small ref file per
+source URL under `sources/` records which object it downloaded to, so a
+re-run or an overlapping album uses the local bytes instead of downloading
+again. When the objects outgrow the disk budget, the least recently used
+ones are deleted along with the refs pointing at them.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+from app.utils.metrics import STAGE_BYTES, STAGING
+
+logger = logging.getLogger(__name__)
+
+STAGING_DIR = Path(os.getenv("STAGING_DIR", "data/staging"))
+STAGING_BUDGET_MB = int(os.getenv("STAGING_BUDGET_MB", "10240"))
+# Eviction frees space down to this fraction of the budget, so it doesn't run on every download
+STAGING_EVICT_TARGET = 0.9
+# Objects used this recently may still be on their way through a pipeline
+# (of any worker sharing the store) and are never evicted
+STAGING_EVICT_GRACE = float(os.getenv("STAGING_EVICT_GRACE", "900"))
+
+@dataclass
+class StagedFile:
+    path: Path
+    sha256: str
+    sha1: str
+    bytes: int
+
+class StagingStore:
+    def __init__(self, root: Path = STAGING_DIR, budget_bytes: int = STAGING_BUDGET_MB * 2**20,
+                 evict_grace: float = STAGING_EVICT_GRACE):
+        self.root = root
+        self.objects = root / "objects"
+        self.sources = root / "sources"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.sources.mkdir(parents=True, exist_ok=True)
+        self.budget_bytes = budget_bytes
+        self.evict_grace = evict_grace
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evicted = 0
+        # Size of objects/, scanned on first use and kept up to date by this process
+        self._size: Optional[int] = None
+
+    def object_path(self, sha256: str) -> Path:
+        return self.objects / sha256[:2] / sha256
+
+    def _source_path(self, source: str) -> Path:
+        return self.sources / hashlib.sha256(source.encode()).hexdigest()[:32]
+
+    def get(self, source: str) -> Optional[StagedFile]:
+        """The staged copy of `source`, if one is still stored; marks it recently used."""
+        ref_path = self._source_path(source)
+        try:
+            ref = json.loads(ref_path.read_text())
+            path = self.object_path(ref["sha256"])
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # The object was evicted; drop the ref pointing at it
+                ref_path.unlink(missing_ok=True)
+                raise
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            STAGING.labels("miss").inc()
+            return None
+        self.hits += 1
+        self.bytes_saved += ref["bytes"]
+        STAGING.labels("hit").inc()
+        STAGE_BYTES.labels("staging").inc(ref["bytes"])
+        return StagedFile(path, ref["sha256"], ref["sha1"], ref["bytes"])
+
+    def put(self, source: str, file_path: Path, sha256: str, sha1: str, size: int) -> StagedFile:
+        """Move a finished download of `source` into the store; returns where it now lives."""
+        path = self.object_path(sha256)
+        path.parent.mkdir(exist_ok=True)
+        if path.exists():
+            # Same bytes already staged from another source
+            file_path.unlink(missing_ok=True)
+            os.utime(path)
+        else:
+            shutil.move(file_path, path)
+            if self._size is not None:
+                self._size += size
+        ref = self._source_path(source)
+        tmp = ref.with_name(f"{ref.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"sha256": sha256, "sha1": sha1, "bytes": size}))
+        os.replace(tmp, ref)
+        self.evict()
+        return StagedFile(path, sha256, sha1, size)
+
+    def evict(self):
+        """Delete least recently used objects while the store is over budget.
+
+        Objects read or stored within `evict_grace` seconds are kept even then,
+        since an item that just resolved to one may not have uploaded it yet.
+        """
+        if self._size is None:
+            self._size = sum(p.stat().st_size for p in self.objects.glob("*/*"))
+        if self._size <= self.budget_bytes:
+            return
+        # Other workers share the store, so rescan instead of trusting the running total
+        files = []
+        for path in self.objects.glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = self.budget_bytes * STAGING_EVICT_TARGET
+        in_use_since = time.time() - self.evict_grace
+        for mtime, size, path in files:
+            if total <= target or mtime >= in_use_since:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.evicted += 1
+            STAGING.labels("evicted").inc()
+        self._size = total
+        removed = self.sweep_sources()
+        logger.info(f"Staging store evicted down to {total / 2**20:.0f} MB, removed {removed} stale refs")
+
+    def sweep_sources(self) -> int:
+        """Delete the ref files whose object is gone; returns how many."""
+        removed = 0
+        for ref_path in self.sources.iterdir():
+            if ref_path.suffix == ".tmp":
+                continue
+            try:
+                ref = json.loads(ref_path.read_text())
+                if self.object_path(ref["sha256"]).exists():
+                    continue
+            except OSError:
+                continue
+            except (ValueError, KeyError):
+                pass
+            ref_path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "bytes_saved": self.bytes_saved, "evicted": self.evicted}
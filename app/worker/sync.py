@@ -0,0 +1,69 @@
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app.models.album import Album
+from app.models.item import Item, ItemStatus
+from app.models.job import Job
+from app.models.manifest import ManifestItem, SyncManifest
+from app.utils.google_photos_extractor import media_id
+
+# Items that need no further work on a later sync
+SYNCED_STATUSES = (ItemStatus.DONE, ItemStatus.SKIPPED)
+
+class AlbumManifest:
+    """The media IDs already imported from one source album into one Immich server.
+
+    A sync job diffs each fresh extraction against it and only imports the
+    new items, into the Immich album recorded by the first sync. The first
+    sync of an album seeds the manifest from earlier jobs' items, so albums
+    imported before sync mode existed aren't imported again.
+    """
+
+    def __init__(self, db: Session, manifest: SyncManifest, media_ids: Set[str]):
+        self.db = db
+        self.manifest = manifest
+        self.media_ids = media_ids
+
+    @classmethod
+    def load(cls, db: Session, immich_url: str, source_url: str) -> "AlbumManifest":
+        manifest = db.query(SyncManifest).filter(SyncManifest.immich_url == immich_url,
+                                                 SyncManifest.source_url == source_url).first()
+        if manifest is not None:
+            rows = db.query(ManifestItem.media_id).filter(ManifestItem.manifest_id == manifest.id)
+            return cls(db, manifest, {mid for (mid,) in rows})
+
+        manifest = SyncManifest(immich_url=immich_url, source_url=source_url)
+        db.add(manifest)
+        previous = (db.query(Item.source_media_url, Album.immich_album_id)
+                    .join(Album, Item.album_id == Album.id)
+                    .join(Job, Album.job_id == Job.id)
+                    .filter(Album.source_url == source_url, Job.immich_url == immich_url,
+                            Item.status.in_(SYNCED_STATUSES)))
+        media_ids = set()
+        for url, immich_album_id in previous.yield_per(10000):
+            media_ids.add(media_id(url))
+            manifest.immich_album_id = manifest.immich_album_id or immich_album_id
+        album = cls(db, manifest, set())
+        album.record(media_ids)
+        return album
+
+    @property
+    def immich_album_id(self) -> Optional[str]:
+        return self.manifest.immich_album_id
+
+    def new_items(self, items: Iterable[dict]) -> List[dict]:
+        return [item for item in items if media_id(item['media_url']) not in self.media_ids]
+
+    def record(self, media_ids: Iterable[str], immich_album_id: Optional[str] = None, source_title: Optional[str] = None):
+        """Add `media_ids` to the manifest and commit."""
+        new = set(media_ids) - self.media_ids
+        if immich_album_id:
+            self.manifest.immich_album_id = immich_album_id
+        if source_title:
+            self.manifest.source_title = source_title
+        self.manifest.synced_at = func.now()
+        self.db.flush()
+        if new:
+            self.db.execute(insert(ManifestItem), [{"manifest_id": self.manifest.id, "media_id": mid} for mid in new])
+        self.db.commit()
+        self.media_ids |= new
@@ -0,0 +1,143 @@
+"""Opt-in span tracing of import runs, written as Chrome trace-event JSON.
+
+With the job option `trace` every run of the job (the import, each
+fanned-out task, a retry) records when each item was downloaded, hashed,
+read for EXIF, checked, uploaded and linked to its album, and when item
+rows were committed. Each run saves one file under TRACE_DIR/<job id>/;
+`merge_traces` combines them into one trace, with a process per run, that
+chrome://tracing or https://ui.perfetto.dev can open.
+
+Items are drawn on lanes: a lane is taken when an item starts downloading
+and handed to the next item once it is persisted, so there are about as
+many lanes as items in flight. Untraced jobs get NULL_TRACER, whose calls
+do nothing.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+TRACE_DIR = Path(os.getenv("TRACE_DIR", "data/traces"))
+
+def trace_dir_for(job_id) -> Path:
+    return TRACE_DIR / str(job_id)
+
+class Tracer:
+    """Collects the spans of one run; `save` writes them as Chrome trace events."""
+
+    enabled = True
+
+    def __init__(self, name: str):
+        self.name = name
+        self.events: List[dict] = []
+        self.tracks: Dict[str, int] = {}
+        self.free_lanes: List[int] = []
+        self.lanes = 0
+        # Timestamps are wall-clock microseconds, so runs from different processes line up
+        self._origin = time.time() * 1e6 - time.perf_counter() * 1e6
+
+    def now(self) -> float:
+        return self._origin + time.perf_counter() * 1e6
+
+    def _new_track(self, label: str) -> int:
+        tid = len(self.tracks) + self.lanes + 1
+        self.events.append({"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": label}})
+        self.events.append({"name": "thread_sort_index", "ph": "M", "pid": 0, "tid": tid, "args": {"sort_index": tid}})
+        return tid
+
+    def track(self, name: str) -> int:
+        """The track called `name`, e.g. for album extraction or DB commits."""
+        tid = self.tracks.get(name)
+        if tid is None:
+            tid = self.tracks[name] = self._new_track(name)
+        return tid
+
+    def lane(self) -> int:
+        """A free item lane; give it back with `release` when the item is done."""
+        if self.free_lanes:
+            return self.free_lanes.pop()
+        tid = self._new_track(f"items {self.lanes + 1}")
+        self.lanes += 1
+        return tid
+
+    def release(self, lane: int):
+        if lane:
+            self.free_lanes.append(lane)
+
+    def add(self, name: str, start: float, duration: float, tid: int, args: Optional[dict] = None):
+        """Record a span that has already ended; `start` is a value of `now()`."""
+        event = {"name": name, "ph": "X", "pid": 0, "tid": tid, "ts": round(start, 1), "dur": round(duration, 1)}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    @contextmanager
+    def span(self, name: str, tid: int, **args) -> Iterator[dict]:
+        """Time the block as a span; the yielded dict holds its args and may be added to."""
+        start = self.now()
+        try:
+            yield args
+        finally:
+            self.add(name, start, self.now() - start, tid, args)
+
+    def save(self, directory: Path) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{int(time.time() * 1000)}-{self.name}-{os.getpid()}.json"
+        metadata = {"name": "process_name", "ph": "M", "pid": 0, "args": {"name": self.name}}
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"traceEvents": [metadata, *self.events]}))
+        tmp.replace(path)
+        return path
+
+class _NullSpan:
+    def __enter__(self) -> dict:
+        return {}
+
+    def __exit__(self, *exc):
+        return False
+
+class NullTracer:
+    """Stands in for a Tracer when a job isn't traced."""
+
+    enabled = False
+    _span = _NullSpan()
+
+    def now(self) -> float:
+        return 0.0
+
+    def track(self, name: str) -> int:
+        return 0
+
+    def lane(self) -> int:
+        return 0
+
+    def release(self, lane: int):
+        pass
+
+    def add(self, name: str, start: float, duration: float, tid: int, args: Optional[dict] = None):
+        pass
+
+    def span(self, name: str, tid: int, **args) -> _NullSpan:
+        return self._span
+
+    def save(self, directory: Path) -> Optional[Path]:
+        return None
+
+NULL_TRACER = NullTracer()
+
+def merge_traces(directory: Path) -> Optional[dict]:
+    """All trace files of a job as one Chrome trace, oldest run first; None if there are none."""
+    events = []
+    for pid, path in enumerate(sorted(directory.glob("*.json")), start=1):
+        try:
+            run_events = json.loads(path.read_text())["traceEvents"]
+        except (OSError, ValueError, KeyError):
+            continue
+        for event in run_events:
+            event["pid"] = pid
+        events.extend(run_events)
+    if not events:
+        return None
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -1,7 +1,10 @@
 import os
-import tempfile
-import hashlib
+import asyncio
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import logging
 import json
 from tenacity import retry, stop_after_attempt, wait_exponential
@@ -11,11 +14,24 @@ from app.models.job import Job, JobStatus
 from app.models.album import Album, AlbumStatus
 from app.models.item import Item, ItemStatus
 from app.db.session import get_db
+from app.utils.adaptive_limiter import AdaptiveTransport, HostLimiters
 from app.utils.crypto import decrypt_secret, encrypt_secret
-from app.utils.immich_client import ImmichClient
-from app.utils.google_photos_extractor import GooglePhotosExtractor
-from app.utils.dedupe import sha256_stream
-from app.utils.exif import extract_exif
+from app.utils.immich_client import AlbumIndex, ImmichClient
+from app.utils.google_photos_extractor import ExtractionCache, GooglePhotosExtractor, media_id
+from app.utils.metrics import DEDUPE, ITEMS, STAGE_BYTES, STAGE_SECONDS, count_retry
+from app.utils.dedupe import DigestIndex, DigestWriter
+from app.utils.exif import EXIF_HEAD_BYTES, extract_exif_batch, read_exif_header
+from app.worker.album_batcher import AlbumBatcher
+from app.worker.download import download as download_resumable, part_dir_for, part_key, sweep_parts
+from app.worker.events import JobEvents
+from app.worker.heartbeat import TASK_TTL, Heartbeat, task_key
+from app.worker.fanout import FAN_OUT_CHUNK_SIZE, FAN_OUT_TASK_TIMEOUT, PROGRESS_FIELDS, FanIn, album_lock
+from app.worker.persistence import ItemWriter
+from app.worker.staging import StagingStore
+from app.worker.tracing import NULL_TRACER, Tracer, trace_dir_for
+from app.worker.sync import SYNCED_STATUSES, AlbumManifest
+from app.worker.pipeline import Stage, run_pipeline
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 import httpx
 
@@ -24,218 +40,826 @@ redis_conn = Redis.from_url(redis_url)
 
 queue = rq.Queue("import-queue", connection=redis_conn)
 
+# Above this many known hashes, skip_duplicates keeps them in a Bloom filter;
+# below it the exact index takes 32 bytes per hash (32 MB at the default)
+DEDUPE_BLOOM_THRESHOLD = int(os.getenv("DEDUPE_BLOOM_THRESHOLD", "1000000"))
+DEDUPE_BLOOM_ERROR_RATE = float(os.getenv("DEDUPE_BLOOM_ERROR_RATE", "0.001"))
+# Files handed to one exiftool call
+EXIF_BATCH_SIZE = int(os.getenv("EXIF_BATCH_SIZE", "8"))
+
+def task_id(job_id, *parts) -> str:
+    """RQ job id of a task of import job `job_id`; the reaper finds a job's live tasks by this prefix."""
+    return "-".join([str(job_id), *map(str, parts)])
+
+def enqueue_import(job_id):
+    return queue.enqueue(import_job, str(job_id), job_id=task_id(job_id))
+
+def enqueue_retry(job_id):
+    return queue.enqueue(retry_failed, str(job_id), job_id=task_id(job_id, "retry"))
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), before_sleep=count_retry("download"))
+async def download(http: httpx.AsyncClient, media_url: str, file_path: Path, part_path: Path) -> DigestWriter:
+    """Stream `media_url` into `file_path`, hashing each chunk as it is written; retries resume from `part_path`."""
+    # SHA-1 is the checksum Immich itself uses for duplicate detection
+    return await download_resumable(http, media_url, file_path, part_path, ("sha256", "sha1"), head_size=EXIF_HEAD_BYTES)
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), before_sleep=count_retry("upload"))
+async def upload(client: ImmichClient, file_path: Path, filename: str) -> Optional[str]:
+    return await client.upload_asset(str(file_path), filename)
+
+@dataclass
+class AlbumRun:
+    """One source album ready to import: its DB row, Immich album and the items still to do."""
+    album: Album
+    title: str
+    immich_album_id: Optional[str]
+    items: List[dict]
+    manifest: Optional[AlbumManifest] = None
+
+@dataclass
+class WorkItem:
+    index: int
+    media_url: str
+    filename: str
+    existing_item_id: Optional[int] = None
+    album_id: Optional[int] = None
+    immich_album_id: Optional[str] = None
+    file_path: Optional[Path] = None
+    # file_path is in the staging store, which owns it
+    staged: bool = False
+    bytes: Optional[int] = None
+    sha256: Optional[str] = None
+    sha1: Optional[str] = None
+    head: bytes = b""
+    exif: Optional[dict] = None
+    asset_id: Optional[str] = None
+    skipped: bool = False
+    error: Optional[str] = None
+    # Trace lane, and when the item was handed to the album batcher
+    lane: int = 0
+    linking_since: float = 0.0
+
+class CancelCheck:
+    """Polls `job.cancel_requested` at most once every `interval` seconds."""
+
+    def __init__(self, db: Session, job: Job, interval: float = 2.0):
+        self.db = db
+        self.job = job
+        self.interval = interval
+        self._checked_at = 0.0
+        self._cancelled = False
+
+    async def __call__(self) -> bool:
+        now = time.monotonic()
+        if not self._cancelled and now - self._checked_at >= self.interval:
+            self._checked_at = now
+            self.db.refresh(self.job, ["cancel_requested"])
+            self._cancelled = bool(self.job.cancel_requested)
+        return self._cancelled
+
+class ImportRunner:
+    """Runs one job's albums through the download+hash -> EXIF -> pre-flight -> upload -> album-link/persist pipeline."""
+
+    def __init__(self, db: Session, job: Job, client: ImmichClient, http: httpx.AsyncClient, log, staging: Optional[StagingStore],
+                 events: JobEvents, fan_in: Optional[FanIn] = None, limiters: Optional[Dict[str, HostLimiters]] = None,
+                 tracer=NULL_TRACER):
+        self.db = db
+        self.job = job
+        self.events = events
+        self.client = client
+        self.http = http
+        self.log = log
+        self.staging = staging
+        self.part_dir = part_dir_for(job.id)
+        self.fan_in = fan_in
+        self.limiters = limiters or {}
+        self.tracer = tracer
+        self.cancelled = CancelCheck(db, job)
+        # Cached so that reading them doesn't reload the job after every commit
+        self.job_id = job.id
+        self.total_albums = len(job.album_links)
+        self.writer = ItemWriter(db, on_inserted=self.record_inserted, tracer=tracer)
+        self.download_concurrency = int(job.options.get('download_concurrency') or 3)
+        self.upload_concurrency = int(job.options.get('upload_concurrency') or 3)
+        # With adaptive limits the stages get enough workers for the highest
+        # limit; the limiters decide how many requests are actually running.
+        if 'download' in self.limiters:
+            self.download_concurrency = self.limiters['download'].max_concurrency
+        if 'upload' in self.limiters:
+            self.upload_concurrency = self.limiters['upload'].max_concurrency
+        self.skip_duplicates = bool(job.options.get('skip_duplicates'))
+        self.album_batch_size = int(job.options.get('album_batch_size') or 500)
+        self.album_batch_delay = float(job.options.get('album_batch_delay') or 5.0)
+        self.preflight_check = bool(job.options.get('preflight_check', True))
+        self.preflight_batch_size = int(job.options.get('preflight_batch_size') or 100)
+        self.total_items = 0
+        self.processed_items = 0
+        self.albums_processed = 0
+        self.job_items: Dict[str, Tuple[int, ItemStatus]] = {}
+        self.known_hashes: Optional[DigestIndex] = None
+        self._reported = dict.fromkeys(PROGRESS_FIELDS, 0)
+
+    def preload(self, album_id: Optional[int] = None):
+        """Load this job's item states and, for skip_duplicates, every imported hash.
+
+        Resume and dedupe checks are then answered from memory instead of one
+        query per item. A sub-task of a fanned-out job only loads its album's
+        items and checks duplicates with one query per batch instead, since
+        loading every known hash would cost more than its share of the work.
+        """
+        rows = self.db.query(Item.source_media_url, Item.id, Item.status).filter(Item.job_id == self.job.id)
+        if album_id is not None:
+            rows = rows.filter(Item.album_id == album_id)
+        self.job_items = {url: (item_id, status) for url, item_id, status in rows}
+        if self.skip_duplicates and album_id is None:
+            done = self.db.query(Item.sha256).filter(Item.status == ItemStatus.DONE, Item.sha256.isnot(None)).distinct()
+            count = done.count()
+            bloom = count > DEDUPE_BLOOM_THRESHOLD
+            # Sorted, so the exact index can pack the hashes without sorting them itself
+            self.known_hashes = DigestIndex((sha for (sha,) in done.order_by(Item.sha256).yield_per(10000)), bloom=bloom,
+                                            capacity=count * 2, error_rate=DEDUPE_BLOOM_ERROR_RATE)
+            self.log(f"Loaded {count} known hashes{' into a Bloom filter' if bloom else ''}")
+
+    def is_duplicate(self, sha256: str) -> bool:
+        if self.known_hashes is None or sha256 not in self.known_hashes:
+            return False
+        if self.known_hashes.exact:
+            return True
+        # Bloom filter hit: confirm, it may be a false positive
+        return self.db.query(Item.id).filter(Item.sha256 == sha256, Item.status == ItemStatus.DONE).first() is not None
+
+    def duplicates(self, digests: List[str]) -> Set[str]:
+        """The hashes among `digests` that were already imported."""
+        if not self.skip_duplicates or not digests:
+            return set()
+        if self.known_hashes is None:
+            rows = self.db.query(Item.sha256).filter(Item.sha256.in_(digests), Item.status == ItemStatus.DONE)
+            return {sha for (sha,) in rows}
+        return {sha for sha in digests if self.is_duplicate(sha)}
+
+    def save_progress(self, stage: str):
+        """Update job.progress and publish it; it is committed with the next item flush.
+
+        Sub-tasks of a fanned-out job add their counts to the job totals kept
+        in Redis and report those instead.
+        """
+        progress = {"albums_processed": self.albums_processed, "items_processed": self.processed_items, "total_items": self.total_items}
+        if self.fan_in is not None:
+            deltas = {field: progress[field] - self._reported[field] for field in PROGRESS_FIELDS}
+            self._reported = dict(progress)
+            progress = self.fan_in.progress(deltas)
+        if self.staging:
+            progress["staging"] = self.staging.stats()
+        if self.limiters:
+            progress["limits"] = {host: limit for limiters in self.limiters.values() for host, limit in limiters.snapshot().items()}
+        self.job.progress = json.dumps({"stage": stage, "total_albums": self.total_albums, **progress})
+        self.events.progress(self.job.progress, stage)
+
+    async def open_album(self, index: int, link: str, extraction_cache: ExtractionCache) -> Optional[AlbumRun]:
+        """Extract one album link and make sure its Immich album, Album row and item rows exist.
+
+        Returns None if the album could not be extracted or was already
+        imported by this job. An album whose items were all recorded by an
+        interrupted run is resumed from the items table without scraping it
+        again. In sync mode only the items missing from the album's manifest
+        are returned.
+        """
+        self.log(f"Processing album {index+1}/{self.total_albums}: {link}")
+
+        # Check if album already processed
+        existing_album = self.db.query(Album).filter(Album.job_id == self.job_id, Album.source_url == link).first()
+        if existing_album and existing_album.status == AlbumStatus.DONE:
+            self.log(f"Album already processed: {existing_album.source_title}")
+            return None
+
+        manifest = AlbumManifest.load(self.db, self.job.immich_url, link) if self.job.options.get('sync') else None
+        if existing_album and existing_album.total_items is not None and existing_album.immich_album_id:
+            items = self.registered_items(existing_album.id)
+            self.log(f"Resuming {existing_album.source_title} from {len(items)} recorded items")
+            existing_album.status = AlbumStatus.PENDING
+            return AlbumRun(existing_album, existing_album.source_title, existing_album.immich_album_id, items, manifest)
+
+        with STAGE_SECONDS.labels("scrape").time(), self.tracer.span("extract_album", self.tracer.track("albums"), link=link):
+            album_data = await asyncio.to_thread(GooglePhotosExtractor.extract_album, link, extraction_cache)
+        if not album_data:
+            self.log(f"Failed to extract album from {link}")
+            return None
+        title = album_data['title']
+
+        items = album_data['items']
+        if manifest is not None:
+            items = manifest.new_items(items)
+            self.log(f"Sync: {len(items)} new of {len(album_data['items'])} items in {title}")
+
+        # Create album in Immich, or reuse the one earlier syncs imported into
+        immich_album_id = manifest and manifest.immich_album_id
+        if not immich_album_id:
+            with album_lock(redis_conn, self.client.album_index.key or self.job.immich_url, title):
+                immich_album_id = await self.client.find_or_create_album(title)
+
+        # Save/update album to DB
+        if existing_album:
+            db_album = existing_album
+            db_album.immich_album_id = immich_album_id
+            db_album.status = AlbumStatus.PENDING
+        else:
+            db_album = Album(
+                job_id=self.job_id,
+                source_url=link,
+                source_title=title,
+                immich_album_id=immich_album_id,
+                status=AlbumStatus.PENDING
+            )
+            self.db.add(db_album)
+        self.db.flush()
+        self.register_items(db_album, items)
+        return AlbumRun(db_album, title, immich_album_id, items, manifest)
+
+    def register_items(self, album: Album, items: List[dict]):
+        """Insert a PENDING row for every item of `album` not recorded yet, in one statement, and commit.
+
+        Setting `total_items` in the same transaction marks the rows complete,
+        so a resumed run can trust them instead of scraping the album again.
+        """
+        known = {url for (url,) in self.db.query(Item.source_media_url).filter(Item.album_id == album.id)}
+        rows = {}
+        for item in items:
+            if item['media_url'] not in known:
+                rows.setdefault(item['media_url'], {
+                    "job_id": self.job_id, "album_id": album.id, "source_media_url": item['media_url'],
+                    "source_filename": item.get('filename_hint', 'unknown'), "status": ItemStatus.PENDING,
+                })
+        if rows:
+            inserted = self.db.execute(insert(Item).returning(Item.id, Item.source_media_url), list(rows.values()))
+            for item_id, url in inserted:
+                self.job_items[url] = (item_id, ItemStatus.PENDING)
+        album.total_items = len(items)
+        self.db.commit()
+
+    def registered_items(self, album_id: int) -> List[dict]:
+        rows = self.db.query(Item.source_media_url, Item.source_filename).filter(Item.album_id == album_id).order_by(Item.id)
+        return [{'media_url': url, 'filename_hint': filename or 'unknown'} for url, filename in rows]
+
+    def record_synced(self, run: AlbumRun, items: List[dict]):
+        """Add the items of `items` that need no further work to the album's sync manifest."""
+        if run.manifest is None:
+            return
+        synced = [item['media_url'] for item in items if self.job_items.get(item['media_url'], (None, None))[1] in SYNCED_STATUSES]
+        run.manifest.record(map(media_id, synced), run.immich_album_id, run.title)
+
+    def work_items(self, db_album: Album, immich_album_id: Optional[str], items: List[dict]) -> Iterator[WorkItem]:
+        for j, item_data in enumerate(items):
+            media_url = item_data['media_url']
+            filename = item_data.get('filename_hint', 'unknown')
+
+            # Check if item already processed
+            existing_id, existing_status = self.job_items.get(media_url, (None, None))
+            if existing_status in SYNCED_STATUSES:
+                self.log(f"Item already processed: {filename}")
+                self.processed_items += 1
+                continue
+            yield WorkItem(index=j, media_url=media_url, filename=filename, existing_item_id=existing_id,
+                           album_id=db_album.id, immich_album_id=immich_album_id)
+
+    async def run_album(self, db_album: Album, immich_album_id: Optional[str], items: List[dict]) -> bool:
+        """Import the items of one album. Returns False if the job was cancelled part way."""
+        return await self.run_items(self.work_items(db_album, immich_album_id, items), len(items))
+
+    async def run_items(self, work: Iterable[WorkItem], total: int) -> bool:
+        """Run work items, possibly from different albums, through the pipeline. Returns False if cancelled part way."""
+
+        async def download_stage(w: WorkItem) -> WorkItem:
+            self.log(f"Processing item {w.index+1}/{total}: {w.filename}")
+            self.checkpoint(w, ItemStatus.DOWNLOADING)
+            w.lane = self.tracer.lane()
+            staged = self.staging.get(w.media_url) if self.staging else None
+            if staged:
+                w.file_path, w.bytes, w.sha256, w.sha1 = staged.path, staged.bytes, staged.sha256, staged.sha1
+                w.staged = True
+                with self.tracer.span("staged", w.lane, item=w.filename, bytes=w.bytes), open(staged.path, 'rb') as f:
+                    w.head = f.read(EXIF_HEAD_BYTES)
+                return w
+            # Unstaged files are finished next to their part and removed once handled
+            key = part_key(w.album_id, w.media_url)
+            w.file_path = self.part_dir / key
+            try:
+                with STAGE_SECONDS.labels("download").time(), self.tracer.span("download", w.lane, item=w.filename) as span:
+                    writer = await download(self.http, w.media_url, w.file_path, self.part_dir / f"{key}.part")
+                    span["bytes"] = writer.bytes_written
+            except Exception as e:
+                self.log(f"Failed to download {w.media_url}: {e}")
+                w.error = f"Download failed: {e}"
+                return w
+            # Hashing happens chunk by chunk while downloading, so this time is
+            # also part of the download stage's
+            STAGE_SECONDS.labels("hash").observe(writer.hash_seconds)
+            if self.tracer.enabled:
+                # Drawn as one span of the summed time at the end of the download
+                hashed = writer.hash_seconds * 1e6
+                self.tracer.add("hash", self.tracer.now() - hashed, hashed, w.lane, {"item": w.filename})
+            w.bytes = writer.bytes_written
+            STAGE_BYTES.labels("download").inc(w.bytes)
+            digests = writer.hexdigests()
+            w.sha256 = digests["sha256"]
+            w.sha1 = digests["sha1"]
+            w.head = writer.head
+            if self.staging:
+                try:
+                    w.file_path = self.staging.put(w.media_url, w.file_path, w.sha256, w.sha1, w.bytes).path
+                    w.staged = True
+                except OSError as e:
+                    # The download stays in the part directory and is removed by persist
+                    self.log(f"Failed to stage {w.filename}: {e}")
+            return w
+
+        async def exif_stage(batch: List[WorkItem]) -> List[WorkItem]:
+            ready = [w for w in batch if not w.error]
+            with STAGE_SECONDS.labels("exif").time():
+                # Common photos are read from the bytes kept during download;
+                # only videos and formats exifread can't handle go to exiftool.
+                for w in ready:
+                    with self.tracer.span("exif", w.lane, item=w.filename):
+                        w.exif = read_exif_header(w.head)
+                    w.head = b""
+                fallback = [w for w in ready if w.exif is None]
+                if fallback:
+                    started = self.tracer.now()
+                    exif = await asyncio.to_thread(extract_exif_batch, [str(w.file_path) for w in fallback])
+                    for w in fallback:
+                        self.tracer.add("exiftool", started, self.tracer.now() - started, w.lane,
+                                        {"item": w.filename, "batch": len(fallback)})
+                else:
+                    exif = {}
+            with STAGE_SECONDS.labels("dedupe").time():
+                duplicates = self.duplicates([w.sha256 for w in ready])
+            for w in ready:
+                if w.exif is None:
+                    w.exif = exif.get(str(w.file_path))
+                if w.sha256 in duplicates:
+                    self.log(f"Duplicate found, skipping: {w.filename}")
+                    DEDUPE.labels("imported").inc()
+                    w.skipped = True
+            return batch
+
+        async def preflight_stage(batch: List[WorkItem]) -> List[WorkItem]:
+            pending = {str(n): w for n, w in enumerate(batch) if not (w.error or w.skipped)}
+            if not pending:
+                return batch
+            started = self.tracer.now()
+            try:
+                with STAGE_SECONDS.labels("preflight").time():
+                    existing = await self.client.bulk_upload_check({key: w.sha1 for key, w in pending.items()})
+            except Exception as e:
+                # Not fatal: the items are simply uploaded as usual
+                self.log(f"Pre-flight check failed: {e}")
+                return batch
+            finally:
+                if self.tracer.enabled:
+                    for w in pending.values():
+                        self.tracer.add("preflight", started, self.tracer.now() - started, w.lane,
+                                        {"item": w.filename, "batch": len(pending)})
+            for key, asset_id in existing.items():
+                if asset_id and key in pending:
+                    self.log(f"Already in Immich, linking: {pending[key].filename}")
+                    DEDUPE.labels("immich").inc()
+                    pending[key].asset_id = asset_id
+            return batch
+
+        async def upload_stage(w: WorkItem) -> WorkItem:
+            if w.error or w.skipped or w.asset_id:
+                return w
+            self.checkpoint(w, ItemStatus.UPLOADING)
+            try:
+                with STAGE_SECONDS.labels("upload").time(), self.tracer.span("upload", w.lane, item=w.filename, bytes=w.bytes):
+                    w.asset_id = await upload(self.client, w.file_path, w.filename)
+                STAGE_BYTES.labels("upload").inc(w.bytes or 0)
+            except Exception as e:
+                self.log(f"Failed to upload {w.filename}: {e}")
+                w.error = f"Upload failed: {e}"
+            return w
+
+        async def linked(entries, errors):
+            for asset_id, w in entries:
+                if self.tracer.enabled:
+                    # From joining the batch until the batch was added to the album
+                    self.tracer.add("album_add", w.linking_since, self.tracer.now() - w.linking_since, w.lane,
+                                    {"item": w.filename, "batch": len(entries)})
+                if asset_id in errors:
+                    self.log(f"Failed to add {w.filename} to album: {errors[asset_id]}")
+                    w.error = f"Album link failed: {errors[asset_id]}"
+                self.persist(w)
+
+        batcher = AlbumBatcher(self.client, linked, self.album_batch_size, self.album_batch_delay)
+
+        # Items are only persisted once their album membership has been sent,
+        # so anything still buffered when the job stops is redone on resume.
+        async def album_stage(w: WorkItem) -> None:
+            if w.asset_id and not w.error and w.immich_album_id:
+                w.linking_since = self.tracer.now()
+                await batcher.add(w.immich_album_id, w.asset_id, w)
+            else:
+                self.persist(w)
+
+        stages = [
+            Stage("download", download_stage, self.download_concurrency),
+            Stage("exif", exif_stage, self.download_concurrency, batch_size=EXIF_BATCH_SIZE, batch_delay=0.05),
+            Stage("upload", upload_stage, self.upload_concurrency),
+            Stage("album", album_stage, 1),
+        ]
+        if self.preflight_check:
+            stages.insert(2, Stage("preflight", preflight_stage, batch_size=self.preflight_batch_size))
+        self.writer.start()
+        try:
+            return await run_pipeline(work, stages, should_stop=self.cancelled)
+        finally:
+            await batcher.close()
+            await self.writer.close()
+            if self.staging and (self.staging.hits or self.staging.misses):
+                stats = self.staging.stats()
+                self.log(f"Staging: {stats['hits']} hits, {stats['misses']} misses, "
+                         f"{stats['bytes_saved'] / 2**20:.1f} MB not downloaded again, {stats['evicted']} evicted")
+
+    def failed_items(self) -> List[WorkItem]:
+        """Work items for every FAILED item of the job, with their album's Immich id; nothing is scraped."""
+        rows = (self.db.query(Item.id, Item.source_media_url, Item.source_filename, Item.album_id, Album.immich_album_id)
+                .join(Album, Item.album_id == Album.id)
+                .filter(Item.job_id == self.job_id, Item.status == ItemStatus.FAILED)
+                .order_by(Item.id).all())
+        work = []
+        for n, (item_id, url, filename, album_id, immich_album_id) in enumerate(rows):
+            self.job_items[url] = (item_id, ItemStatus.FAILED)
+            work.append(WorkItem(index=n, media_url=url, filename=filename or 'unknown', existing_item_id=item_id,
+                                 album_id=album_id, immich_album_id=immich_album_id))
+        return work
+
+    def finish_retried_albums(self, work: List[WorkItem]):
+        """Mark albums DONE once none of their items is left to do, and update sync manifests."""
+        album_ids = {w.album_id for w in work}
+        if not album_ids:
+            return
+        unfinished = {album_id for (album_id,) in self.db.query(Item.album_id).filter(
+            Item.album_id.in_(album_ids), Item.status.notin_(SYNCED_STATUSES)).distinct()}
+        for album in self.db.query(Album).filter(Album.id.in_(album_ids)):
+            # Albums from before item registration may have items that never got a row
+            if album.id not in unfinished and album.total_items is not None:
+                album.status = AlbumStatus.DONE
+            if self.job.options.get('sync'):
+                manifest = AlbumManifest.load(self.db, self.job.immich_url, album.source_url)
+                items = [{'media_url': w.media_url} for w in work if w.album_id == album.id]
+                self.record_synced(AlbumRun(album, album.source_title, album.immich_album_id, items, manifest), items)
+        self.db.commit()
+
+    def checkpoint(self, w: WorkItem, status: ItemStatus):
+        """Record an in-flight state; buffered like every other item write."""
+        if w.existing_item_id:
+            self.writer.add({"status": status}, w.existing_item_id)
+
+    def persist(self, w: WorkItem):
+        if w.asset_id and not w.error:
+            status = ItemStatus.DONE
+        elif w.skipped:
+            status = ItemStatus.SKIPPED
+        else:
+            status = ItemStatus.FAILED
+        values = {
+            "bytes": w.bytes,
+            "sha256": w.sha256,
+            "exif_json": json.dumps(w.exif) if w.exif else None,
+            "status": status,
+            "immich_asset_id": w.asset_id,
+            "error": w.error,
+        }
+        if not w.existing_item_id:
+            values.update(job_id=self.job_id, album_id=w.album_id, source_media_url=w.media_url, source_filename=w.filename)
+
+        # Buffered; written to the DB with the next flush
+        ITEMS.labels(status.value).inc()
+        self.job_items[w.media_url] = (w.existing_item_id, status)
+        if status == ItemStatus.DONE and w.sha256 and self.known_hashes is not None:
+            self.known_hashes.add(w.sha256)
+        self.processed_items += 1
+        self.save_progress("processing_items")
+        self.writer.add(values, w.existing_item_id)
+        self.tracer.release(w.lane)
+
+        # Clean up unless the file is kept in the staging store
+        if w.file_path and not w.staged:
+            w.file_path.unlink(missing_ok=True)
+
+    def record_inserted(self, inserted: Dict[str, int]):
+        for media_url, item_id in inserted.items():
+            _, status = self.job_items.get(media_url, (None, None))
+            self.job_items[media_url] = (item_id, status)
+
+def job_logger(job: Job, events: JobEvents, log_messages: List[str]):
+    # The tail is committed together with the next progress/item flush
+    # rather than once per message
+    def log(msg):
+        logger.info(msg)
+        events.log(msg)
+        log_messages.append(msg)
+        del log_messages[:-10]
+        job.log_tail = "\n".join(log_messages)  # Keep last 10 lines
+    return log
+
 def import_job(job_id: str):
+    run_job(job_id, run_import, fan_out_allowed=True)
+
+def retry_failed(job_id: str):
+    """Re-process only the FAILED items of a finished job, straight from the items table."""
+    run_job(job_id, run_retry)
+
+def run_job(job_id: str, run, fan_out_allowed: bool = False):
     db: Session = next(get_db())
     log_messages = []
+    job = None
+    events = JobEvents(redis_conn, job_id)
     try:
         job = db.query(Job).filter(Job.id == job_id).first()
         if not job:
             return
         
-        # Skip paused jobs
-        if job.status == JobStatus.PAUSED:
+        # Skip paused jobs and jobs being deleted
+        if job.status in (JobStatus.PAUSED, JobStatus.DELETING):
             return
         
-        def log(msg):
-            logger.info(msg)
-            log_messages.append(msg)
-            job.log_tail = "\n".join(log_messages[-10:])  # Keep last 10 lines
-            db.commit()
+        log = job_logger(job, events, log_messages)
         
         # Update status to RUNNING
         job.status = JobStatus.RUNNING
         job.progress = json.dumps({"stage": "starting", "albums_processed": 0, "total_albums": len(job.album_links), "items_processed": 0, "total_items": 0})
         db.commit()
         log(f"Starting import job {job_id}")
+        db.commit()
+        events.status(job.status.value)
+        task = run.__name__.removeprefix("run_")
+        redis_conn.set(task_key(job_id), task, ex=TASK_TTL)
+
+        try:
+            if removed := sweep_parts():
+                log(f"Removed {removed} stale partial downloads")
+        except OSError as e:
+            logger.warning(f"Failed to clean up partial downloads: {e}")
+
+        if fan_out_allowed and job.options.get('fan_out'):
+            fan_out(db, job, log)
+            return
+
+        with Heartbeat(redis_conn, job_id), job_tracer(job, task) as tracer:
+            asyncio.run(run(db, job, log, events, tracer))
+        events.status(job.status.value)
         
-        # Decrypt credentials
-        api_key = decrypt_secret(job.encrypted_api_key) if job.encrypted_api_key else None
-        email = decrypt_secret(job.encrypted_email) if job.encrypted_email else None
-        password = decrypt_secret(job.encrypted_password) if job.encrypted_password else None
-        
+    except Exception as e:
+        logger.error(f"Job failed: {e}")
+        if job is not None:
+            job.status = JobStatus.FAILED
+            job.last_error = str(e)
+            job.log_tail = "\n".join(log_messages[-10:])
+            db.commit()
+            events.status(job.status.value, job.last_error)
+    finally:
+        db.close()
+
+def fan_out(db: Session, job: Job, log):
+    """Enqueue one import_album sub-task per album link; the last sub-task to finish finalizes the job."""
+    fan_in = FanIn(redis_conn, str(job.id))
+    fan_in.reset(len(job.album_links))
+    if not job.album_links:
+        finalize_job(db, job.id, fan_in)
+        return
+    for i in range(len(job.album_links)):
+        queue.enqueue(import_album, job.id, i, job_id=task_id(job.id, "album", i), job_timeout=FAN_OUT_TASK_TIMEOUT)
+    log(f"Queued {len(job.album_links)} album tasks")
+    db.commit()
+
+def import_album(job_id: str, index: int):
+    """Sub-task of a fanned-out job: import one album, or split it into import_chunk tasks if it is large."""
+    run_sub_task(job_id, None, f"album-{index}",
+                 lambda db, job, log, events, fan_in, tracer: run_album_task(db, job, log, events, fan_in, index, tracer))
+
+def import_chunk(job_id: str, album_id: int, items: List[dict]):
+    """Sub-task of a fanned-out job: import one chunk of a large album's items."""
+    run_sub_task(job_id, album_id, f"chunk-{album_id}",
+                 lambda db, job, log, events, fan_in, tracer: run_chunk_task(db, job, log, events, fan_in, album_id, items, tracer))
+
+def run_sub_task(job_id: str, album_id: Optional[int], name: str, run):
+    db: Session = next(get_db())
+    events = JobEvents(redis_conn, job_id)
+    fan_in = FanIn(redis_conn, str(job_id))
+    error = None
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if not job:
+            return
+        with Heartbeat(redis_conn, job_id), job_tracer(job, name) as tracer:
+            asyncio.run(run(db, job, job_logger(job, events, []), events, fan_in, tracer))
+    except Exception as e:
+        logger.error(f"Task of job {job_id} failed: {e}")
+        db.rollback()
+        error = str(e)
+    try:
+        album_finished, job_finished = fan_in.done(album_id, error)
+        if album_finished:
+            finish_chunked_album(db, job_id, album_id, fan_in)
+        if job_finished:
+            finalize_job(db, job_id, fan_in)
+    finally:
+        db.close()
+
+def finish_chunked_album(db: Session, job_id: str, album_id: int, fan_in: FanIn):
+    """Called once every chunk of a split album has run."""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    album = db.get(Album, album_id)
+    failed, error = fan_in.failed(album_id)
+    if failed:
+        album.status = AlbumStatus.FAILED
+        album.error = error
+    elif not job.cancel_requested:
+        album.status = AlbumStatus.DONE
+        fan_in.progress({"albums_processed": 1})
+    db.commit()
+
+def finalize_job(db: Session, job_id: str, fan_in: FanIn):
+    """Set the final status of a fanned-out job once all of its sub-tasks have finished."""
+    job = db.query(Job).filter(Job.id == job_id).first()
+    failed, error = fan_in.failed()
+    if job.cancel_requested:
+        job.status = JobStatus.CANCELLED
+    elif failed:
+        job.status = JobStatus.FAILED
+        job.last_error = f"{failed} task(s) failed, last error: {error}"
+    else:
+        job.status = JobStatus.DONE
+    job.progress = json.dumps({"stage": "completed" if job.status == JobStatus.DONE else job.status.value.lower(),
+                               "total_albums": len(job.album_links), **fan_in.progress({})})
+    db.commit()
+    events = JobEvents(redis_conn, job_id)
+    events.progress(job.progress, "completed")
+    events.status(job.status.value, job.last_error)
+
+def staging_for(job: Job) -> Optional[StagingStore]:
+    return StagingStore() if job.options.get('store_staging') else None
+
+@contextmanager
+def job_tracer(job: Job, name: str):
+    """A Tracer for one run of a job with the `trace` option, saved when the run ends; NULL_TRACER otherwise."""
+    if not job.options.get('trace'):
+        yield NULL_TRACER
+        return
+    job_id = job.id
+    tracer = Tracer(name)
+    try:
+        yield tracer
+    finally:
+        try:
+            path = tracer.save(trace_dir_for(job_id))
+            logger.info(f"Saved trace of job {job_id} to {path}")
+        except OSError as e:
+            logger.warning(f"Failed to save trace of job {job_id}: {e}")
+
+def job_limiters(job: Job) -> Dict[str, HostLimiters]:
+    """Per-host adaptive limits for Google downloads and Immich requests, starting at the job's concurrency."""
+    adaptive = job.options.get('adaptive_concurrency', True)
+    limiters = {}
+    for kind in ('download', 'upload'):
+        initial = int(job.options.get(f'{kind}_concurrency') or 3)
+        limiters[kind] = HostLimiters(initial) if adaptive else HostLimiters(initial, max_limit=initial)
+    return limiters
+
+@asynccontextmanager
+async def job_clients(db: Session, job: Job):
+    """An authenticated Immich client and a Google download client for one job or sub-task."""
+    # Decrypt credentials
+    api_key = decrypt_secret(job.encrypted_api_key) if job.encrypted_api_key else None
+    email = decrypt_secret(job.encrypted_email) if job.encrypted_email else None
+    password = decrypt_secret(job.encrypted_password) if job.encrypted_password else None
+
+    limiters = job_limiters(job)
+    # One pooled session per job for Immich and one for Google media downloads
+    download_limits = httpx.Limits(max_connections=limiters['download'].max_concurrency * 2)
+    download_transport = AdaptiveTransport(httpx.AsyncHTTPTransport(limits=download_limits), limiters['download'])
+    album_index = AlbumIndex(redis_conn, AlbumIndex.redis_key(job.immich_url, api_key or email))
+    async with ImmichClient(job.immich_url, api_key=api_key, album_index=album_index, limiters=limiters['upload']) as client, \
+            httpx.AsyncClient(timeout=60, follow_redirects=True, transport=download_transport) as http:
         # Authenticate
-        client = ImmichClient(job.immich_url, api_key=api_key)
         if not api_key:
-            token = client.get_token(email, password)
+            token = await client.get_token(email, password)
             if not token:
                 raise Exception("Failed to authenticate with Immich")
-            client = ImmichClient(job.immich_url, access_token=token)
+            client.set_access_token(token)
             # Store token
             job.encrypted_access_token = encrypt_secret(token)
             db.commit()
-        
-        # Prepare staging directory
-        staging_dir = None
-        if job.options.get('store_staging'):
-            staging_dir = Path("data/staging") / str(job.id)
-            staging_dir.mkdir(parents=True, exist_ok=True)
-        
-        total_items = 0
-        processed_items = 0
-        
+        yield client, http, limiters
+
+async def run_album_task(db: Session, job: Job, log, events: JobEvents, fan_in: FanIn, index: int, tracer=NULL_TRACER):
+    async with job_clients(db, job) as (client, http, limiters):
+        runner = ImportRunner(db, job, client, http, log, staging_for(job), events, fan_in, limiters, tracer)
+        if await runner.cancelled():
+            return
+        run = await runner.open_album(index, job.album_links[index], ExtractionCache(redis_conn))
+        if run is None:
+            runner.albums_processed = 1
+            runner.save_progress("processing_albums")
+            db.commit()
+            return
+        runner.total_items = len(run.items)
+        if len(run.items) > FAN_OUT_CHUNK_SIZE:
+            chunks = [run.items[n:n + FAN_OUT_CHUNK_SIZE] for n in range(0, len(run.items), FAN_OUT_CHUNK_SIZE)]
+            # Counted before enqueueing so the job can't look finished in between
+            fan_in.add(len(chunks), run.album.id)
+            for n, chunk in enumerate(chunks):
+                queue.enqueue(import_chunk, job.id, run.album.id, chunk, job_id=task_id(job.id, "chunk", run.album.id, n),
+                              job_timeout=FAN_OUT_TASK_TIMEOUT)
+            log(f"Split {run.title} into {len(chunks)} tasks")
+            runner.save_progress("processing_albums")
+            db.commit()
+            return
+
+        runner.preload(run.album.id)
+        runner.save_progress("processing_albums")
+        completed = await runner.run_album(run.album, run.immich_album_id, run.items)
+        runner.record_synced(run, run.items)
+        if completed:
+            runner.albums_processed = 1
+            run.album.status = AlbumStatus.DONE
+            log(f"Completed album: {run.title}")
+        runner.save_progress("processing_items")
+        db.commit()
+
+async def run_chunk_task(db: Session, job: Job, log, events: JobEvents, fan_in: FanIn, album_id: int, items: List[dict],
+                         tracer=NULL_TRACER):
+    async with job_clients(db, job) as (client, http, limiters):
+        runner = ImportRunner(db, job, client, http, log, staging_for(job), events, fan_in, limiters, tracer)
+        album = db.get(Album, album_id)
+        manifest = AlbumManifest.load(db, job.immich_url, album.source_url) if job.options.get('sync') else None
+        run = AlbumRun(album, album.source_title, album.immich_album_id, items, manifest)
+        runner.preload(album_id)
+        await runner.run_album(album, album.immich_album_id, items)
+        runner.record_synced(run, items)
+        runner.save_progress("processing_items")
+        db.commit()
+
+async def run_import(db: Session, job: Job, log, events: JobEvents, tracer=NULL_TRACER):
+    async with job_clients(db, job) as (client, http, limiters):
+        runner = ImportRunner(db, job, client, http, log, staging_for(job), events, limiters=limiters, tracer=tracer)
+        runner.preload()
+        # Resumes and retries reuse the album pages scraped by the previous run
+        extraction_cache = ExtractionCache(redis_conn)
+
         # Process each album link
         for i, link in enumerate(job.album_links):
-            if job.cancel_requested:
+            if await runner.cancelled():
                 log("Job cancelled")
                 job.status = JobStatus.CANCELLED
                 db.commit()
                 return
             
-            log(f"Processing album {i+1}/{len(job.album_links)}: {link}")
-            album_data = GooglePhotosExtractor.extract_album(link)
-            if not album_data:
-                log(f"Failed to extract album from {link}")
+            run = await runner.open_album(i, link, extraction_cache)
+            if run is None:
                 continue
             
-            # Check if album already processed
-            existing_album = db.query(Album).filter(Album.job_id == job.id, Album.source_url == link).first()
-            if existing_album and existing_album.status == AlbumStatus.DONE:
-                log(f"Album already processed: {album_data['title']}")
-                continue
-            
-            # Create album in Immich
-            immich_album_id = client.find_or_create_album(album_data['title'])
-            
-            # Save/update album to DB
-            if existing_album:
-                db_album = existing_album
-                db_album.immich_album_id = immich_album_id
-                db_album.status = AlbumStatus.PENDING
-            else:
-                db_album = Album(
-                    job_id=job.id,
-                    source_url=link,
-                    source_title=album_data['title'],
-                    immich_album_id=immich_album_id,
-                    status=AlbumStatus.PENDING
-                )
-                db.add(db_album)
-            db.commit()
-            
-            total_items += len(album_data['items'])
-            job.progress = json.dumps({"stage": "processing_albums", "albums_processed": i, "total_albums": len(job.album_links), "items_processed": processed_items, "total_items": total_items})
-            db.commit()
-            
-            # Process items
-            for j, item_data in enumerate(album_data['items']):
-                if job.cancel_requested:
-                    log("Job cancelled")
-                    job.status = JobStatus.CANCELLED
-                    db.commit()
-                    return
-                
-                media_url = item_data['media_url']
-                filename = item_data.get('filename_hint', 'unknown')
-                
-                # Check if item already processed
-                existing_item = db.query(Item).filter(Item.job_id == job.id, Item.source_media_url == media_url).first()
-                if existing_item and existing_item.status == ItemStatus.DONE:
-                    log(f"Item already processed: {filename}")
-                    processed_items += 1
-                    continue
-                
-                log(f"Processing item {j+1}/{len(album_data['items'])}: {filename}")
-                
-                # Download to temp or staging
-                @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-                def download():
-                    resp = httpx.get(media_url, timeout=60)
-                    resp.raise_for_status()
-                    return resp.content
-                
-                try:
-                    content = download()
-                except Exception as e:
-                    log(f"Failed to download {media_url}: {e}")
-                    continue
-                
-                if staging_dir:
-                    file_path = staging_dir / filename
-                    with open(file_path, 'wb') as f:
-                        f.write(content)
-                else:
-                    with tempfile.NamedTemporaryFile(delete=False) as tmp:
-                        tmp.write(content)
-                        file_path = Path(tmp.name)
-                
-                # Compute sha256
-                with open(file_path, 'rb') as f:
-                    sha256 = sha256_stream(f)
-                
-                # Extract EXIF
-                exif_data = extract_exif(str(file_path))
-                
-                # Check dedupe
-                skip = False
-                if job.options.get('skip_duplicates'):
-                    existing = db.query(Item).filter(Item.sha256 == sha256, Item.status == ItemStatus.DONE).first()
-                    if existing:
-                        log(f"Duplicate found, skipping: {filename}")
-                        skip = True
-                
-                asset_id = None
-                if not skip:
-                    # Upload to Immich
-                    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-                    def upload():
-                        return client.upload_asset(str(file_path), filename)
-                    
-                    try:
-                        asset_id = upload()
-                        if asset_id and immich_album_id:
-                            client.add_asset_to_album(asset_id, immich_album_id)
-                    except Exception as e:
-                        log(f"Failed to upload {filename}: {e}")
-                
-                # Save/update to DB
-                if existing_item:
-                    db_item = existing_item
-                    db_item.sha256 = sha256
-                    db_item.exif_json = json.dumps(exif_data) if exif_data else None
-                    db_item.status = ItemStatus.DONE if asset_id else ItemStatus.FAILED
-                    db_item.immich_asset_id = asset_id
-                else:
-                    db_item = Item(
-                        job_id=job.id,
-                        album_id=db_album.id,
-                        source_media_url=media_url,
-                        source_filename=filename,
-                        sha256=sha256,
-                        exif_json=json.dumps(exif_data) if exif_data else None,
-                        status=ItemStatus.DONE if asset_id else ItemStatus.FAILED,
-                        immich_asset_id=asset_id
-                    )
-                    db.add(db_item)
-                db.commit()
-                
-                processed_items += 1
-                job.progress = json.dumps({"stage": "processing_items", "albums_processed": i+1, "total_albums": len(job.album_links), "items_processed": processed_items, "total_items": total_items})
+            runner.albums_processed = i
+            runner.total_items += len(run.items)
+            runner.save_progress("processing_albums")
+
+            completed = await runner.run_album(run.album, run.immich_album_id, run.items)
+            runner.record_synced(run, run.items)
+            if not completed:
+                log("Job cancelled")
+                job.status = JobStatus.CANCELLED
                 db.commit()
-                
-                # Clean up if not staging
-                if not staging_dir:
-                    file_path.unlink()
-            
-            db_album.status = AlbumStatus.DONE
+                return
+
+            runner.albums_processed = i + 1
+            run.album.status = AlbumStatus.DONE
             db.commit()
-            log(f"Completed album: {album_data['title']}")
-        
-        job.status = JobStatus.DONE
-        job.progress = json.dumps({"stage": "completed", "albums_processed": len(job.album_links), "total_albums": len(job.album_links), "items_processed": processed_items, "total_items": total_items})
-        db.commit()
-        log("Import job completed successfully")
-        
-    except Exception as e:
-        logger.error(f"Job failed: {e}")
-        job.status = JobStatus.FAILED
-        job.last_error = str(e)
-        job.log_tail = "\n".join(log_messages[-10:])
-        db.commit()
-    finally:
-        db.close()
+            log(f"Completed album: {run.title}")
+    
+    job.status = JobStatus.DONE
+    runner.albums_processed = len(job.album_links)
+    runner.save_progress("completed")
+    log("Import job completed successfully")
+    db.commit()
+
+async def run_retry(db: Session, job: Job, log, events: JobEvents, tracer=NULL_TRACER):
+    async with job_clients(db, job) as (client, http, limiters):
+        runner = ImportRunner(db, job, client, http, log, staging_for(job), events, limiters=limiters, tracer=tracer)
+        work = runner.failed_items()
+        log(f"Retrying {len(work)} failed items")
+        runner.total_items = len(work)
+        runner.save_progress("retrying_failed")
+        completed = await runner.run_items(work, len(work))
+        runner.finish_retried_albums(work)
+
+    job.status = JobStatus.DONE if completed else JobStatus.CANCELLED
+    runner.albums_processed = len(job.album_links)
+    runner.save_progress("completed" if completed else "cancelled")
+    log(f"Retry finished: {sum(1 for w in work if w.asset_id and not w.error)} of {len(work)} items imported")
+    db.commit()
 
 if __name__ == "__main__":
     # For local testing
@@ -2,13 +2,89 @@
 
 const API_BASE = '/api';
 
+// Jobs shown so far, and the cursor of the page after them
+let jobs = [];
+let nextCursor = null;
+
+// Seconds between job list reloads while live events are unavailable
+const POLL_INTERVAL = 5;
+let pollTimer = null;
+// The job whose log is followed, its event stream and the lines received
+let logJobId = null;
+let logEvents = null;
+let logLines = [];
+
 document.addEventListener('DOMContentLoaded', () => {
     setupTestLogin();
     setupCreateJob();
     setupJobsList();
     loadJobs();
+    subscribeJobEvents();
 });
 
+// Live status/progress of every job over server-sent events. The browser
+// reconnects on its own; while the stream is down the list is polled.
+function subscribeJobEvents() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const events = new EventSource(`${API_BASE}/jobs/events`);
+    events.addEventListener('open', () => {
+        // Catch up on whatever happened while disconnected
+        if (pollTimer) loadJobs();
+        stopPolling();
+    });
+    events.addEventListener('error', startPolling);
+    events.addEventListener('status', e => {
+        const event = JSON.parse(e.data);
+        if (event.status === 'DELETED') {
+            jobs = jobs.filter(job => job.id !== event.job_id);
+            displayJobs();
+        } else if (!jobs.some(job => job.id === event.job_id)) {
+            loadJobs();
+        } else {
+            updateJob(event.job_id, { status: event.status, last_error: event.last_error });
+        }
+    });
+    events.addEventListener('progress', e => {
+        const event = JSON.parse(e.data);
+        updateJob(event.job_id, { progress: event.progress });
+    });
+}
+
+function startPolling() {
+    if (!pollTimer) pollTimer = setInterval(() => loadJobs(), POLL_INTERVAL * 1000);
+}
+
+function stopPolling() {
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
+function updateJob(jobId, changes) {
+    if (!jobs.some(job => job.id === jobId)) return;
+    jobs = jobs.map(job => job.id === jobId ? { ...job, ...changes } : job);
+    displayJobs();
+}
+
+// Follow one job's log lines, replayed from the start of its event stream
+function followLog(jobId) {
+    if (logEvents) logEvents.close();
+    logEvents = null;
+    logLines = [];
+    logJobId = logJobId === jobId ? null : jobId;
+    if (logJobId && window.EventSource) {
+        logEvents = new EventSource(`${API_BASE}/jobs/${jobId}/events`);
+        logEvents.addEventListener('log', e => {
+            logLines.push(JSON.parse(e.data).message);
+            logLines = logLines.slice(-50);
+            displayJobs();
+        });
+    }
+    displayJobs();
+}
+
 function setupTestLogin() {
     const form = document.getElementById('test-login-form');
     const result = document.getElementById('test-result');
@@ -71,6 +147,9 @@ function setupCreateJob() {
             create_album: document.getElementById('create-album').checked,
             skip_duplicates: document.getElementById('skip-duplicates').checked,
             store_staging: document.getElementById('store-staging').checked,
+            sync: document.getElementById('sync').checked,
+            fan_out: document.getElementById('fan-out').checked,
+            trace: document.getElementById('trace').checked,
             download_concurrency: parseInt(document.getElementById('download-concurrency').value),
             upload_concurrency: parseInt(document.getElementById('upload-concurrency').value)
         };
@@ -110,24 +189,30 @@ function setupCreateJob() {
 }
 
 function setupJobsList() {
-    document.getElementById('refresh-jobs').addEventListener('click', loadJobs);
+    document.getElementById('refresh-jobs').addEventListener('click', () => loadJobs());
+    document.getElementById('load-more-jobs').addEventListener('click', () => loadJobs(true));
     document.getElementById('pause-queued').addEventListener('click', pauseQueuedJobs);
     document.getElementById('remove-queued').addEventListener('click', removeQueuedJobs);
 }
 
-async function loadJobs() {
+// Loads the newest page, or with `more` the page after the jobs shown
+async function loadJobs(more = false) {
+    const cursor = more && nextCursor;
     try {
-        const response = await fetch(`${API_BASE}/jobs`);
-        const jobs = await response.json();
-        displayJobs(jobs);
+        const response = await fetch(`${API_BASE}/jobs` + (cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''));
+        const page = await response.json();
+        jobs = cursor ? jobs.concat(page.jobs) : page.jobs;
+        nextCursor = page.next_cursor;
+        displayJobs();
     } catch (error) {
         console.error('Failed to load jobs:', error);
     }
 }
 
-function displayJobs(jobs) {
+function displayJobs() {
     const container = document.getElementById('jobs-list');
     container.innerHTML = '';
+    document.getElementById('load-more-jobs').style.display = nextCursor ? 'block' : 'none';
     
     if (jobs.length === 0) {
         container.innerHTML = '<p>No jobs found.</p>';
@@ -149,12 +234,17 @@ function displayJobs(jobs) {
             <div class="job-details">
                 <div>Immich URL: ${job.immich_url}</div>
                 <div>Progress: ${progress.albums_processed || 0}/${progress.total_albums || 0} albums, ${progress.items_processed || 0}/${progress.total_items || 0} items</div>
+                ${job.items && job.items.total ? `<div>Items: ${job.items.done} done, ${job.items.failed} failed, ${job.items.skipped} skipped, ${(job.items.bytes / 1048576).toFixed(1)} MB</div>` : ''}
+                ${progress.limits && Object.keys(progress.limits).length ? `<div>Concurrency: ${Object.entries(progress.limits).map(([host, limit]) => `${host} ${limit}`).join(', ')}</div>` : ''}
                 ${job.last_error ? `<div class="error">Error: ${job.last_error}</div>` : ''}
                 ${job.log_tail ? `<div class="log">Log: ${job.log_tail.replace(/\n/g, '<br>')}</div>` : ''}
+                ${job.id === logJobId ? `<div class="log">${logLines.map(escapeHtml).join('<br>') || 'Waiting for log lines...'}</div>` : ''}
             </div>
             <div class="job-actions">
                 ${job.status === 'QUEUED' || job.status === 'RUNNING' ? `<button onclick="cancelJob('${job.id}')">Cancel</button>` : ''}
                 ${job.status === 'PAUSED' ? `<button onclick="resumeJob('${job.id}')">Resume</button>` : ''}
+                ${['DONE', 'FAILED', 'CANCELLED'].includes(job.status) ? `<button onclick="retryFailed('${job.id}')">Retry Failed</button>` : ''}
+                <button onclick="followLog('${job.id}')" class="secondary">${job.id === logJobId ? 'Hide Log' : 'Live Log'}</button>
                 ${job.status !== 'RUNNING' ? `<button onclick="deleteJob('${job.id}')" class="delete">Delete</button>` : ''}
             </div>
         `;
@@ -244,4 +334,23 @@ async function resumeJob(jobId) {
     } catch (error) {
         alert(`Error: ${error.message}`);
     }
-}
\ No newline at end of file
+}
+
+async function retryFailed(jobId) {
+    try {
+        const response = await fetch(`${API_BASE}/jobs/${jobId}/retry-failed`, { method: 'POST' });
+        const result = await response.json();
+        if (response.ok) {
+            alert(result.message);
+            loadJobs();
+        } else {
+            alert(`Error: ${result.detail}`);
+        }
+    } catch (error) {
+        alert(`Error: ${error.message}`);
+    }
+}
+
+function escapeHtml(text) {
+    return String(text).replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' })[c]);
+}